@@ -0,0 +1,199 @@
+# analitica.py
+# Cruce de las ventas reales (ventas_mensuales.csv: Producto, Venta_Total) con
+# los cultivos (nombre, zona, fecha_cosecha, precio_compra, precio_venta) para
+# comparar la venta realizada con la estimada por cultivo, zona y mes.
+# Todo el trabajo por fila se hace en pandas/NumPy: los nombres se normalizan
+# solo sobre los valores distintos y el cruce es un merge (hash join) sobre
+# claves categóricas. El resultado se cachea por versión de las entradas.
+#
+# Uso:  python analitica.py [ventas.csv] [cultivos.json]
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+MESES = {'ene': 1, 'feb': 2, 'mar': 3, 'abr': 4, 'may': 5, 'jun': 6,
+         'jul': 7, 'ago': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dic': 12}
+SIN_CULTIVO = '(sin cultivo)'
+COLUMNAS_RESULTADO = ['cultivo', 'zona', 'mes', 'venta_estimada', 'coste', 'venta_realizada',
+                      'margen_estimado', 'margen_realizado', 'diferencia', 'cumplimiento']
+
+# --- Normalización de Nombres ---
+
+def _normalizar_valores(valores):
+    """Minúsculas, sin tildes ni signos y con plurales simples en singular ('Tomates' -> 'tomate')."""
+    return (pd.Series(valores, dtype='string')
+            .str.normalize('NFKD').str.encode('ascii', 'ignore').str.decode('ascii')
+            .str.lower()
+            .str.replace(r'[^a-z0-9]+', ' ', regex=True).str.strip()
+            .str.replace(r'(?<=[a-z]{3})s\b', '', regex=True))
+
+def normalizar_nombres(serie):
+    """
+    Devuelve la serie como categórica de nombres normalizados. La normalización
+    se aplica una vez por valor distinto, no por fila.
+    """
+    codigos, unicos = pd.factorize(serie)
+    normalizados = _normalizar_valores(unicos)
+    # Dos originales pueden normalizar igual ('Tomate' y 'tomates'): se refactoriza
+    recodigos, categorias = pd.factorize(normalizados)
+    # El -1 de los nulos indexa el último elemento añadido, que sigue siendo -1
+    recodigos = np.append(recodigos, -1)
+    return pd.Series(pd.Categorical.from_codes(recodigos[codigos], categorias.astype(object)),
+                     index=serie.index)
+
+def _mes_de_ventas(ventas):
+    """Número de mes (1-12) de cada venta: columna Fecha si existe, si no la abreviatura de Mes."""
+    if 'Fecha' in ventas.columns:
+        return pd.to_datetime(ventas['Fecha'], errors='coerce').dt.month
+    codigos, unicos = pd.factorize(ventas['Mes'])
+    numeros = pd.Series(unicos, dtype='string').str.strip().str.lower().str[:3].map(MESES)
+    return pd.Series(np.append(numeros.to_numpy(dtype='float64'), np.nan)[codigos], index=ventas.index)
+
+# --- Entradas ---
+
+def leer_ventas(ruta):
+    """Lee el CSV de ventas con tipos compactos (categorías para los textos repetidos)."""
+    ventas = pd.read_csv(ruta, usecols=lambda c: c in ('Mes', 'Fecha', 'Producto', 'Venta_Total'),
+                         dtype={'Mes': 'category', 'Producto': 'category'})
+    ventas['Venta_Total'] = pd.to_numeric(ventas['Venta_Total'], errors='coerce')
+    return ventas
+
+def firma_entrada(entrada):
+    """Versión de una entrada: (ruta, mtime, tamaño) para archivos, hash del contenido para tablas."""
+    if isinstance(entrada, (str, os.PathLike)):
+        estado = os.stat(entrada)
+        return (os.fspath(entrada), estado.st_mtime_ns, estado.st_size)
+    tabla = entrada if isinstance(entrada, pd.DataFrame) else pd.DataFrame(entrada)
+    return (len(tabla), tuple(tabla.columns),
+            int(pd.util.hash_pandas_object(tabla, index=False).to_numpy().sum(dtype=np.uint64)))
+
+# --- Agregados y Cruce ---
+
+def agregar_ventas(ventas):
+    """Venta realizada por producto normalizado y mes (un groupby sobre códigos enteros)."""
+    tabla = pd.DataFrame({
+        'clave': normalizar_nombres(ventas['Producto']),
+        'mes': _mes_de_ventas(ventas),
+        'venta_realizada': pd.to_numeric(ventas['Venta_Total'], errors='coerce'),
+    }).dropna()
+    tabla['mes'] = tabla['mes'].astype('int8')
+    return (tabla.groupby(['clave', 'mes'], observed=True, sort=False)['venta_realizada']
+            .sum().reset_index())
+
+def agregar_cultivos(cultivos, claves_ventas):
+    """
+    Venta estimada y coste por clave de cruce, zona y mes de cosecha. La clave
+    es el nombre normalizado si aparece en las ventas y, si no, su primera
+    palabra ('Tomate Cherry' se cruza con las ventas de 'Tomate').
+    """
+    tabla = cultivos if isinstance(cultivos, pd.DataFrame) else pd.DataFrame(list(cultivos))
+    if tabla.empty:
+        # Con los tipos de un agregado normal: columnas 'object' romperían las divisiones de cruzar
+        return pd.DataFrame({'clave': pd.Series(dtype='string'), 'zona': pd.Series(dtype='string'),
+                             'mes': pd.Series(dtype='int8'), 'venta_estimada': pd.Series(dtype='float64'),
+                             'coste': pd.Series(dtype='float64')})
+    nombres = normalizar_nombres(tabla['nombre']).astype('string')
+    base = nombres.str.split(' ', n=1).str[0]
+    clave = nombres.where(nombres.isin(claves_ventas), base)
+    zona = tabla['zona'] if 'zona' in tabla.columns else pd.Series('', index=tabla.index)
+    agregado = pd.DataFrame({
+        'clave': clave,
+        'zona': zona.fillna('').astype('string').str.strip().replace('', 'Sin zona'),
+        'mes': pd.to_datetime(tabla['fecha_cosecha'], format='%Y-%m-%d', errors='coerce').dt.month,
+        'venta_estimada': pd.to_numeric(tabla.get('precio_venta', 0.0), errors='coerce'),
+        'coste': pd.to_numeric(tabla.get('precio_compra', 0.0), errors='coerce'),
+    }).dropna(subset=['clave', 'mes'])
+    agregado[['venta_estimada', 'coste']] = agregado[['venta_estimada', 'coste']].fillna(0.0)
+    agregado['mes'] = agregado['mes'].astype('int8')
+    return (agregado.groupby(['clave', 'zona', 'mes'], observed=True, sort=False)[['venta_estimada', 'coste']]
+            .sum().reset_index())
+
+def cruzar(ventas_agregadas, cultivos_agregados):
+    """
+    Hash join externo por (clave, mes). Si un cultivo se cosecha el mismo mes en
+    varias zonas, la venta realizada se reparte en proporción a la estimada.
+    """
+    ventas_agregadas = ventas_agregadas.assign(clave=ventas_agregadas['clave'].astype(object))
+    cultivos_agregados = cultivos_agregados.assign(clave=cultivos_agregados['clave'].astype(object))
+    cruce = pd.merge(cultivos_agregados, ventas_agregadas, on=['clave', 'mes'], how='outer')
+    cruce['zona'] = cruce['zona'].fillna(SIN_CULTIVO)
+    cruce[['venta_estimada', 'coste', 'venta_realizada']] = (
+        cruce[['venta_estimada', 'coste', 'venta_realizada']].fillna(0.0))
+
+    grupos = cruce.groupby(['clave', 'mes'], sort=False)
+    total_estimado = grupos['venta_estimada'].transform('sum').to_numpy()
+    filas = grupos['venta_estimada'].transform('size').to_numpy()
+    estimada = cruce['venta_estimada'].to_numpy()
+    peso = np.divide(estimada, total_estimado, out=1.0 / filas, where=total_estimado > 0)
+    cruce['venta_realizada'] = cruce['venta_realizada'].to_numpy() * peso
+
+    cruce['margen_estimado'] = cruce['venta_estimada'] - cruce['coste']
+    cruce['margen_realizado'] = cruce['venta_realizada'] - cruce['coste']
+    cruce['diferencia'] = cruce['venta_realizada'] - cruce['venta_estimada']
+    cruce['cumplimiento'] = np.divide(cruce['venta_realizada'].to_numpy(), estimada,
+                                      out=np.full(len(cruce), np.nan), where=estimada > 0)
+    cruce = cruce.rename(columns={'clave': 'cultivo'})
+    cruce['mes'] = cruce['mes'].astype('int8')
+    return (cruce[COLUMNAS_RESULTADO]
+            .sort_values(['cultivo', 'mes', 'zona'], ignore_index=True))
+
+# --- Caché por Versión ---
+
+class AnalisisMargenReal:
+    """
+    Calcula y cachea el cruce ventas/cultivos. El agregado de ventas (la parte
+    cara con millones de filas) se guarda por versión del CSV, y el cruce final
+    por la pareja (versión de ventas, versión de cultivos). El DataFrame devuelto
+    es compartido: no debe modificarse.
+    """
+
+    def __init__(self):
+        self._ventas = None     # (firma, agregado de ventas)
+        self._resultado = None  # ((firma ventas, versión cultivos), DataFrame)
+
+    def _ventas_agregadas(self, ventas):
+        firma = firma_entrada(ventas)
+        if self._ventas is None or self._ventas[0] != firma:
+            tabla = leer_ventas(ventas) if isinstance(ventas, (str, os.PathLike)) else ventas
+            self._ventas = (firma, agregar_ventas(tabla))
+        return self._ventas
+
+    def calcular(self, ventas, cultivos, version_cultivos=None):
+        """
+        ventas: ruta del CSV o DataFrame; cultivos: lista de dicts o DataFrame.
+        version_cultivos evita hashear los cultivos cuando el llamador ya tiene
+        una versión (p. ej. el último ID de evento del backend).
+        """
+        firma_ventas, agregado = self._ventas_agregadas(ventas)
+        if version_cultivos is None:
+            version_cultivos = firma_entrada(cultivos)
+        clave = (firma_ventas, version_cultivos)
+        if self._resultado is None or self._resultado[0] != clave:
+            claves_ventas = agregado['clave'].cat.categories
+            resultado = cruzar(agregado, agregar_cultivos(cultivos, claves_ventas))
+            self._resultado = (clave, resultado)
+        return self._resultado[1]
+
+
+analisis_margen_real = AnalisisMargenReal()
+
+def resumen_por(resultado, columnas):
+    """Suma el resultado por las columnas indicadas (p. ej. ['cultivo'] o ['zona'])."""
+    resumen = resultado.groupby(columnas, sort=True)[['venta_estimada', 'coste', 'venta_realizada']].sum()
+    resumen['diferencia'] = resumen['venta_realizada'] - resumen['venta_estimada']
+    return resumen.reset_index()
+
+
+if __name__ == '__main__':
+    ruta_ventas = sys.argv[1] if len(sys.argv) > 1 else 'ventas_mensuales.csv'
+    ruta_cultivos = sys.argv[2] if len(sys.argv) > 2 else 'cultivos.json'
+    cultivos = pd.read_json(ruta_cultivos, dtype=False)
+    resultado = analisis_margen_real.calcular(ruta_ventas, cultivos)
+    with pd.option_context('display.max_rows', 200, 'display.width', 140,
+                           'display.float_format', '{:,.2f}'.format):
+        print(resultado.to_string(index=False))
+        print()
+        print(resumen_por(resultado, ['cultivo']).to_string(index=False))
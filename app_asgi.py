@@ -0,0 +1,320 @@
+# app_asgi.py
+# Modo de servicio asíncrono (ASGI) de la API de cultivos.
+# Expone las mismas rutas y el mismo contrato que app_backend.py, pero el
+# acceso al almacenamiento se delega a un pool de hilos para no bloquear el
+# bucle de eventos: una sola máquina puede mantener miles de conexiones
+# abiertas del dashboard mientras las lecturas/escrituras avanzan en segundo plano.
+#
+# Arranque:  uvicorn app_asgi:app --host 0.0.0.0 --port 8080
+
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import wraps, partial
+
+import jwt
+from quart import Quart, jsonify, request, send_from_directory, make_response, g
+from quart_cors import cors
+from werkzeug.exceptions import NotFound
+
+import app_backend as base
+from serializacion import a_json, debe_comprimir, comprimir
+from eventos import formatear_sse, formatear_reinicio, SSE_LATIDO
+
+app = Quart(__name__)
+app.config['SECRET_KEY'] = base.SECRET_KEY
+
+# Configuración de CORS (idéntica al modo síncrono)
+app = cors(app,
+           allow_origin=base.FLYIO_DOMAIN,
+           allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+           expose_headers=["X-Ultimo-Evento", "Retry-After"],
+           allow_credentials=True)
+
+# --- Pool de Hilos para el Almacenamiento ---
+HILOS_ALMACEN = int(os.environ.get('HILOS_ALMACEN', '8'))
+ejecutor_almacen = ThreadPoolExecutor(max_workers=HILOS_ALMACEN, thread_name_prefix='almacen')
+DIRECTORIO_ESTATICOS = os.path.dirname(os.path.abspath(__file__))
+
+async def en_hilo(funcion, *args):
+    """Ejecuta una operación bloqueante de app_backend en el pool de almacenamiento."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(ejecutor_almacen, partial(funcion, *args))
+
+# --- Métricas (mismo registro que el modo síncrono) ---
+
+@app.before_request
+async def iniciar_medicion():
+    g.inicio_peticion = time.perf_counter()
+
+@app.after_request
+async def registrar_medicion(response):
+    inicio = g.pop('inicio_peticion', None)
+    if inicio is None:
+        return response
+    ruta = request.url_rule.rule if request.url_rule else 'sin_ruta'
+    base.metricas.observar('peticion_duracion_segundos', time.perf_counter() - inicio,
+                           metodo=request.method, ruta=ruta)
+    base.metricas.incrementar('peticiones_total', metodo=request.method, ruta=ruta,
+                              estado=response.status_code)
+    return response
+
+# --- Control de Admisión (mismas políticas que el modo síncrono) ---
+
+@app.before_request
+async def controlar_admision():
+    rechazo = base.comprobar_tasa(request)
+    if rechazo is None and base.limita_concurrencia(request):
+        # La cola espera en el bucle de eventos, sin ocupar hilos del pool
+        rechazo = base.registrar_rechazo_concurrencia(await base.control_admision.concurrencia.entrar_async())
+        if rechazo is None:
+            g.admitida_desde = time.perf_counter()
+    if rechazo is not None:
+        estado, mensaje, reintento = rechazo
+        return jsonify({'message': mensaje}), estado, {'Retry-After': reintento}
+
+@app.teardown_request
+async def liberar_admision(_error=None):
+    inicio = g.pop('admitida_desde', None)
+    if inicio is not None:
+        base.control_admision.concurrencia.salir(time.perf_counter() - inicio)
+
+@app.after_request
+async def comprimir_respuesta(response):
+    response.vary.add('Accept-Encoding')
+    codificacion = debe_comprimir(response, request.headers.get('Accept-Encoding'), base.UMBRAL_COMPRESION)
+    if codificacion:
+        response.set_data(comprimir(await response.get_data(), codificacion))
+        response.headers['Content-Encoding'] = codificacion
+    return response
+
+# --- Token Required ---
+
+def token_required(f):
+    @wraps(f)
+    async def decorated(*args, **kwargs):
+        token = base.token_de_peticion(request)
+        if not token:
+            return jsonify({'message': 'Token de autenticación faltante'}), 401
+        try:
+            data = base.decodificar_token(token)
+        except jwt.ExpiredSignatureError:
+            return jsonify({'message': 'Token expirado'}), 401
+        except jwt.InvalidTokenError:
+            return jsonify({'message': 'Token inválido'}), 401
+        # El usuario del token llega al handler: cada uno solo toca su partición
+        return await f(data['username'], *args, **kwargs)
+    return decorated
+
+# --- Rutas de Observabilidad ---
+
+@app.route('/metrics', methods=['GET'])
+async def exponer_metricas():
+    """Expone las métricas en formato texto de Prometheus."""
+    response = await make_response(base.metricas.exportar())
+    response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+    return response
+
+@app.route('/salud/listo', methods=['GET'])
+async def comprobar_listo():
+    """Readiness: indica si los datos ya están precargados en memoria."""
+    estado = dict(base.estado_arranque, pid_worker=os.getpid())
+    return jsonify(estado), 200 if base.estado_arranque['listo'] else 503
+
+# --- Rutas del Frontend ---
+
+@app.route('/', methods=['GET'])
+async def servir_index():
+    """Sirve la página principal (index.html)."""
+    try:
+        return await send_from_directory(DIRECTORIO_ESTATICOS, 'index.html')
+    except (FileNotFoundError, NotFound):
+        return "Error: index.html no encontrado.", 404
+
+@app.route('/<path:path>', methods=['GET'])
+async def servir_recursos(path):
+    """Sirve archivos estáticos (scripts.js, styles.css)."""
+    try:
+        return await send_from_directory(DIRECTORIO_ESTATICOS, path)
+    except (FileNotFoundError, NotFound):
+        return "Recurso no encontrado.", 404
+
+# --- Rutas de Autenticación ---
+
+@app.route('/auth/register', methods=['POST'])
+async def register():
+    """Endpoint para registrar un nuevo usuario."""
+    data = await request.get_json()
+    if not await en_hilo(base.registrar_usuario, data):
+        return jsonify({'message': 'El usuario ya existe'}), 400
+    return jsonify({'message': 'Registro exitoso'}), 201
+
+@app.route('/auth/login', methods=['POST'])
+async def login():
+    """Endpoint para iniciar sesión."""
+    data = await request.get_json()
+    username = data.get('username')
+    password = data.get('password')
+
+    if await en_hilo(base.validar_credenciales, username, password):
+        response = await make_response(jsonify({'message': 'Inicio de sesión exitoso'}))
+        response.set_cookie(
+            'token',
+            base.generar_token(username),
+            expires=datetime.now() + timedelta(hours=24),
+            **base.OPCIONES_COOKIE
+        )
+        return response, 200
+
+    return jsonify({'message': 'Credenciales inválidas'}), 401
+
+@app.route('/auth/logout', methods=['POST'])
+async def logout():
+    """Endpoint para cerrar sesión."""
+    response = await make_response(jsonify({'message': 'Sesión cerrada'}))
+    response.set_cookie('token', '', expires=0, **base.OPCIONES_COOKIE)
+    return response, 200
+
+# --- Rutas de API (CRUD de Cultivos) ---
+
+@app.route('/api/v1/cultivos', methods=['GET'])
+@token_required
+async def obtener_cultivos(usuario):
+    """Obtiene la lista completa de cultivos."""
+    bus = base.datos_de(usuario).bus
+    ultimo_evento = bus.ultimo_id
+    response = jsonify(await en_hilo(base.listar_cultivos, usuario))
+    response.headers['X-Ultimo-Evento'] = bus.id_sse(ultimo_evento)
+    return response
+
+@app.route('/api/v1/cultivos/exportar', methods=['GET'])
+@token_required
+async def exportar_cultivos(usuario):
+    """Descarga los cultivos como JSON con sangría (el formato en disco es compacto)."""
+    cultivos = await en_hilo(base.listar_cultivos, usuario)
+    response = await make_response(a_json(cultivos, legible=True))
+    response.headers['Content-Type'] = 'application/json; charset=utf-8'
+    response.headers['Content-Disposition'] = 'attachment; filename=cultivos.json'
+    return response
+
+@app.route('/api/v1/cultivos/top', methods=['GET'])
+@token_required
+async def top_cultivos(usuario):
+    """Top-K de cultivos con mayor margen potencial, opcionalmente por zona."""
+    try:
+        k = base.leer_parametro_k(request.args.get('k'))
+    except ValueError:
+        return jsonify({'message': 'Parámetro k inválido (entero entre 1 y 100)'}), 400
+    ranking = await en_hilo(base.obtener_ranking, usuario)
+    return jsonify(ranking.top(k, request.args.get('zona')))
+
+@app.route('/api/v1/cultivos/search', methods=['GET'])
+@token_required
+async def buscar(usuario):
+    """Busca cultivos por texto, sin tildes ni mayúsculas y con prefijos (?q=)."""
+    try:
+        return jsonify(await en_hilo(base.buscar_cultivos, usuario, request.args))
+    except ValueError:
+        return jsonify({'message': 'Parámetro limite inválido (entero entre 1 y 100)'}), 400
+
+@app.route('/api/v1/ocupacion', methods=['GET'])
+@token_required
+async def ocupacion(usuario):
+    """Cultivos que ocupan cada zona en una fecha (?fecha=&zona=)."""
+    try:
+        return jsonify(await en_hilo(base.ocupacion_en_fecha, usuario, request.args))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+@app.route('/api/v1/ocupacion/linea_tiempo', methods=['GET'])
+@token_required
+async def linea_tiempo(usuario):
+    """Ocupación diaria por zona en un rango (?desde=&hasta=&zona=&capacidad=)."""
+    try:
+        return jsonify(await en_hilo(base.linea_tiempo_ocupacion, usuario, request.args))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+@app.route('/api/v1/cultivos/cambios', methods=['GET'])
+@token_required
+async def cambios_cultivos(usuario):
+    """Cambios posteriores a una versión (?desde=), para clientes sincronizados."""
+    try:
+        desde = int(request.args.get('desde', 0))
+    except ValueError:
+        return jsonify({'message': 'Parámetro desde inválido (entero)'}), 400
+    return jsonify(await en_hilo(base.cambios_desde, usuario, desde))
+
+@app.route('/api/v1/cultivos/lote', methods=['POST'])
+@token_required
+async def lote_cultivos(usuario):
+    """Aplica un lote de altas, cambios y bajas con una sola escritura."""
+    try:
+        operaciones = base.leer_lote(await request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    return jsonify(await en_hilo(base.aplicar_lote, usuario, operaciones))
+
+@app.route('/api/v1/cultivos', methods=['POST'])
+@token_required
+async def crear_cultivo(usuario):
+    """Crea un nuevo cultivo y lo guarda en el volumen persistente."""
+    data = await request.get_json()
+    return jsonify(await en_hilo(base.insertar_cultivo, usuario, data)), 201
+
+@app.route('/api/v1/cultivos/<int:cultivo_id>', methods=['PUT'])
+@token_required
+async def actualizar_cultivo(usuario, cultivo_id):
+    """Actualiza un cultivo existente."""
+    updates = await request.get_json()
+    cultivo = await en_hilo(base.modificar_cultivo, usuario, cultivo_id, updates)
+    if cultivo is None:
+        return jsonify({'message': 'Cultivo no encontrado'}), 404
+    return jsonify({'message': f'Cultivo {cultivo_id} actualizado', 'cultivo': cultivo}), 200
+
+@app.route('/api/v1/cultivos/<int:cultivo_id>', methods=['DELETE'])
+@token_required
+async def eliminar_cultivo(usuario, cultivo_id):
+    """Elimina un cultivo."""
+    await en_hilo(base.borrar_cultivo, usuario, cultivo_id)
+    return jsonify({'message': f'Cultivo {cultivo_id} eliminado'}), 200
+
+# --- Eventos en Tiempo Real (SSE) ---
+
+def ultimo_id_evento(bus):
+    """Lee el último ID recibido por el cliente (Last-Event-ID o ?desde=)."""
+    valor = request.headers.get('Last-Event-ID') or request.args.get('desde')
+    if not valor:
+        return bus.ultimo_id
+    return bus.leer_id_sse(valor)
+
+@app.route('/api/v1/cultivos/eventos', methods=['GET'])
+@token_required
+async def eventos_cultivos(usuario):
+    """Stream SSE de altas, cambios y bajas de cultivos (sin ocupar hilos)."""
+    bus = base.datos_de(usuario).bus
+    ultimo = ultimo_id_evento(bus)
+
+    async def generar(ultimo):
+        while True:
+            eventos = await bus.esperar_async(ultimo)
+            if eventos is None:
+                ultimo = bus.ultimo_id
+                yield formatear_reinicio(bus).encode()
+            elif not eventos:
+                yield SSE_LATIDO.encode()
+            for evento in eventos or []:
+                ultimo = evento['id']
+                yield formatear_sse(evento, bus).encode()
+
+    response = await make_response(generar(ultimo), 200,
+                                   {'Content-Type': 'text/event-stream',
+                                    'Cache-Control': 'no-cache',
+                                    'X-Accel-Buffering': 'no'})
+    response.timeout = None  # El stream no tiene duración máxima
+    return response
+
+if __name__ == '__main__':
+    app.run(debug=True)
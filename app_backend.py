@@ -1,19 +1,40 @@
+import atexit
+import copy
+import fcntl
+import gc
+import hashlib
 import json
+import mmap
+import pickle
 import time
-from flask import Flask, jsonify, request, send_file, make_response
+from collections import OrderedDict
+from flask import Flask, jsonify, request, send_file, make_response, g, Response, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 from functools import wraps
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import jwt
 import os # Necesario para crear la carpeta si no existe
+import threading
+from urllib.parse import quote, unquote
+
+from indices import RankingMargen, IndiceOcupacion, IndiceTexto, fecha_a_ordinal
+from eventos import BusEventos, formatear_sse, formatear_reinicio, SSE_LATIDO, SSE_REINTENTO
+from metricas import RegistroMetricas, PerfiladorMuestreo
+from serializacion import a_json, desde_json, debe_comprimir, comprimir
+from respaldos import GestorRespaldos
+from limitador import ControlAdmision, leer_politica
 
 app = Flask(__name__)
 
 # --- Rutas de Archivos (Persistencia para Fly.io) ---
 # 🚨 CRÍTICO: Usamos la ruta del VOLUMEN PERSISTENTE de Fly.io
-RUTA_PERSISTENCIA = '/vol/data'
-RUTA_DATOS_CULTIVOS = os.path.join(RUTA_PERSISTENCIA, 'cultivos.json')
+RUTA_PERSISTENCIA = os.environ.get('RUTA_PERSISTENCIA', '/vol/data')
 RUTA_DATOS_USUARIOS = os.path.join(RUTA_PERSISTENCIA, 'usuarios.json')
+# Formato anterior (un archivo compartido por todos los usuarios): solo se
+# leen para migrarlos a las particiones por usuario.
+RUTA_DATOS_CULTIVOS = os.path.join(RUTA_PERSISTENCIA, 'cultivos.json')
+RUTA_DATOS_BORRADOS = os.path.join(RUTA_PERSISTENCIA, 'cultivos_borrados.json')
 
 # Aseguramos que la carpeta exista al iniciar
 os.makedirs(RUTA_PERSISTENCIA, exist_ok=True)
@@ -29,25 +50,258 @@ app.config['SECRET_KEY'] = SECRET_KEY
 CORS(app, 
      resources={r"/*": {"origins": FLYIO_DOMAIN, 
                        "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"]}}, 
+     expose_headers=["X-Ultimo-Evento", "Retry-After"],
      supports_credentials=True)
 
+# --- Métricas e Instrumentación ---
+# /metrics expone latencias por ruta, E/S de almacenamiento, serialización JSON
+# y estadísticas de la caché de tokens en formato texto de Prometheus.
+metricas = RegistroMetricas()
+metricas.histograma('peticion_duracion_segundos', 'Latencia de las peticiones HTTP por ruta.')
+metricas.contador('peticiones_total', 'Peticiones HTTP atendidas por ruta y estado.')
+metricas.histograma('almacen_duracion_segundos', 'Duración de lecturas/escrituras de archivos JSON.')
+metricas.contador('almacen_bytes_total', 'Bytes leídos/escritos en el almacenamiento.')
+metricas.contador('almacen_operaciones_total', 'Operaciones de lectura/escritura en el almacenamiento.')
+metricas.histograma('json_serializacion_segundos', 'Tiempo de serialización de respuestas JSON.')
+metricas.contador('auth_cache_total', 'Consultas a la caché de tokens JWT decodificados.')
+
+# 🔬 Perfilador de muestreo: solo se activa con PERFILADOR_ACTIVO=1
+PERFILADOR_ACTIVO = os.environ.get('PERFILADOR_ACTIVO') == '1'
+perfilador = PerfiladorMuestreo(
+    intervalo=float(os.environ.get('PERFILADOR_INTERVALO_MS', '5')) / 1000,
+    umbral=float(os.environ.get('PERFILADOR_UMBRAL_MS', '500')) / 1000,
+)
+if PERFILADOR_ACTIVO:
+    perfilador.iniciar()
+
+
+class ProveedorJSONMedido(DefaultJSONProvider):
+    """Proveedor JSON de Flask: usa orjson si está disponible y mide el tiempo de jsonify."""
+    def dumps(self, obj, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            # jsonify pide separadores compactos; otros argumentos (p.ej. la
+            # sangría del modo debug) van por la ruta estándar
+            if kwargs and kwargs != {'separators': (',', ':')}:
+                return super().dumps(obj, **kwargs)
+            return a_json(obj, ordenar=self.sort_keys, default=self.default).decode('utf-8')
+        finally:
+            metricas.observar('json_serializacion_segundos', time.perf_counter() - inicio)
+
+app.json = ProveedorJSONMedido(app)
+
+
+def medir_almacenamiento(operacion):
+    """Decorador que registra duración y bytes de las funciones de persistencia."""
+    def decorador(f):
+        @wraps(f)
+        def envoltura(*args, **kwargs):
+            ruta = kwargs.get('ruta', args[-1] if args else '')
+            inicio = time.perf_counter()
+            try:
+                return f(*args, **kwargs)
+            finally:
+                archivo = os.path.basename(ruta)
+                metricas.observar('almacen_duracion_segundos', time.perf_counter() - inicio,
+                                  operacion=operacion, archivo=archivo)
+                metricas.incrementar('almacen_operaciones_total', operacion=operacion, archivo=archivo)
+                try:
+                    metricas.incrementar('almacen_bytes_total', os.path.getsize(ruta),
+                                         operacion=operacion, archivo=archivo)
+                except OSError:
+                    pass
+        return envoltura
+    return decorador
+
+
+@app.before_request
+def iniciar_medicion():
+    g.inicio_peticion = time.perf_counter()
+    if PERFILADOR_ACTIVO:
+        perfilador.comenzar_peticion()
+
+
+# --- Compresión de Respuestas ---
+# Respuestas de más de UMBRAL_COMPRESION bytes se comprimen con brotli o gzip
+# según el Accept-Encoding del cliente.
+UMBRAL_COMPRESION = int(os.environ.get('UMBRAL_COMPRESION', '1024'))
+
+@app.after_request
+def comprimir_respuesta(response):
+    response.vary.add('Accept-Encoding')
+    codificacion = debe_comprimir(response, request.headers.get('Accept-Encoding'), UMBRAL_COMPRESION)
+    if codificacion:
+        response.set_data(comprimir(response.get_data(), codificacion))
+        response.headers['Content-Encoding'] = codificacion
+    return response
+
+
+@app.after_request
+def registrar_medicion(response):
+    inicio = g.pop('inicio_peticion', None)
+    if inicio is None:
+        return response
+    duracion = time.perf_counter() - inicio
+    # Usamos la regla (p.ej. /api/v1/cultivos/<int:cultivo_id>) para no disparar la cardinalidad
+    ruta = request.url_rule.rule if request.url_rule else 'sin_ruta'
+    metricas.observar('peticion_duracion_segundos', duracion, metodo=request.method, ruta=ruta)
+    metricas.incrementar('peticiones_total', metodo=request.method, ruta=ruta, estado=response.status_code)
+    if PERFILADOR_ACTIVO:
+        perfilador.terminar_peticion(duracion, f'{request.method} {ruta}')
+    return response
+
 # --- Funciones de Persistencia (Volvemos a JSON) ---
+# Los datos se mantienen en memoria y solo se vuelven a leer del disco si el
+# archivo cambia (firma = mtime + tamaño). Así cada petición ya no paga el
+# parseo completo del JSON.
+_cache_archivos = {}  # ruta -> (firma, datos)
+metricas.contador('almacen_cache_total', 'Lecturas servidas desde la caché en memoria (acierto/fallo).')
+
+def firma_archivo(ruta):
+    """Identifica una versión concreta de un archivo en disco."""
+    st = os.stat(ruta)
+    return (st.st_mtime_ns, st.st_size)
+
+@medir_almacenamiento('lectura')
+def leer_json(ruta):
+    """Lee y parsea un archivo JSON del disco (sin caché)."""
+    with open(ruta, 'rb') as f:
+        return desde_json(f.read())
 
 def cargar_datos(ruta):
     """Carga datos de un archivo JSON, o devuelve una lista vacía si no existe."""
     try:
-        with open(ruta, 'r') as f:
-            return json.load(f)
+        firma = firma_archivo(ruta)
+    except FileNotFoundError:
+        return []
+    en_cache = _cache_archivos.get(ruta)
+    if en_cache is not None and en_cache[0] == firma:
+        metricas.incrementar('almacen_cache_total', resultado='acierto')
+        return en_cache[1]
+    metricas.incrementar('almacen_cache_total', resultado='fallo')
+    # Primer acceso a una partición: la instantánea binaria evita el parseo
+    datos = cargar_instantanea(ruta)
+    if datos is not None:
+        return datos
+    try:
+        datos = leer_json(ruta)
     except FileNotFoundError:
         return []
     except json.JSONDecodeError:
         # Esto puede ocurrir si el archivo está vacío.
         return []
+    _cache_archivos[ruta] = (firma, datos)
+    programar_instantanea(ruta)
+    return datos
+
+@medir_almacenamiento('escritura')
+def guardar_datos(datos, ruta, legible=False):
+    """Guarda datos en un archivo JSON compacto (legible=True solo para exportar)."""
+    try:
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        with open(ruta, 'wb') as f:
+            f.write(a_json(datos, legible=legible))
+    except Exception:
+        # La copia en memoria pudo modificarse antes de fallar la escritura
+        _cache_archivos.pop(ruta, None)
+        raise
+    _cache_archivos[ruta] = (firma_archivo(ruta), datos)
+    programar_instantanea(ruta)
+
+# --- Arranque en Frío: Instantáneas Binarias y Precarga ---
+# Junto a cada JSON se guarda <archivo>.bin: un pickle de los datos ya
+# parseados con la firma del JSON del que salió. Al arrancar se carga vía mmap
+# si la firma coincide, evitando el parseo del JSON. Con gunicorn
+# --preload (gunicorn.conf.py) esto ocurre una sola vez en el proceso maestro
+# y los workers heredan los datos por copy-on-write.
+RETARDO_INSTANTANEA = float(os.environ.get('RETARDO_INSTANTANEA', '2.0'))
+_temporizadores_instantanea = {}
+_cerrojos_ruta = {}  # ruta -> cerrojo de la partición que la modifica (por defecto cerrojo_datos)
+estado_arranque = {'listo': False, 'origen': {}, 'duracion_ms': None, 'pid': os.getpid()}
+
+def ruta_instantanea(ruta):
+    return ruta + '.bin'
 
-def guardar_datos(datos, ruta):
-    """Guarda datos en un archivo JSON."""
-    with open(ruta, 'w') as f:
-        json.dump(datos, f, indent=4)
+def escribir_instantanea(ruta):
+    """Vuelca a disco la instantánea binaria de los datos en memoria de `ruta`."""
+    with _cerrojos_ruta.get(ruta, cerrojo_datos):
+        en_cache = _cache_archivos.get(ruta)
+        if en_cache is None:
+            return
+        contenido = pickle.dumps(en_cache, protocol=5)
+    temporal = ruta_instantanea(ruta) + '.tmp'
+    with open(temporal, 'wb') as f:
+        f.write(contenido)
+    os.replace(temporal, ruta_instantanea(ruta))
+
+def programar_instantanea(ruta):
+    """Agrupa escrituras seguidas: la instantánea se escribe RETARDO_INSTANTANEA s después de la última."""
+    anterior = _temporizadores_instantanea.pop(ruta, None)
+    if anterior is not None:
+        anterior.cancel()
+    temporizador = threading.Timer(RETARDO_INSTANTANEA, escribir_instantanea, args=(ruta,))
+    temporizador.daemon = True
+    _temporizadores_instantanea[ruta] = temporizador
+    temporizador.start()
+
+def escribir_instantaneas_pendientes():
+    """Escribe de inmediato las instantáneas programadas (al apagar la máquina)."""
+    for ruta, temporizador in list(_temporizadores_instantanea.items()):
+        temporizador.cancel()
+        escribir_instantanea(ruta)
+    _temporizadores_instantanea.clear()
+
+atexit.register(escribir_instantaneas_pendientes)
+
+def cargar_instantanea(ruta):
+    """Devuelve los datos de la instantánea si sigue vigente respecto al JSON, o None."""
+    try:
+        firma = firma_archivo(ruta)
+        with open(ruta_instantanea(ruta), 'rb') as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            # Solo leemos instantáneas escritas por este mismo servidor en el volumen
+            firma_guardada, datos = pickle.loads(m)
+    except (OSError, ValueError, pickle.UnpicklingError, EOFError):
+        return None
+    if tuple(firma_guardada) != firma:
+        return None
+    _cache_archivos[ruta] = (firma, datos)
+    return datos
+
+def precargar_archivo(ruta):
+    """Carga un archivo en la caché (instantánea si sigue vigente); devuelve el origen o None."""
+    if cargar_instantanea(ruta) is not None:
+        return 'instantanea'
+    if os.path.exists(ruta):
+        cargar_datos(ruta)
+        escribir_instantanea(ruta)
+        return 'json'
+    return None
+
+def precargar_datos():
+    """Deja los datasets en memoria antes de la primera petición."""
+    inicio = time.perf_counter()
+    migrar_cultivos_compartidos()
+    rutas = [('usuarios.json', RUTA_DATOS_USUARIOS)]
+    if PRECARGAR_PARTICIONES:
+        for usuario in usuarios_con_particion():
+            particion = datos_de(usuario)
+            rutas += [(f'{usuario}/cultivos.json', particion.ruta_cultivos),
+                      (f'{usuario}/cultivos_borrados.json', particion.ruta_borrados)]
+    for nombre, ruta in rutas:
+        origen = precargar_archivo(ruta)
+        if origen is not None:
+            estado_arranque['origen'][nombre] = origen
+    if PRECARGAR_PARTICIONES:
+        # Con 100k cultivos el índice de texto tarda ~2 s: mejor aquí que con el
+        # cerrojo tomado durante la primera búsqueda
+        for usuario in usuarios_con_particion():
+            datos_de(usuario).sincronizar_indices()
+    # Los objetos precargados no se vuelven a recorrer en el GC: menos páginas
+    # tocadas tras el fork y más memoria compartida entre workers.
+    gc.freeze()
+    estado_arranque['duracion_ms'] = round((time.perf_counter() - inicio) * 1000, 2)
+    estado_arranque['listo'] = True
 
 def get_next_id(datos):
     """Calcula el siguiente ID basado en la lista actual."""
@@ -56,25 +310,608 @@ def get_next_id(datos):
     # Asume que el ID es un entero
     return max(item.get('id', 0) for item in datos) + 1
 
-# --- Token Required (Se mantiene igual) ---
+# --- Token Required ---
+# Caché LRU de tokens ya verificados: evita repetir jwt.decode (HMAC + parseo)
+# en cada petición del mismo usuario. Se respeta la expiración del token.
+MAX_TOKENS_EN_CACHE = 1024
+_cache_tokens = OrderedDict()
+_cerrojo_tokens = threading.Lock()
+
+def decodificar_token(token):
+    """Decodifica un JWT usando la caché; lanza las excepciones de PyJWT si no es válido."""
+    with _cerrojo_tokens:
+        data = _cache_tokens.get(token)
+        if data is not None:
+            if data.get('exp', float('inf')) > time.time():
+                _cache_tokens.move_to_end(token)
+                metricas.incrementar('auth_cache_total', resultado='acierto')
+                return data
+            del _cache_tokens[token]
+    metricas.incrementar('auth_cache_total', resultado='fallo')
+    data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"])
+    with _cerrojo_tokens:
+        _cache_tokens[token] = data
+        if len(_cache_tokens) > MAX_TOKENS_EN_CACHE:
+            _cache_tokens.popitem(last=False)
+    return data
+
+def token_de_peticion(peticion):
+    """
+    Token de sesión: cookie 'token' (navegador) o cabecera 'Authorization:
+    Bearer' (clientes como la app de escritorio, que no envían cookies secure
+    sobre http en local).
+    """
+    token = peticion.cookies.get('token')
+    if not token:
+        esquema, _, valor = peticion.headers.get('Authorization', '').partition(' ')
+        if esquema.lower() == 'bearer':
+            token = valor.strip()
+    return token or None
 
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = None
-        if 'token' in request.cookies:
-            token = request.cookies.get('token')
+        token = token_de_peticion(request)
         if not token:
             return jsonify({'message': 'Token de autenticación faltante'}), 401
         try:
-            data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"])
+            data = decodificar_token(token)
         except jwt.ExpiredSignatureError:
             return jsonify({'message': 'Token expirado'}), 401
         except jwt.InvalidTokenError:
             return jsonify({'message': 'Token inválido'}), 401
-        return f(*args, **kwargs)
+        # El usuario del token llega al handler: cada uno solo toca su partición
+        return f(data['username'], *args, **kwargs)
     return decorated
 
+# --- Control de Admisión ---
+# Límite de tasa por cliente (cubo de tokens) según la política de cada ruta,
+# y límite de peticiones simultáneas en el proceso con una cola acotada. Las
+# políticas se configuran como 'tasa/capacidad' ('0' = sin límite). Login y
+# registro se limitan por IP; el resto por usuario (o IP si no hay sesión).
+POLITICAS_LIMITE = {
+    'autenticacion': leer_politica(os.environ.get('LIMITE_AUTENTICACION', '0.2/5')),
+    'escritura': leer_politica(os.environ.get('LIMITE_ESCRITURA', '5/20')),
+    'lectura': leer_politica(os.environ.get('LIMITE_LECTURA', '10/30')),
+}
+# Endpoint -> política. Las rutas que no aparecen (estáticos, métricas, salud) no se limitan.
+POLITICA_RUTA = {
+    'login': 'autenticacion', 'register': 'autenticacion',
+    'crear_cultivo': 'escritura', 'actualizar_cultivo': 'escritura',
+    'eliminar_cultivo': 'escritura', 'lote_cultivos': 'escritura',
+    'obtener_cultivos': 'lectura', 'exportar_cultivos': 'lectura', 'top_cultivos': 'lectura',
+    'buscar': 'lectura', 'ocupacion': 'lectura', 'linea_tiempo': 'lectura',
+    'cambios_cultivos': 'lectura', 'eventos_cultivos': 'lectura',
+}
+# Streams de larga duración: ocuparían un hueco de concurrencia indefinidamente
+SIN_LIMITE_CONCURRENCIA = {'eventos_cultivos'}
+control_admision = ControlAdmision(
+    POLITICAS_LIMITE,
+    max_activas=int(os.environ.get('MAX_PETICIONES_ACTIVAS', '4')),
+    max_cola=int(os.environ.get('MAX_PETICIONES_EN_COLA', '16')),
+    espera_maxima=float(os.environ.get('ESPERA_MAXIMA_COLA', '2.0')),
+)
+metricas.contador('peticiones_rechazadas_total', 'Peticiones rechazadas por el control de admisión (tasa/concurrencia).')
+
+def clave_cliente(peticion, politica):
+    """Clave del cubo de tokens: usuario del token si es válido, si no la IP del cliente."""
+    # Detrás del proxy de Fly.io remote_addr es el proxy; Fly-Client-IP es el cliente real
+    ip = peticion.headers.get('Fly-Client-IP') or peticion.remote_addr
+    if politica != 'autenticacion':
+        token = token_de_peticion(peticion)
+        if token:
+            try:
+                return 'u:' + decodificar_token(token)['username']
+            except jwt.InvalidTokenError:
+                pass
+    return 'ip:' + str(ip)
+
+def comprobar_tasa(peticion):
+    """Rechazo (estado, mensaje, Retry-After) si el cliente superó la tasa de la ruta, o None."""
+    politica = POLITICA_RUTA.get(peticion.endpoint)
+    if politica is None:
+        return None
+    rechazo = control_admision.comprobar_tasa(politica, clave_cliente(peticion, politica))
+    if rechazo is not None:
+        metricas.incrementar('peticiones_rechazadas_total', motivo='tasa', politica=politica)
+    return rechazo
+
+def limita_concurrencia(peticion):
+    return peticion.endpoint in POLITICA_RUTA and peticion.endpoint not in SIN_LIMITE_CONCURRENCIA
+
+def registrar_rechazo_concurrencia(resultado):
+    """Traduce el resultado de entrar() a un rechazo 503 (o None si se admitió) y lo cuenta."""
+    rechazo = control_admision.rechazo_concurrencia(resultado)
+    if rechazo is not None:
+        metricas.incrementar('peticiones_rechazadas_total', motivo='concurrencia', politica='*')
+    return rechazo
+
+@app.before_request
+def controlar_admision():
+    rechazo = comprobar_tasa(request)
+    if rechazo is None and limita_concurrencia(request):
+        rechazo = registrar_rechazo_concurrencia(control_admision.concurrencia.entrar())
+        if rechazo is None:
+            g.admitida_desde = time.perf_counter()
+    if rechazo is not None:
+        estado, mensaje, reintento = rechazo
+        return jsonify({'message': mensaje}), estado, {'Retry-After': reintento}
+
+@app.teardown_request
+def liberar_admision(_error=None):
+    inicio = g.pop('admitida_desde', None)
+    if inicio is not None:
+        control_admision.concurrencia.salir(time.perf_counter() - inicio)
+
+# --- Operaciones de Datos ---
+# Lógica compartida por el modo síncrono (Flask/gunicorn) y el modo asíncrono
+# (app_asgi.py). Los cerrojos serializan los ciclos leer-modificar-escribir,
+# que en modo ASGI se ejecutan en hilos del pool: cerrojo_datos para
+# usuarios.json y uno por partición para los cultivos de cada usuario.
+cerrojo_datos = threading.RLock()
+
+# --- Particiones por Usuario ---
+# Los cultivos de cada usuario viven en su propio directorio:
+#   <raíz>/<pp>/u_<usuario>/cultivos.json  (+ cultivos_borrados.json)
+# donde <pp> es un hash estable del usuario. Cada partición <pp> se asigna a
+# una de las raíces de RAICES_PARTICIONES (separadas por ':'), así que pueden
+# repartirse entre varios volúmenes sin tocar el código. Se pueden añadir
+# raíces con datos ya escritos: una partición que existe en alguna raíz se
+# queda allí, y solo las nuevas siguen el reparto por módulo. NUM_PARTICIONES
+# no debe cambiar una vez haya datos.
+NUM_PARTICIONES = 64
+RAICES_PARTICIONES = ([r for r in os.environ.get('RAICES_PARTICIONES', '').split(os.pathsep) if r]
+                      or [os.path.join(RUTA_PERSISTENCIA, 'particiones')])
+PRECARGAR_PARTICIONES = os.environ.get('PRECARGAR_PARTICIONES', '1') == '1'
+# A quién se copian los cultivos del archivo compartido anterior: '*' = a
+# todos los usuarios registrados (lo que veían hasta ahora), o un usuario.
+CULTIVOS_HEREDADOS = os.environ.get('CULTIVOS_HEREDADOS', '*')
+# 📡 Tamaño del buffer de repetición del bus de eventos de cada usuario
+EVENTOS_REPLAY = int(os.environ.get('EVENTOS_REPLAY', '1000'))
+
+def numero_particion(usuario):
+    return int.from_bytes(hashlib.sha1(usuario.encode('utf-8')).digest()[:4], 'big') % NUM_PARTICIONES
+
+def directorio_usuario(usuario):
+    """Directorio de la partición de un usuario (el nombre va escapado: nunca sale de la raíz)."""
+    particion = numero_particion(usuario)
+    relativo = os.path.join(f'{particion:02d}', 'u_' + quote(usuario, safe=''))
+    # Primero donde ya estén los datos del usuario o, si no, los de su partición:
+    # el módulo cambia al añadir una raíz y los dejaría apuntando a una vacía
+    for buscado in (relativo, f'{particion:02d}'):
+        for raiz in RAICES_PARTICIONES:
+            if os.path.isdir(os.path.join(raiz, buscado)):
+                return os.path.join(raiz, relativo)
+    return os.path.join(RAICES_PARTICIONES[particion % len(RAICES_PARTICIONES)], relativo)
+
+def usuarios_con_particion():
+    """Usuarios que ya tienen datos en alguna raíz."""
+    for raiz in RAICES_PARTICIONES:
+        for particion in sorted(os.listdir(raiz)) if os.path.isdir(raiz) else []:
+            for nombre in sorted(os.listdir(os.path.join(raiz, particion))):
+                if nombre.startswith('u_'):
+                    yield unquote(nombre[2:])
+
+class DatosUsuario:
+    """Partición de un usuario: rutas, cerrojo, bus de eventos (SSE) e índices propios."""
+
+    def __init__(self, usuario):
+        self.usuario = usuario
+        directorio = directorio_usuario(usuario)
+        self.ruta_cultivos = os.path.join(directorio, 'cultivos.json')
+        self.ruta_borrados = os.path.join(directorio, 'cultivos_borrados.json')
+        self.cerrojo = threading.RLock()
+        # Bus en proceso, pensado para un único worker (configuración de fly.toml)
+        self.bus = BusEventos(capacidad_replay=EVENTOS_REPLAY)
+        # Índices: se actualizan con cada evento del bus y se reconstruyen solo
+        # si los datos se recargan del disco (otra lista en la caché)
+        self.ranking = RankingMargen()
+        self.ocupacion = IndiceOcupacion()
+        self.texto = IndiceTexto()
+        for indice in (self.ranking, self.ocupacion, self.texto):
+            self.bus.escuchar(indice.aplicar_evento)
+        _cerrojos_ruta[self.ruta_cultivos] = _cerrojos_ruta[self.ruta_borrados] = self.cerrojo
+
+    def cultivos(self):
+        return cargar_datos(self.ruta_cultivos)
+
+    def sincronizar_indices(self):
+        """Construye los índices ya (en la precarga) en lugar de en la primera consulta."""
+        cultivos = self.cultivos()
+        for indice in (self.ranking, self.ocupacion, self.texto):
+            indice.sincronizar(cultivos)
+
+_particiones = {}
+_cerrojo_particiones = threading.Lock()
+
+def datos_de(usuario):
+    """Devuelve la partición del usuario (creándola en memoria la primera vez)."""
+    particion = _particiones.get(usuario)
+    if particion is None:
+        with _cerrojo_particiones:
+            particion = _particiones.get(usuario)
+            if particion is None:
+                particion = _particiones[usuario] = DatosUsuario(usuario)
+    return particion
+
+def migrar_cultivos_compartidos():
+    """
+    Copia el cultivos.json compartido (formato anterior) a la partición de cada
+    usuario según CULTIVOS_HEREDADOS y lo renombra a cultivos.json.migrado, que
+    queda como copia de seguridad. Con varios workers solo migra uno.
+    """
+    if not os.path.exists(RUTA_DATOS_CULTIVOS):
+        return
+    with open(os.path.join(RUTA_PERSISTENCIA, '.migracion.lock'), 'w') as cerrojo_archivo:
+        fcntl.flock(cerrojo_archivo, fcntl.LOCK_EX)
+        if not os.path.exists(RUTA_DATOS_CULTIVOS):
+            return  # Otro worker terminó la migración
+        if CULTIVOS_HEREDADOS == '*':
+            destinatarios = [u['username'] for u in cargar_datos(RUTA_DATOS_USUARIOS)]
+        else:
+            destinatarios = [CULTIVOS_HEREDADOS]
+        cultivos = cargar_datos(RUTA_DATOS_CULTIVOS)
+        # Se conservan IDs, versiones y lápidas: los clientes sincronizados siguen por donde iban
+        borrados = cargar_datos(RUTA_DATOS_BORRADOS) or None
+        for usuario in destinatarios:
+            particion = datos_de(usuario)
+            with particion.cerrojo:
+                if os.path.exists(particion.ruta_cultivos):
+                    continue
+                if borrados is not None:
+                    guardar_datos(copy.deepcopy(borrados), particion.ruta_borrados)
+                guardar_datos([dict(c) for c in cultivos], particion.ruta_cultivos)
+        for ruta in (RUTA_DATOS_BORRADOS, RUTA_DATOS_CULTIVOS):
+            if os.path.exists(ruta):
+                os.replace(ruta, ruta + '.migrado')
+            _cache_archivos.pop(ruta, None)
+
+# Atributos comunes de la cookie de sesión (CRÍTICO para CORS: samesite='None')
+OPCIONES_COOKIE = {'httponly': True, 'secure': True, 'samesite': 'None'}
+
+def registrar_usuario(data):
+    """Añade un usuario; devuelve False si el nombre ya existe."""
+    with cerrojo_datos:
+        usuarios = cargar_datos(RUTA_DATOS_USUARIOS)
+        if any(u['username'] == data['username'] for u in usuarios):
+            return False
+        # Nota: No necesitamos ID para el usuario.
+        usuarios.append(data)
+        guardar_datos(usuarios, RUTA_DATOS_USUARIOS)
+    programar_respaldo()
+    return True
+
+def validar_credenciales(username, password):
+    """Comprueba usuario y contraseña contra usuarios.json."""
+    usuarios = cargar_datos(RUTA_DATOS_USUARIOS)
+    return any(u['username'] == username and u['password'] == password for u in usuarios)
+
+def generar_token(username):
+    """Genera el JWT de sesión (24 horas de validez)."""
+    token_payload = {
+        'username': username,
+        'exp': datetime.utcnow() + timedelta(hours=24)
+    }
+    return jwt.encode(token_payload, app.config['SECRET_KEY'], algorithm="HS256")
+
+def listar_cultivos(usuario):
+    """Devuelve la lista completa de cultivos del usuario."""
+    return datos_de(usuario).cultivos()
+
+def insertar_cultivo(usuario, data):
+    """Asigna un ID al cultivo, lo añade y lo persiste."""
+    return aplicar_lote(usuario, [{'op': 'crear', 'datos': data}])['resultados'][0]['cultivo']
+
+def modificar_cultivo(usuario, cultivo_id, updates):
+    """Actualiza un cultivo; devuelve el cultivo resultante o None si no existe."""
+    return aplicar_lote(usuario, [{'op': 'actualizar', 'id': cultivo_id, 'datos': updates}])['resultados'][0]['cultivo']
+
+def borrar_cultivo(usuario, cultivo_id):
+    """Elimina un cultivo por ID (no falla si no existe)."""
+    aplicar_lote(usuario, [{'op': 'borrar', 'id': cultivo_id}])
+
+# --- Sincronización: Versiones, Deltas y Lotes ---
+# Cada alta o cambio marca el cultivo con 'version' (contador global creciente)
+# y cada baja deja una lápida {'id', 'version'} en cultivos_borrados.json. Los
+# clientes offline (sincronizacion.py) piden solo lo posterior a su última
+# versión y envían sus cambios agrupados en un lote con una sola escritura.
+# Conflictos: un cambio solo se aplica si su version_base es la versión
+# actual del cultivo; si no, gana el servidor y se devuelve su copia.
+MAX_BORRADOS = int(os.environ.get('MAX_BORRADOS', '10000'))
+MAX_OPERACIONES_LOTE = 500
+CAMPOS_INTERNOS = ('id', 'version', 'origen')
+
+def cargar_borrados(particion):
+    """
+    Lápidas de las bajas: {'minima': V, 'max_id': N, 'borrados': [{'id', 'version'}]}.
+    max_id evita reutilizar el ID de un cultivo borrado (su lápida lo borraría en los clientes).
+    """
+    return cargar_datos(particion.ruta_borrados) or {'minima': 0, 'max_id': 0, 'borrados': []}
+
+def version_actual(cultivos, borrados):
+    """Última versión asignada (máximo entre cultivos, lápidas y lápidas descartadas)."""
+    return max(max((c.get('version', 0) for c in cultivos), default=0),
+               max((b['version'] for b in borrados['borrados']), default=0),
+               borrados['minima'])
+
+def datos_de_cliente(datos):
+    """Copia de los datos recibidos sin los campos que gestiona el servidor."""
+    return {k: v for k, v in (datos or {}).items() if k not in CAMPOS_INTERNOS}
+
+def aplicar_lote(usuario, operaciones):
+    """
+    Aplica una lista de operaciones {'op': 'crear'|'actualizar'|'borrar', ...}
+    con una sola escritura en disco. Devuelve {'version', 'resultados'} con un
+    resultado por operación: 'aplicado', 'conflicto' (gana el servidor) o 'error'.
+    Reenviar un 'crear' con el mismo 'origen' no duplica el cultivo.
+    """
+    particion = datos_de(usuario)
+    with particion.cerrojo:
+        cultivos = particion.cultivos()
+        borrados = cargar_borrados(particion)
+        version = version_actual(cultivos, borrados)
+        # Posición de cada cultivo en la lista: los cambios sustituyen el dict en
+        # vez de modificarlo, así las copias de la lista (respaldos) no cambian
+        posicion = {c['id']: i for i, c in enumerate(cultivos) if 'id' in c}
+        por_origen = {c['origen']: c for c in cultivos if c.get('origen')}
+        siguiente_id = max(get_next_id(cultivos), borrados.get('max_id', 0) + 1)
+        resultados, eventos, eliminados = [], [], {}
+
+        for op in operaciones:
+            tipo = op.get('op')
+            if tipo == 'crear':
+                origen = op.get('origen')
+                if origen and origen in por_origen:
+                    # Reintento de un lote ya aplicado
+                    resultados.append({'estado': 'aplicado', 'cultivo': dict(por_origen[origen])})
+                    continue
+                version += 1
+                cultivo = dict(datos_de_cliente(op.get('datos')), id=siguiente_id, version=version)
+                siguiente_id += 1
+                if origen:
+                    cultivo['origen'] = origen
+                    por_origen[origen] = cultivo
+                posicion[cultivo['id']] = len(cultivos)
+                cultivos.append(cultivo)
+                eventos.append(('cultivo_creado', dict(cultivo)))
+                resultados.append({'estado': 'aplicado', 'cultivo': dict(cultivo)})
+            elif tipo in ('actualizar', 'borrar'):
+                i = posicion.get(op.get('id'))
+                cultivo = None if i is None else cultivos[i]
+                base = op.get('version_base')
+                if cultivo is None:
+                    # Borrar algo que ya no existe es idempotente; actualizarlo, un conflicto
+                    estado = 'aplicado' if tipo == 'borrar' else 'conflicto'
+                    resultados.append({'estado': estado, 'id': op.get('id'), 'cultivo': None})
+                elif base is not None and base != cultivo.get('version', 0):
+                    resultados.append({'estado': 'conflicto', 'id': cultivo['id'], 'cultivo': dict(cultivo)})
+                elif tipo == 'actualizar':
+                    version += 1
+                    cultivo = cultivos[i] = {**cultivo, **datos_de_cliente(op.get('datos')), 'version': version}
+                    if cultivo.get('origen'):
+                        por_origen[cultivo['origen']] = cultivo
+                    eventos.append(('cultivo_actualizado', dict(cultivo)))
+                    resultados.append({'estado': 'aplicado', 'cultivo': dict(cultivo)})
+                else:
+                    version += 1
+                    del posicion[cultivo['id']]
+                    eliminados[cultivo['id']] = version
+                    eventos.append(('cultivo_eliminado', {'id': cultivo['id']}))
+                    resultados.append({'estado': 'aplicado', 'id': cultivo['id'], 'cultivo': None})
+            else:
+                resultados.append({'estado': 'error', 'mensaje': f'Operación desconocida: {tipo!r}'})
+
+        if eventos:
+            if eliminados:
+                # Se modifica la misma lista para que los índices no se reconstruyan
+                cultivos[:] = [c for c in cultivos if c.get('id') not in eliminados]
+                borrados['borrados'].extend({'id': i, 'version': v} for i, v in eliminados.items())
+                borrados['max_id'] = max(borrados.get('max_id', 0), *eliminados)
+                sobrantes = len(borrados['borrados']) - MAX_BORRADOS
+                if sobrantes > 0:
+                    # Quien pida cambios anteriores a 'minima' recibirá la lista completa
+                    borrados['minima'] = borrados['borrados'][sobrantes - 1]['version']
+                    del borrados['borrados'][:sobrantes]
+                guardar_datos(borrados, particion.ruta_borrados)
+            guardar_datos(cultivos, particion.ruta_cultivos)
+            for tipo, datos in eventos:
+                particion.bus.publicar(tipo, datos)
+    if eventos:
+        programar_respaldo()
+    return {'version': version, 'resultados': resultados}
+
+def cambios_desde(usuario, desde):
+    """
+    Cultivos creados o modificados y IDs borrados después de la versión `desde`.
+    Con 'completo' = True la lista es el estado entero y el cliente debe
+    sustituir su copia (primera sincronización o lápidas ya descartadas).
+    """
+    particion = datos_de(usuario)
+    with particion.cerrojo:
+        cultivos = particion.cultivos()
+        borrados = cargar_borrados(particion)
+        version = version_actual(cultivos, borrados)
+        if desde <= 0 or desde < borrados['minima'] or desde > version:
+            return {'version': version, 'completo': True, 'cultivos': list(cultivos), 'borrados': []}
+        return {'version': version, 'completo': False,
+                'cultivos': [c for c in cultivos if c.get('version', 0) > desde],
+                'borrados': [b['id'] for b in borrados['borrados'] if b['version'] > desde]}
+
+def leer_lote(cuerpo):
+    """Valida el cuerpo de POST /lote y devuelve la lista de operaciones (ValueError si no vale)."""
+    operaciones = (cuerpo or {}).get('operaciones') if isinstance(cuerpo, dict) else None
+    if not isinstance(operaciones, list) or not all(isinstance(op, dict) for op in operaciones):
+        raise ValueError("Se esperaba {'operaciones': [...]}")
+    if len(operaciones) > MAX_OPERACIONES_LOTE:
+        raise ValueError(f'Máximo {MAX_OPERACIONES_LOTE} operaciones por lote')
+    return operaciones
+
+# --- Respaldos Incrementales ---
+# Foto fija de cada partición sin parar a los escritores: bajo su cerrojo solo
+# se copian la lista de cultivos y las lápidas (punteros, no registros), y la
+# compresión y escritura del respaldo ocurren fuera. El respaldo se programa
+# tras un cambio y se hace como mucho uno cada INTERVALO_RESPALDO s (0 = nunca);
+# solo incluye lo cambiado desde el anterior (ver respaldos.py).
+RUTA_RESPALDOS = os.environ.get('RUTA_RESPALDOS', os.path.join(RUTA_PERSISTENCIA, 'respaldos'))
+INTERVALO_RESPALDO = float(os.environ.get('INTERVALO_RESPALDO', '900'))
+gestor_respaldos = GestorRespaldos(RUTA_RESPALDOS,
+                                   completo_cada=int(os.environ.get('RESPALDO_COMPLETO_CADA', '24')),
+                                   cadenas=int(os.environ.get('RESPALDOS_CADENAS', '3')))
+_temporizador_respaldo = None
+_cerrojo_temporizador_respaldo = threading.Lock()
+metricas.histograma('respaldo_duracion_segundos', 'Duración de cada respaldo incremental.')
+metricas.contador('respaldos_total', 'Respaldos por resultado (escrito/sin_cambios/error).')
+
+def capturar_particion(usuario):
+    """Foto fija (version, cultivos, borrados) de la partición; el cerrojo solo cubre las copias."""
+    particion = datos_de(usuario)
+    with particion.cerrojo:
+        cultivos = list(particion.cultivos())
+        borrados = cargar_borrados(particion)
+        borrados = dict(borrados, borrados=list(borrados['borrados']))
+    return version_actual(cultivos, borrados), cultivos, borrados
+
+def tomar_respaldo():
+    """Escribe un respaldo con lo cambiado desde el anterior; devuelve su ruta o None."""
+    inicio = time.perf_counter()
+    with cerrojo_datos:
+        usuarios = list(cargar_datos(RUTA_DATOS_USUARIOS))
+    ruta = gestor_respaldos.crear(usuarios, list(usuarios_con_particion()), capturar_particion)
+    metricas.observar('respaldo_duracion_segundos', time.perf_counter() - inicio)
+    metricas.incrementar('respaldos_total', resultado='escrito' if ruta else 'sin_cambios')
+    return ruta
+
+def ejecutar_respaldo_programado():
+    global _temporizador_respaldo
+    with _cerrojo_temporizador_respaldo:
+        _temporizador_respaldo = None
+    try:
+        tomar_respaldo()
+    except OSError:
+        metricas.incrementar('respaldos_total', resultado='error')
+        app.logger.exception('Fallo al escribir el respaldo en %s', RUTA_RESPALDOS)
+
+def programar_respaldo():
+    """Tras un cambio: arma el respaldo si no había uno pendiente (no se retrasa con más escrituras)."""
+    global _temporizador_respaldo
+    if INTERVALO_RESPALDO <= 0:
+        return
+    with _cerrojo_temporizador_respaldo:
+        if _temporizador_respaldo is not None:
+            return
+        _temporizador_respaldo = threading.Timer(INTERVALO_RESPALDO, ejecutar_respaldo_programado)
+        _temporizador_respaldo.daemon = True
+        _temporizador_respaldo.start()
+
+def respaldar_pendiente():
+    """Al apagar la máquina: si hay un respaldo programado, lo hace ya."""
+    global _temporizador_respaldo
+    with _cerrojo_temporizador_respaldo:
+        pendiente, _temporizador_respaldo = _temporizador_respaldo, None
+    if pendiente is not None:
+        pendiente.cancel()
+        ejecutar_respaldo_programado()
+
+atexit.register(respaldar_pendiente)
+
+# --- Índices en Memoria ---
+# Uno de cada tipo por partición (ver DatosUsuario).
+
+def obtener_ranking(usuario):
+    """Devuelve el ranking por margen sincronizado con los datos actuales del usuario."""
+    particion = datos_de(usuario)
+    return particion.ranking.sincronizar(particion.cultivos())
+
+def obtener_indice_ocupacion(usuario):
+    """Devuelve el índice de ocupación sincronizado con los datos actuales del usuario."""
+    particion = datos_de(usuario)
+    return particion.ocupacion.sincronizar(particion.cultivos())
+
+def buscar_cultivos(usuario, args):
+    """Búsqueda de texto en nombre, notas y zona (?q=&limite=)."""
+    limite = leer_parametro_k(args.get('limite'), por_defecto=20)
+    particion = datos_de(usuario)
+    return particion.texto.sincronizar(particion.cultivos()).buscar(args.get('q', ''), limite)
+
+MAX_DIAS_LINEA_TIEMPO = 731
+
+def leer_fecha(valor, por_defecto):
+    """Convierte un parámetro 'YYYY-MM-DD' a ordinal; lanza ValueError si no es válido."""
+    if valor in (None, ''):
+        return por_defecto
+    ordinal = fecha_a_ordinal(valor)
+    if ordinal is None:
+        raise ValueError(f'Fecha inválida: {valor}')
+    return ordinal
+
+def ocupacion_en_fecha(usuario, args):
+    """Qué cultivos ocupan cada zona (o la zona pedida) en ?fecha= (hoy por defecto)."""
+    dia = leer_fecha(args.get('fecha'), date.today().toordinal())
+    indice = obtener_indice_ocupacion(usuario)
+    zonas = [args['zona']] if args.get('zona') is not None else indice.zonas()
+    return {
+        'fecha': date.fromordinal(dia).isoformat(),
+        'zonas': {zona: indice.ocupantes(zona, dia) for zona in zonas},
+    }
+
+def linea_tiempo_ocupacion(usuario, args):
+    """Cultivos y ocupación por día de cada zona entre ?desde= y ?hasta= (30 días por defecto)."""
+    desde = leer_fecha(args.get('desde'), date.today().toordinal())
+    hasta = leer_fecha(args.get('hasta'), desde + 30)
+    if not 0 <= hasta - desde < MAX_DIAS_LINEA_TIEMPO:
+        raise ValueError(f'El rango debe tener entre 1 y {MAX_DIAS_LINEA_TIEMPO} días')
+    capacidad = args.get('capacidad')
+    capacidad = int(capacidad) if capacidad not in (None, '') else None
+
+    indice = obtener_indice_ocupacion(usuario)
+    zonas = [args['zona']] if args.get('zona') is not None else indice.zonas()
+    resultado = {}
+    for zona in zonas:
+        ocupacion = indice.ocupacion_diaria(zona, desde, hasta)
+        resultado[zona] = {
+            'cultivos': indice.ocupantes(zona, desde, hasta),
+            'ocupacion_diaria': ocupacion.tolist(),
+        }
+        if capacidad is not None:
+            resultado[zona]['libre_diario'] = (capacidad - ocupacion).clip(min=0).tolist()
+    return {
+        'desde': date.fromordinal(desde).isoformat(),
+        'hasta': date.fromordinal(hasta).isoformat(),
+        'zonas': resultado,
+    }
+
+def leer_parametro_k(valor, por_defecto=5, maximo=100):
+    """Valida un parámetro entero como ?k= o ?limite= (entre 1 y `maximo`); lanza ValueError si no es válido."""
+    k = por_defecto if valor in (None, '') else int(valor)
+    if not 1 <= k <= maximo:
+        raise ValueError(f'k debe estar entre 1 y {maximo}')
+    return k
+
+# --- Rutas de Observabilidad ---
+
+@app.route('/metrics', methods=['GET'])
+def exponer_metricas():
+    """Expone las métricas en formato texto de Prometheus."""
+    response = make_response(metricas.exportar())
+    response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+    return response
+
+@app.route('/debug/perfil', methods=['GET'])
+def volcar_perfil():
+    """Devuelve las pilas plegadas de las peticiones lentas (flamegraph.pl / speedscope)."""
+    if not PERFILADOR_ACTIVO:
+        return jsonify({'message': 'Perfilador desactivado (PERFILADOR_ACTIVO=1)'}), 404
+    reiniciar = request.args.get('reiniciar') == '1'
+    response = make_response(perfilador.volcar(reiniciar=reiniciar))
+    response.headers['Content-Type'] = 'text/plain; charset=utf-8'
+    return response
+
+@app.route('/salud/listo', methods=['GET'])
+def comprobar_listo():
+    """Readiness: indica si los datos ya están precargados en memoria."""
+    estado = dict(estado_arranque, pid_worker=os.getpid())
+    return jsonify(estado), 200 if estado_arranque['listo'] else 503
+
 # --- Rutas del Frontend (Servir la Interfaz de Usuario) ---
 
 @app.route('/', methods=['GET'])
@@ -98,16 +935,8 @@ def servir_recursos(path):
 @app.route('/auth/register', methods=['POST'])
 def register():
     """Endpoint para registrar un nuevo usuario."""
-    data = request.json
-    usuarios = cargar_datos(RUTA_DATOS_USUARIOS)
-    
-    if any(u['username'] == data['username'] for u in usuarios):
+    if not registrar_usuario(request.json):
         return jsonify({'message': 'El usuario ya existe'}), 400
-    
-    # Nota: No necesitamos ID para el usuario.
-    usuarios.append(data)
-    guardar_datos(usuarios, RUTA_DATOS_USUARIOS)
-    
     return jsonify({'message': 'Registro exitoso'}), 201
 
 @app.route('/auth/login', methods=['POST'])
@@ -117,24 +946,13 @@ def login():
     username = data.get('username')
     password = data.get('password')
     
-    usuarios = cargar_datos(RUTA_DATOS_USUARIOS)
-    user = next((u for u in usuarios if u['username'] == username and u['password'] == password), None)
-    
-    if user:
-        token_payload = {
-            'username': username,
-            'exp': datetime.utcnow() + timedelta(hours=24)
-        }
-        token = jwt.encode(token_payload, app.config['SECRET_KEY'], algorithm="HS256")
-        
+    if validar_credenciales(username, password):
         response = make_response(jsonify({'message': 'Inicio de sesión exitoso'}))
         response.set_cookie(
             'token', 
-            token, 
-            httponly=True, 
-            secure=True, 
-            samesite='None', # CRÍTICO para CORS
-            expires=datetime.now() + timedelta(hours=24)
+            generar_token(username), 
+            expires=datetime.now() + timedelta(hours=24),
+            **OPCIONES_COOKIE
         )
         return response, 200
     
@@ -144,64 +962,166 @@ def login():
 def logout():
     """Endpoint para cerrar sesión."""
     response = make_response(jsonify({'message': 'Sesión cerrada'}))
-    response.set_cookie(
-        'token', 
-        '', 
-        httponly=True, 
-        secure=True, 
-        samesite='None',
-        expires=0
-    )
+    response.set_cookie('token', '', expires=0, **OPCIONES_COOKIE)
     return response, 200
 
 # --- Rutas de API (CRUD de Cultivos) ---
 
 @app.route('/api/v1/cultivos', methods=['GET'])
 @token_required
-def obtener_cultivos():
+def obtener_cultivos(usuario):
     """Obtiene la lista completa de cultivos."""
-    cultivos = cargar_datos(RUTA_DATOS_CULTIVOS)
-    return jsonify(cultivos)
+    # El ID se lee antes que los datos: el cliente puede recibir algún evento
+    # repetido al conectarse al stream SSE, pero nunca perder uno.
+    bus = datos_de(usuario).bus
+    ultimo_evento = bus.ultimo_id
+    response = jsonify(listar_cultivos(usuario))
+    response.headers['X-Ultimo-Evento'] = bus.id_sse(ultimo_evento)
+    return response
+
+@app.route('/api/v1/cultivos/exportar', methods=['GET'])
+@token_required
+def exportar_cultivos(usuario):
+    """Descarga los cultivos como JSON con sangría (el formato en disco es compacto)."""
+    response = make_response(a_json(listar_cultivos(usuario), legible=True))
+    response.headers['Content-Type'] = 'application/json; charset=utf-8'
+    response.headers['Content-Disposition'] = 'attachment; filename=cultivos.json'
+    return response
+
+@app.route('/api/v1/cultivos/top', methods=['GET'])
+@token_required
+def top_cultivos(usuario):
+    """Top-K de cultivos con mayor margen potencial, opcionalmente por zona."""
+    try:
+        k = leer_parametro_k(request.args.get('k'))
+    except ValueError:
+        return jsonify({'message': 'Parámetro k inválido (entero entre 1 y 100)'}), 400
+    return jsonify(obtener_ranking(usuario).top(k, request.args.get('zona')))
+
+@app.route('/api/v1/cultivos/search', methods=['GET'])
+@token_required
+def buscar(usuario):
+    """Busca cultivos por texto, sin tildes ni mayúsculas y con prefijos (?q=)."""
+    try:
+        return jsonify(buscar_cultivos(usuario, request.args))
+    except ValueError:
+        return jsonify({'message': 'Parámetro limite inválido (entero entre 1 y 100)'}), 400
+
+@app.route('/api/v1/ocupacion', methods=['GET'])
+@token_required
+def ocupacion(usuario):
+    """Cultivos que ocupan cada zona en una fecha (?fecha=&zona=)."""
+    try:
+        return jsonify(ocupacion_en_fecha(usuario, request.args))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+@app.route('/api/v1/ocupacion/linea_tiempo', methods=['GET'])
+@token_required
+def linea_tiempo(usuario):
+    """Ocupación diaria por zona en un rango (?desde=&hasta=&zona=&capacidad=)."""
+    try:
+        return jsonify(linea_tiempo_ocupacion(usuario, request.args))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+@app.route('/api/v1/cultivos/cambios', methods=['GET'])
+@token_required
+def cambios_cultivos(usuario):
+    """Cambios posteriores a una versión (?desde=), para clientes sincronizados."""
+    try:
+        desde = int(request.args.get('desde', 0))
+    except ValueError:
+        return jsonify({'message': 'Parámetro desde inválido (entero)'}), 400
+    return jsonify(cambios_desde(usuario, desde))
+
+@app.route('/api/v1/cultivos/lote', methods=['POST'])
+@token_required
+def lote_cultivos(usuario):
+    """Aplica un lote de altas, cambios y bajas con una sola escritura."""
+    try:
+        operaciones = leer_lote(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    return jsonify(aplicar_lote(usuario, operaciones))
 
 @app.route('/api/v1/cultivos', methods=['POST'])
 @token_required
-def crear_cultivo():
+def crear_cultivo(usuario):
     """Crea un nuevo cultivo y lo guarda en el volumen persistente."""
-    data = request.json
-    cultivos = cargar_datos(RUTA_DATOS_CULTIVOS)
-    
-    data['id'] = get_next_id(cultivos)
-    cultivos.append(data)
-    guardar_datos(cultivos, RUTA_DATOS_CULTIVOS)
-    
-    return jsonify(data), 201
+    return jsonify(insertar_cultivo(usuario, request.json)), 201
 
 @app.route('/api/v1/cultivos/<int:cultivo_id>', methods=['PUT'])
 @token_required
-def actualizar_cultivo(cultivo_id):
+def actualizar_cultivo(usuario, cultivo_id):
     """Actualiza un cultivo existente."""
-    updates = request.json
-    cultivos = cargar_datos(RUTA_DATOS_CULTIVOS)
-    
-    for i, cultivo in enumerate(cultivos):
-        if cultivo.get('id') == cultivo_id:
-            # Mantener el ID original, actualizar el resto
-            updates.pop('id', None) 
-            cultivos[i].update(updates)
-            guardar_datos(cultivos, RUTA_DATOS_CULTIVOS)
-            return jsonify({'message': f'Cultivo {cultivo_id} actualizado', 'cultivo': cultivos[i]}), 200
-    
-    return jsonify({'message': 'Cultivo no encontrado'}), 404
+    cultivo = modificar_cultivo(usuario, cultivo_id, request.json)
+    if cultivo is None:
+        return jsonify({'message': 'Cultivo no encontrado'}), 404
+    return jsonify({'message': f'Cultivo {cultivo_id} actualizado', 'cultivo': cultivo}), 200
 
 @app.route('/api/v1/cultivos/<int:cultivo_id>', methods=['DELETE'])
 @token_required
-def eliminar_cultivo(cultivo_id):
+def eliminar_cultivo(usuario, cultivo_id):
     """Elimina un cultivo."""
-    cultivos = cargar_datos(RUTA_DATOS_CULTIVOS)
-    cultivos = [c for c in cultivos if c.get('id') != cultivo_id]
-    guardar_datos(cultivos, RUTA_DATOS_CULTIVOS)
-    
+    borrar_cultivo(usuario, cultivo_id)
     return jsonify({'message': f'Cultivo {cultivo_id} eliminado'}), 200
 
+# --- Eventos en Tiempo Real (SSE) ---
+# Cada stream ocupa un hilo del worker (gthread, ver gunicorn.conf.py) mientras
+# está abierto. Para que los dashboards no se queden con todos los hilos, y el
+# health check de Fly.io siga respondiendo, en este modo:
+#   - hay como mucho MAX_STREAMS_SINCRONOS streams abiertos por proceso;
+#   - cada stream se cierra a los DURACION_STREAM_SINCRONO segundos y el
+#     navegador reconecta solo enviando Last-Event-ID (sin perder eventos).
+# El modo asíncrono (app_asgi.py) no ocupa hilos y mantiene el stream abierto.
+MAX_STREAMS_SINCRONOS = int(os.environ.get('MAX_STREAMS_SINCRONOS', '8'))
+DURACION_STREAM_SINCRONO = float(os.environ.get('DURACION_STREAM_SINCRONO', '20'))
+streams_sincronos = threading.BoundedSemaphore(MAX_STREAMS_SINCRONOS)
+
+def ultimo_id_evento(bus):
+    """Lee el último ID recibido por el cliente (Last-Event-ID o ?desde=)."""
+    valor = request.headers.get('Last-Event-ID') or request.args.get('desde')
+    if not valor:
+        # Cliente nuevo: solo recibe los cambios a partir de ahora
+        return bus.ultimo_id
+    return bus.leer_id_sse(valor)
+
+@app.route('/api/v1/cultivos/eventos', methods=['GET'])
+@token_required
+def eventos_cultivos(usuario):
+    """Stream SSE de altas, cambios y bajas de cultivos."""
+    bus = datos_de(usuario).bus
+    ultimo = ultimo_id_evento(bus)
+    if not streams_sincronos.acquire(blocking=False):
+        return jsonify({'message': 'Demasiados streams de eventos abiertos, reintenta en 5 s'}), 503, \
+            {'Retry-After': '5'}
+
+    def generar(ultimo):
+        fin = time.monotonic() + DURACION_STREAM_SINCRONO
+        yield SSE_REINTENTO
+        while True:
+            restante = fin - time.monotonic()
+            if restante <= 0:
+                return  # El navegador reconecta con Last-Event-ID
+            eventos = bus.esperar(ultimo, timeout=min(15.0, restante))
+            if eventos is None:
+                ultimo = bus.ultimo_id
+                yield formatear_reinicio(bus)
+            elif not eventos:
+                yield SSE_LATIDO
+            for evento in eventos or []:
+                ultimo = evento['id']
+                yield formatear_sse(evento, bus)
+
+    response = Response(stream_with_context(generar(ultimo)), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # El hueco se libera al cerrarse la respuesta, aunque el cliente corte antes de empezar
+    response.call_on_close(streams_sincronos.release)
+    return response
+
+# Precarga al importar el módulo (en el maestro de gunicorn si se usa --preload)
+precargar_datos()
+
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
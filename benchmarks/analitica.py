@@ -0,0 +1,85 @@
+# benchmarks/analitica.py
+# Mide el cruce ventas/cultivos de analitica.py con un CSV sintético grande:
+#   - Lectura del CSV (tipos categóricos).
+#   - Agregado de ventas + cruce (primera llamada, sin caché).
+#   - Nuevo cruce tras cambiar los cultivos (reutiliza el agregado de ventas).
+#   - Llamada repetida con las mismas versiones (caché), con versión explícita
+#     o calculada por hash del contenido de los cultivos.
+#
+# Uso:  python benchmarks/analitica.py [filas_de_ventas] [numero_de_cultivos]
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analitica  # noqa: E402
+
+PRODUCTOS = ["Tomate", "Tomates", "Lechuga", "Pimiento Amarillo", "Espinacas",
+             "Zanahoria", "Calabacín", "calabacin", "Berenjena", "Pepino"]
+MESES = list(analitica.MESES)
+ZONAS = ["Zona A", "Zona B", "Invernadero", "Exterior"]
+
+
+def generar_ventas(filas, ruta, semilla=42):
+    aleatorio = np.random.default_rng(semilla)
+    pd.DataFrame({
+        "Mes": np.array([m.capitalize() for m in MESES])[aleatorio.integers(0, 12, filas)],
+        "Producto": np.array(PRODUCTOS)[aleatorio.integers(0, len(PRODUCTOS), filas)],
+        "Cantidad_Vendida": aleatorio.integers(1, 2000, filas),
+        "Venta_Total": aleatorio.uniform(1, 3000, filas).round(2),
+        "Region": np.array(["Norte", "Sur", "Centro"])[aleatorio.integers(0, 3, filas)],
+    }).to_csv(ruta, index=False)
+
+
+def generar_cultivos(n, semilla=42):
+    aleatorio = random.Random(semilla)
+    return [{
+        "id": i,
+        "nombre": aleatorio.choice(PRODUCTOS) + aleatorio.choice(["", " Cherry", " Pera"]),
+        "zona": aleatorio.choice(ZONAS),
+        "fecha_cosecha": f"2026-{aleatorio.randint(1, 12):02d}-{aleatorio.randint(1, 28):02d}",
+        "precio_compra": round(aleatorio.uniform(10, 500), 2),
+        "precio_venta": round(aleatorio.uniform(10, 2000), 2),
+    } for i in range(1, n + 1)]
+
+
+def cronometrar(funcion):
+    inicio = time.perf_counter()
+    resultado = funcion()
+    return (time.perf_counter() - inicio) * 1000, resultado
+
+
+def main():
+    filas = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    n_cultivos = int(sys.argv[2]) if len(sys.argv) > 2 else 10_000
+
+    ruta = os.path.join(tempfile.mkdtemp(prefix='analitica_'), 'ventas.csv')
+    generar_ventas(filas, ruta)
+    cultivos = generar_cultivos(n_cultivos)
+    analisis = analitica.AnalisisMargenReal()
+
+    print(f"Ventas: {filas:,} filas ({os.path.getsize(ruta) / 1e6:.1f} MB)  |  cultivos: {n_cultivos:,}\n")
+    ms, _ = cronometrar(lambda: analitica.leer_ventas(ruta))
+    print(f"{'lectura CSV':42} {ms:>10.1f} ms")
+    ms, resultado = cronometrar(lambda: analisis.calcular(ruta, cultivos, version_cultivos=1))
+    print(f"{'primer cruce (lectura + agregado + join)':42} {ms:>10.1f} ms  -> {len(resultado):,} filas")
+    cultivos[0] = dict(cultivos[0], precio_venta=cultivos[0]['precio_venta'] + 1)
+    ms, _ = cronometrar(lambda: analisis.calcular(ruta, cultivos, version_cultivos=2))
+    print(f"{'cruce tras cambiar cultivos':42} {ms:>10.1f} ms")
+    ms, _ = cronometrar(lambda: analisis.calcular(ruta, cultivos, version_cultivos=2))
+    print(f"{'llamada repetida (caché)':42} {ms:>10.3f} ms")
+    ms, _ = cronometrar(lambda: analisis.calcular(ruta, cultivos))
+    print(f"{'cruce con versión por hash de cultivos':42} {ms:>10.1f} ms")
+    ms, _ = cronometrar(lambda: analisis.calcular(ruta, cultivos))
+    print(f"{'repetida con versión por hash (caché)':42} {ms:>10.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
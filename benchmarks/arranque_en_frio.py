@@ -0,0 +1,128 @@
+# benchmarks/arranque_en_frio.py
+# Mide el tiempo hasta el primer byte (TTFB) tras arrancar gunicorn desde
+# cero, como ocurre cuando Fly.io despierta una máquina parada. Compara:
+#   1. Sin precarga (la app se importa en el worker, datos parseados del JSON).
+#   2. Precarga en el maestro, datos parseados del JSON.
+#   3. Precarga en el maestro, datos cargados desde la instantánea binaria (mmap).
+# No incluye el arranque del contenedor, que depende de Fly.io.
+#
+# Uso:  python benchmarks/arranque_en_frio.py [numero_de_registros] [repeticiones]
+
+import http.client
+import json
+import os
+import random
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def generar_cultivos(n, semilla=42):
+    aleatorio = random.Random(semilla)
+    return [{
+        "id": i,
+        "nombre": f"Cultivo {i}",
+        "fecha_siembra": f"2025-{aleatorio.randint(1, 12):02d}-{aleatorio.randint(1, 28):02d}",
+        "fecha_cosecha": f"2026-{aleatorio.randint(1, 12):02d}-{aleatorio.randint(1, 28):02d}",
+        "notas": aleatorio.choice(["", "Requiere tutorado", "Riego por goteo"]),
+        "zona": aleatorio.choice(["Zona A", "Zona B", "Invernadero", "Exterior"]),
+        "precio_compra": round(aleatorio.uniform(10, 500), 2),
+        "precio_venta": round(aleatorio.uniform(10, 2000), 2),
+        "dias_alerta": aleatorio.randint(0, 14),
+    } for i in range(1, n + 1)]
+
+
+def pedir(puerto, ruta, cookie=None):
+    """Hace un GET y devuelve (segundos hasta la cabecera de respuesta, estado, cuerpo)."""
+    conexion = http.client.HTTPConnection('127.0.0.1', puerto, timeout=30)
+    cabeceras = {'Cookie': f'token={cookie}'} if cookie else {}
+    inicio = time.perf_counter()
+    conexion.request('GET', ruta, headers=cabeceras)
+    respuesta = conexion.getresponse()
+    ttfb = time.perf_counter() - inicio
+    cuerpo = respuesta.read()
+    conexion.close()
+    return ttfb, respuesta.status, cuerpo
+
+
+def medir_arranque(directorio, precarga, token):
+    puerto = puerto_libre()
+    entorno = dict(os.environ, RUTA_PERSISTENCIA=directorio,
+                   GUNICORN_PRECARGA='1' if precarga else '0')
+    inicio = time.perf_counter()
+    proceso = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'app_backend:app',
+         '--bind', f'127.0.0.1:{puerto}', '--workers', '1', '--log-level', 'warning'],
+        cwd=RAIZ, env=entorno)
+    try:
+        while True:
+            try:
+                _, estado, _ = pedir(puerto, '/')
+                break
+            except (ConnectionRefusedError, ConnectionResetError, http.client.RemoteDisconnected):
+                time.sleep(0.005)
+        primer_byte_index = time.perf_counter() - inicio
+        ttfb_api, estado_api, _ = pedir(puerto, '/api/v1/cultivos', cookie=token)
+        primer_byte_api = time.perf_counter() - inicio
+        _, _, listo = pedir(puerto, '/salud/listo')
+        if estado_api != 200:
+            raise RuntimeError(f'/api/v1/cultivos devolvió {estado_api}')
+        return primer_byte_index, ttfb_api, primer_byte_api, json.loads(listo)
+    finally:
+        proceso.send_signal(signal.SIGTERM)
+        proceso.wait(timeout=30)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    repeticiones = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    directorio = tempfile.mkdtemp(prefix='arranque_')
+    # Importamos la app con el directorio aún vacío solo para firmar el token
+    os.environ['RUTA_PERSISTENCIA'] = directorio
+    sys.path.insert(0, RAIZ)
+    import app_backend
+    token = app_backend.generar_token('benchmark')
+
+    # Partición del usuario del token (app_backend guarda los cultivos por usuario)
+    ruta_json = app_backend.datos_de('benchmark').ruta_cultivos
+    os.makedirs(os.path.dirname(ruta_json), exist_ok=True)
+    with open(ruta_json, 'w') as f:
+        json.dump(generar_cultivos(n), f, separators=(',', ':'))
+    ruta_bin = app_backend.ruta_instantanea(ruta_json)
+
+    escenarios = [
+        ('sin precarga (JSON)', False, True),
+        ('precarga (JSON)', True, True),
+        ('precarga (instantánea mmap)', True, False),
+    ]
+    print(f"Registros: {n}  |  repeticiones: {repeticiones}\n")
+    print(f"{'Escenario':30} {'TTFB / (ms)':>12} {'TTFB API (ms)':>14} {'API desde arranque (ms)':>24} {'origen':>12}")
+    for nombre, precarga, borrar_instantanea in escenarios:
+        resultados = []
+        for _ in range(repeticiones):
+            if borrar_instantanea and os.path.exists(ruta_bin):
+                os.remove(ruta_bin)
+            resultados.append(medir_arranque(directorio, precarga, token))
+        origen = resultados[-1][3]['origen'].get('benchmark/cultivos.json', '-')
+        print(f"{nombre:30} "
+              f"{statistics.median(r[0] for r in resultados) * 1000:>12.1f} "
+              f"{statistics.median(r[1] for r in resultados) * 1000:>14.1f} "
+              f"{statistics.median(r[2] for r in resultados) * 1000:>24.1f} "
+              f"{origen:>12}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+# benchmarks/busqueda.py
+# Mide la búsqueda de texto (indices.IndiceTexto) con muchos cultivos:
+#   - construcción del índice (lo que ahora se hace en la precarga);
+#   - primera consulta de cada término (crea sus arrays de IDs y pesos) y
+#     consultas repetidas con la caché de resultados vacía.
+#
+# Uso:  python benchmarks/busqueda.py [numero_de_registros]
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from indices import IndiceTexto  # noqa: E402
+
+ZONAS = ["Zona A", "Zona B", "Invernadero 1", "Exterior"]
+NOMBRES = ["Tomate", "Lechuga", "Pimiento Amarillo", "Pepino", "Zanahoria", "Calabacín", "Cebolla"]
+NOTAS = ["", "Requiere tutorado", "Riego por goteo", "Poda semanal", "Revisar plagas"]
+CONSULTAS = ["tomate", "tutorado", "requiere tut", "l", "lo", "lote1", "tomate ch", "zanahoria zona a lote9"]
+
+
+def generar_cultivos(n, semilla=42):
+    aleatorio = random.Random(semilla)
+    return [{
+        "id": i,
+        "nombre": f"{aleatorio.choice(NOMBRES)} {aleatorio.choice(['Cherry', 'Pera', 'Roma', ''])} lote{i}",
+        "zona": aleatorio.choice(ZONAS),
+        "notas": aleatorio.choice(NOTAS),
+    } for i in range(1, n + 1)]
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    cultivos = generar_cultivos(n)
+
+    inicio = time.perf_counter()
+    indice = IndiceTexto().sincronizar(cultivos)
+    print(f"Registros: {n}  |  construcción del índice: {time.perf_counter() - inicio:.2f} s\n")
+
+    print(f"{'Consulta':26} {'Resultados':>10} {'1ª (ms)':>10} {'Mejor (ms)':>11}")
+    for consulta in CONSULTAS:
+        tiempos = []
+        for _ in range(5):
+            indice._cache_consultas.clear()
+            inicio = time.perf_counter()
+            resultado = indice.buscar(consulta, 20)
+            tiempos.append(time.perf_counter() - inicio)
+        print(f"{consulta!r:26} {len(resultado):>10} {tiempos[0] * 1000:>10.2f} {min(tiempos) * 1000:>11.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+# benchmarks/carga_cultivos.py
+# Compara la carga de cultivos.json de la app de escritorio:
+#   - antes:  json.load del archivo entero + strptime/float/int y un Cultivo por
+#             registro (el bucle que tenía cultivos.cargar_cultivos).
+#   - ahora:  carga_cultivos.cargar_archivo (lectura por bloques con raw_decode,
+#             fromisoformat memorizado, GC en pausa y errores por registro).
+# cultivos.py necesita tkinter, así que se usa una clase con el mismo __init__.
+#
+# Uso:  python benchmarks/carga_cultivos.py [numero_de_registros] [porcentaje_invalidos]
+
+import datetime
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import carga_cultivos  # noqa: E402
+
+
+class CultivoAnterior:
+    def __init__(self, nombre, fecha_siembra, fecha_cosecha, notas="", zona="", precio_compra=0.0, precio_venta=0.0, dias_alerta=0, clave=None):
+        self.nombre = nombre
+        self.fecha_siembra = fecha_siembra
+        self.fecha_cosecha = fecha_cosecha
+        self.notas = notas
+        self.zona = zona
+        self.precio_compra = precio_compra
+        self.precio_venta = precio_venta
+        self.dias_alerta = dias_alerta
+        self.clave = clave
+
+
+class Cultivo:
+    """Como cultivos.Cultivo, ahora con __slots__."""
+    __slots__ = ('nombre', 'fecha_siembra', 'fecha_cosecha', 'notas', 'zona',
+                 'precio_compra', 'precio_venta', 'dias_alerta', 'clave')
+
+    def __init__(self, nombre, fecha_siembra, fecha_cosecha, notas="", zona="", precio_compra=0.0, precio_venta=0.0, dias_alerta=0, clave=None):
+        self.nombre = nombre
+        self.fecha_siembra = fecha_siembra
+        self.fecha_cosecha = fecha_cosecha
+        self.notas = notas
+        self.zona = zona
+        self.precio_compra = precio_compra
+        self.precio_venta = precio_venta
+        self.dias_alerta = dias_alerta
+        self.clave = clave
+
+
+def validar_fecha(fecha_texto):
+    try:
+        return datetime.datetime.strptime(fecha_texto, '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+
+def carga_anterior(ruta):
+    """El bucle original: aborta en el primer registro con un número inválido."""
+    lista = []
+    with open(ruta, "r") as f:
+        registros = [(None, item) for item in json.load(f)]
+    for clave, item in registros:
+        siembra = validar_fecha(item.get("fecha_siembra") or "")
+        cosecha = validar_fecha(item.get("fecha_cosecha") or "")
+        notas = item.get("notas", "")
+        zona = item.get("zona", "")
+        precio_compra = float(item.get("precio_compra", 0.0))
+        precio_venta = float(item.get("precio_venta", 0.0))
+        dias_alerta = int(item.get("dias_alerta", 0))
+        if siembra and cosecha:
+            lista.append(CultivoAnterior(item.get("nombre", ""), siembra, cosecha, notas, zona,
+                                 precio_compra, precio_venta, dias_alerta, clave))
+    return lista
+
+
+def generar(n, porcentaje_invalidos, ruta, semilla=42):
+    aleatorio = random.Random(semilla)
+    inicio = datetime.date(2024, 1, 1)
+    registros = []
+    for i in range(n):
+        siembra = inicio + datetime.timedelta(days=aleatorio.randint(0, 700))
+        registro = {
+            "nombre": aleatorio.choice(["Tomate", "Lechuga", "Pimiento", "Pepino"]) + f" {i}",
+            "fecha_siembra": siembra.isoformat(),
+            "fecha_cosecha": (siembra + datetime.timedelta(days=aleatorio.randint(30, 150))).isoformat(),
+            "notas": "riego por goteo" if i % 3 else "",
+            "zona": aleatorio.choice(["Zona A", "Zona B", "Invernadero"]),
+            "precio_compra": round(aleatorio.uniform(10, 500), 2),
+            "precio_venta": round(aleatorio.uniform(10, 2000), 2),
+            "dias_alerta": aleatorio.randint(0, 10),
+        }
+        if aleatorio.random() * 100 < porcentaje_invalidos:
+            registro["fecha_cosecha"] = "2025-02-30"
+        registros.append(registro)
+    with open(ruta, "w") as f:
+        json.dump(registros, f, indent=4)
+
+
+def medir(funcion, repeticiones=3):
+    mejor, pico = float('inf'), 0
+    for _ in range(repeticiones):
+        carga_cultivos.fecha_iso.cache_clear()
+        inicio = time.perf_counter()
+        resultado = funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    tracemalloc.start()
+    funcion()
+    pico = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return mejor * 1000, pico / 1e6, resultado
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    porcentaje_invalidos = float(sys.argv[2]) if len(sys.argv) > 2 else 0.0
+    ruta = os.path.join(tempfile.mkdtemp(prefix='carga_'), 'cultivos.json')
+    generar(n, porcentaje_invalidos, ruta)
+    print(f"{n:,} registros ({os.path.getsize(ruta) / 1e6:.1f} MB), {porcentaje_invalidos}% con fecha inválida\n")
+
+    ms, mb, lista = medir(lambda: carga_anterior(ruta))
+    print(f"{'antes (json.load + strptime)':34} {ms:9.1f} ms   pico {mb:7.1f} MB   {len(lista):,} cultivos")
+    ms, mb, (lista, errores) = medir(lambda: carga_cultivos.cargar_archivo(ruta, Cultivo))
+    print(f"{'ahora (bloques + fromisoformat)':34} {ms:9.1f} ms   pico {mb:7.1f} MB   "
+          f"{len(lista):,} cultivos, {len(errores):,} errores")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+# benchmarks/serializacion.py
+# Compara bytes y tiempo de serialización por cada 10.000 cultivos:
+#   - En disco: json.dump(indent=4) (formato anterior) frente a JSON compacto.
+#   - En la red: cuerpo sin comprimir frente a gzip y brotli.
+#
+# Uso:  python benchmarks/serializacion.py [numero_de_registros]
+
+import gzip
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import serializacion  # noqa: E402
+
+ZONAS = ["Zona A", "Zona B", "Zona C", "Zona D", "Invernadero", "Exterior"]
+NOMBRES = ["Tomate", "Lechuga", "Pimiento Amarillo", "Espinacas", "Zanahoria", "Calabacín"]
+
+
+def generar_cultivos(n, semilla=42):
+    aleatorio = random.Random(semilla)
+    cultivos = []
+    for i in range(1, n + 1):
+        compra = round(aleatorio.uniform(10, 500), 2)
+        cultivos.append({
+            "id": i,
+            "nombre": f"{aleatorio.choice(NOMBRES)} {i}",
+            "fecha_siembra": f"2025-{aleatorio.randint(1, 12):02d}-{aleatorio.randint(1, 28):02d}",
+            "fecha_cosecha": f"2026-{aleatorio.randint(1, 12):02d}-{aleatorio.randint(1, 28):02d}",
+            "notas": aleatorio.choice(["", "Requiere tutorado", "Riego por goteo", "Revisar plagas"]),
+            "zona": aleatorio.choice(ZONAS),
+            "precio_compra": compra,
+            "precio_venta": round(compra * aleatorio.uniform(0.8, 4), 2),
+            "dias_alerta": aleatorio.randint(0, 14),
+        })
+    return cultivos
+
+
+def medir(funcion, repeticiones=5):
+    """Devuelve (mejor tiempo en ms, resultado) de varias repeticiones."""
+    mejor = float('inf')
+    resultado = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor * 1000, resultado
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    cultivos = generar_cultivos(n)
+    escala = 10000 / n
+
+    print(f"Registros: {n}  (resultados normalizados a 10k registros)")
+    print(f"orjson disponible: {'sí' if serializacion.orjson else 'no'}  |  "
+          f"brotli disponible: {'sí' if serializacion.brotli else 'no'}\n")
+
+    print("--- En disco ---")
+    casos = [
+        ("json.dump indent=4 (antes)", lambda: json.dumps(cultivos, indent=4).encode('utf-8')),
+        ("json compacto (stdlib)", lambda: json.dumps(cultivos, separators=(',', ':'),
+                                                      ensure_ascii=False).encode('utf-8')),
+        ("a_json compacto (actual)", lambda: serializacion.a_json(cultivos)),
+    ]
+    print(f"{'Formato':32} {'Bytes':>12} {'ms':>10}")
+    compacto = None
+    for nombre, funcion in casos:
+        ms, datos = medir(funcion)
+        compacto = datos
+        print(f"{nombre:32} {int(len(datos) * escala):>12,} {ms * escala:>10.2f}")
+
+    ms, _ = medir(lambda: serializacion.desde_json(compacto))
+    print(f"{'lectura desde_json (actual)':32} {'':>12} {ms * escala:>10.2f}")
+    ms, _ = medir(lambda: json.loads(compacto))
+    print(f"{'lectura json.loads (stdlib)':32} {'':>12} {ms * escala:>10.2f}")
+
+    print("\n--- En la red (GET /api/v1/cultivos) ---")
+    print(f"{'Codificación':32} {'Bytes':>12} {'ms':>10}")
+    print(f"{'identity':32} {int(len(compacto) * escala):>12,} {0:>10.2f}")
+    ms, datos = medir(lambda: gzip.compress(compacto, compresslevel=6))
+    print(f"{'gzip (nivel 6)':32} {int(len(datos) * escala):>12,} {ms * escala:>10.2f}")
+    if serializacion.brotli:
+        ms, datos = medir(lambda: serializacion.comprimir(compacto, 'br'))
+        print(f"{'brotli (calidad 5)':32} {int(len(datos) * escala):>12,} {ms * escala:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+# carga_cultivos.py
+# Carga masiva de cultivos para la app de escritorio (cultivos.py).
+#   - El JSON se lee por bloques: cada elemento del array se decodifica con
+#     JSONDecoder.raw_decode en cuanto está completo, sin tener el archivo
+#     entero (texto + lista de dicts) en memoria a la vez.
+#   - Las fechas 'YYYY-MM-DD' van por date.fromisoformat (mucho más rápido que
+#     strptime) y se memorizan: en un invernadero se repiten pocas fechas.
+#   - Un registro inválido no aborta la carga: se omite y su error queda en
+#     la lista de errores.
+#
+# No depende de tkinter: cultivos.py le pasa la clase Cultivo como fábrica.
+
+import datetime
+import gc
+import json
+import re
+from functools import lru_cache
+
+TAMANO_BLOQUE = 1 << 20   # Caracteres leídos del archivo en cada bloque
+_ESPACIOS = re.compile(r'[ \t\n\r]*')
+
+# --- Lectura Incremental ---
+
+def leer_registros(ruta, tamano_bloque=TAMANO_BLOQUE):
+    """Itera los elementos del array JSON de `ruta` sin cargar el archivo entero."""
+    decodificador = json.JSONDecoder()
+    with open(ruta, 'r', encoding='utf-8-sig') as f:
+        buffer, pos, descartados, fin = '', 0, 0, False
+        # Qué se espera a continuación: 'inicio' ('['), 'primero' (valor o ']'),
+        # 'valor' (tras una coma) o 'separador' (',' o ']')
+        estado = 'inicio'
+        while True:
+            pos = _ESPACIOS.match(buffer, pos).end()
+            caracter = buffer[pos] if pos < len(buffer) else ''
+            if estado in ('primero', 'valor') and caracter not in ('', ']'):
+                try:
+                    valor, final = decodificador.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    final = None
+                if final is not None:
+                    # Caso habitual: la coma va justo detrás del elemento
+                    if buffer.startswith(',', final):
+                        yield valor
+                        estado, pos = 'valor', final + 1
+                        continue
+                    # Un número cortado por el final del bloque ('12' de '12.5')
+                    # también se decodifica: solo vale si le sigue ',' o ']'
+                    tras_valor = _ESPACIOS.match(buffer, final).end()
+                    if fin or buffer.startswith((',', ']'), tras_valor):
+                        yield valor
+                        estado, pos = 'separador', tras_valor
+                        continue
+                if fin:
+                    raise ValueError(f'JSON inválido cerca del carácter {descartados + pos}')
+                # Elemento incompleto al final del bloque: se reintenta con el siguiente
+                caracter = ''
+            if not caracter:
+                if fin:
+                    if estado == 'inicio':
+                        return  # Archivo vacío: ningún cultivo
+                    raise ValueError('El array JSON de cultivos está incompleto')
+                siguiente = f.read(tamano_bloque)
+                fin = not siguiente
+                descartados += pos
+                buffer, pos = buffer[pos:] + siguiente, 0
+                continue
+            if estado == 'inicio' and caracter == '[':
+                estado = 'primero'
+            elif estado == 'separador' and caracter == ',':
+                estado = 'valor'
+            elif estado in ('primero', 'separador') and caracter == ']':
+                return
+            else:
+                raise ValueError(f'Carácter inesperado {caracter!r} en la posición {descartados + pos}')
+            pos += 1
+
+# --- Conversión de Campos ---
+
+@lru_cache(maxsize=8192)
+def fecha_iso(texto):
+    """Convierte 'YYYY-MM-DD' a date (None si no es válida), con caché."""
+    if len(texto) == 10 and texto[4] == '-' and texto[7] == '-':
+        try:
+            return datetime.date.fromisoformat(texto)
+        except ValueError:
+            return None
+    # Formas que strptime acepta y fromisoformat no (p. ej. '2025-3-7')
+    try:
+        return datetime.datetime.strptime(texto, '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+def convertir_registro(item):
+    """Campos de un cultivo listos para la fábrica; lanza ValueError con el motivo si no vale."""
+    if not isinstance(item, dict):
+        raise ValueError('no es un objeto JSON')
+    siembra, cosecha = item.get('fecha_siembra') or '', item.get('fecha_cosecha') or ''
+    if not isinstance(siembra, str) or not isinstance(cosecha, str):
+        raise ValueError('fechas con formato incorrecto')
+    fecha_siembra, fecha_cosecha = fecha_iso(siembra), fecha_iso(cosecha)
+    if fecha_siembra is None or fecha_cosecha is None:
+        raise ValueError(f'fecha inválida o ausente (siembra={siembra!r}, cosecha={cosecha!r})')
+    try:
+        return (item.get('nombre', ''), fecha_siembra, fecha_cosecha, item.get('notas', ''),
+                item.get('zona', ''), float(item.get('precio_compra', 0.0)),
+                float(item.get('precio_venta', 0.0)), int(item.get('dias_alerta', 0)))
+    except (TypeError, ValueError) as e:
+        raise ValueError(f'número inválido: {e}') from None
+
+# --- Carga Masiva ---
+
+def cargar_registros(registros, fabrica):
+    """
+    Construye un objeto fabrica(*campos, clave) por cada par (clave, item) de
+    `registros`. Devuelve (objetos, errores) con errores = [(número de
+    registro, nombre, motivo)]; los registros con error se omiten.
+    """
+    objetos, errores = [], []
+    # Cientos de miles de dicts y objetos nuevos disparan el recolector de
+    # ciclos una y otra vez sin nada que liberar: se pausa durante la carga.
+    recolector_activo = gc.isenabled()
+    gc.disable()
+    try:
+        for indice, (clave, item) in enumerate(registros, 1):
+            try:
+                campos = convertir_registro(item)
+            except ValueError as e:
+                nombre = item.get('nombre', '') if isinstance(item, dict) else ''
+                errores.append((indice, nombre, str(e)))
+                continue
+            objetos.append(fabrica(*campos, clave))
+    finally:
+        if recolector_activo:
+            gc.enable()
+    return objetos, errores
+
+def cargar_archivo(ruta, fabrica):
+    """Carga un cultivos.json por bloques; ver cargar_registros()."""
+    return cargar_registros(((None, item) for item in leer_registros(ruta)), fabrica)
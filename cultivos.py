@@ -14,10 +14,26 @@ import pandas as pd
 import matplotlib.pyplot as plt
 from sklearn.linear_model import LinearRegression 
 import numpy as np 
+import analitica # Cruce de ventas reales con cultivos (venta real vs estimada)
+import carga_cultivos # Carga masiva de cultivos.json (por bloques, con errores por registro)
+
+# --- IMPORT OPCIONAL PARA SINCRONIZAR CON EL BACKEND (requiere 'requests') ---
+try:
+    import sincronizacion
+except ImportError:
+    sincronizacion = None
 
 # --- CONFIGURACIÓN DE DATOS PERMANENTES ---
 lista_cultivos = []
 NOMBRE_ARCHIVO = "cultivos.json"
+INTERVALO_REFRESCO_MS = 2000 # Cada cuánto se comprueba si llegaron cambios del servidor
+
+# Con CULTIVOS_API_URL/USUARIO/PASSWORD definidas, los cultivos viven en un
+# almacén local sincronizado con app_backend en lugar de en cultivos.json.
+sincronizador = None
+claves_cargadas = [] # Claves del almacén que se mostraron en la lista
+errores_carga_avisados = [] # Últimos registros inválidos avisados (no se repite el aviso en cada refresco)
+MAX_ERRORES_EN_AVISO = 10
 NOMBRE_ARCHIVO_VENTAS = "ventas_mensuales.csv" # Archivo para análisis externo
 
 # --- CONSTANTES DE COLOR PARA EL TEMA OSCURO ---
@@ -35,7 +51,11 @@ COLOR_ALERTA_CLARA = '#FFC107'
 
 class Cultivo:
     """Clase base para guardar la información de un cultivo, incluyendo datos financieros, ubicación y alerta."""
-    def __init__(self, nombre, fecha_siembra, fecha_cosecha, notas="", zona="", precio_compra=0.0, precio_venta=0.0, dias_alerta=0):
+    # Sin __dict__ por instancia: menos memoria y creación más rápida al cargar miles de cultivos
+    __slots__ = ('nombre', 'fecha_siembra', 'fecha_cosecha', 'notas', 'zona',
+                 'precio_compra', 'precio_venta', 'dias_alerta', 'clave')
+
+    def __init__(self, nombre, fecha_siembra, fecha_cosecha, notas="", zona="", precio_compra=0.0, precio_venta=0.0, dias_alerta=0, clave=None):
         self.nombre = nombre
         self.fecha_siembra = fecha_siembra
         self.fecha_cosecha = fecha_cosecha
@@ -44,58 +64,74 @@ class Cultivo:
         self.precio_compra = precio_compra 
         self.precio_venta = precio_venta 
         self.dias_alerta = dias_alerta 
+        self.clave = clave # Clave en el almacén sincronizado (None si no se usa o aún no se guardó)
 
 # --- 2. FUNCIONES DE MANEJO DE ARCHIVOS Y DATOS ---
 
 def validar_fecha(fecha_texto):
     """Convierte texto a un objeto de fecha (YYYY-MM-DD)."""
-    try:
-        return datetime.datetime.strptime(fecha_texto, '%Y-%m-%d').date()
-    except ValueError:
-        return None
+    return carga_cultivos.fecha_iso(fecha_texto)
 
 def cargar_cultivos():
-    """Carga los cultivos desde el archivo JSON, manejando nuevos campos."""
-    global lista_cultivos
+    """Carga los cultivos desde el archivo JSON (o del almacén sincronizado), manejando nuevos campos."""
+    global lista_cultivos, claves_cargadas
     lista_cultivos = []
-    
-    if not os.path.exists(NOMBRE_ARCHIVO):
-        return
+    errores = []
     
     try:
-        with open(NOMBRE_ARCHIVO, "r") as f:
-            datos_cargados = json.load(f)
-            for item in datos_cargados:
-                siembra = validar_fecha(item["fecha_siembra"])
-                cosecha = validar_fecha(item["fecha_cosecha"])
-                notas = item.get("notas", "")
-                zona = item.get("zona", "") 
-                precio_compra = float(item.get("precio_compra", 0.0))
-                precio_venta = float(item.get("precio_venta", 0.0))
-                dias_alerta = int(item.get("dias_alerta", 0)) 
+        if sincronizador is not None:
+            lista_cultivos, errores = carga_cultivos.cargar_registros(sincronizador.almacen.listar(), Cultivo)
+        elif not os.path.exists(NOMBRE_ARCHIVO):
+            return
+        else:
+            # Los registros inválidos (p. ej. creados desde la web sin fechas) se omiten sin abortar la carga
+            lista_cultivos, errores = carga_cultivos.cargar_archivo(NOMBRE_ARCHIVO, Cultivo)
                 
-                if siembra and cosecha:
-                    nuevo = Cultivo(item["nombre"], siembra, cosecha, notas, zona, precio_compra, precio_venta, dias_alerta)
-                    lista_cultivos.append(nuevo)
-                    
-    except Exception as e:
+    except (OSError, ValueError) as e:
         messagebox.showerror("Error de Carga", f"Hubo un error al cargar el archivo: {e}")
+    claves_cargadas = [cultivo.clave for cultivo in lista_cultivos if cultivo.clave]
+    avisar_errores_carga(errores)
+
+def avisar_errores_carga(errores):
+    """Muestra un resumen de los registros omitidos (solo si cambiaron desde el último aviso)."""
+    global errores_carga_avisados
+    if not errores or errores == errores_carga_avisados:
+        errores_carga_avisados = errores
+        return
+    errores_carga_avisados = errores
+    lineas = [f"#{indice} {nombre or '(sin nombre)'}: {motivo}" for indice, nombre, motivo in errores[:MAX_ERRORES_EN_AVISO]]
+    if len(errores) > MAX_ERRORES_EN_AVISO:
+        lineas.append(f"... y {len(errores) - MAX_ERRORES_EN_AVISO} más")
+    messagebox.showwarning("Cultivos omitidos",
+                           f"Se omitieron {len(errores)} cultivos con datos inválidos:\n\n" + "\n".join(lineas))
+
+def cultivo_a_dict(cultivo):
+    """Campos de un cultivo tal y como se guardan en JSON."""
+    return {
+        "nombre": cultivo.nombre,
+        "fecha_siembra": cultivo.fecha_siembra.isoformat(),
+        "fecha_cosecha": cultivo.fecha_cosecha.isoformat(),
+        "notas": cultivo.notas,
+        "zona": cultivo.zona, 
+        "precio_compra": cultivo.precio_compra,
+        "precio_venta": cultivo.precio_venta,
+        "dias_alerta": cultivo.dias_alerta 
+    }
 
 def guardar_cultivos():
     """Guarda la lista de cultivos en el archivo JSON, incluyendo todos los campos."""
-    datos_para_json = []
-    for cultivo in lista_cultivos:
-        cultivo_dict = {
-            "nombre": cultivo.nombre,
-            "fecha_siembra": cultivo.fecha_siembra.isoformat(),
-            "fecha_cosecha": cultivo.fecha_cosecha.isoformat(),
-            "notas": cultivo.notas,
-            "zona": cultivo.zona, 
-            "precio_compra": cultivo.precio_compra,
-            "precio_venta": cultivo.precio_venta,
-            "dias_alerta": cultivo.dias_alerta 
-        }
-        datos_para_json.append(cultivo_dict)
+    global claves_cargadas
+    if sincronizador is not None:
+        # Solo se guarda en local; el hilo de sincronización envía los cambios
+        registros = [(cultivo.clave, cultivo_a_dict(cultivo)) for cultivo in lista_cultivos]
+        claves = sincronizador.almacen.aplicar_vista(registros, claves_cargadas)
+        for cultivo, clave in zip(lista_cultivos, claves):
+            cultivo.clave = clave
+        claves_cargadas = [clave for clave in claves if clave]
+        sincronizador.notificar_cambio_local()
+        return
+
+    datos_para_json = [cultivo_a_dict(cultivo) for cultivo in lista_cultivos]
         
     try:
         with open(NOMBRE_ARCHIVO, "w") as f:
@@ -104,6 +140,23 @@ def guardar_cultivos():
         messagebox.showerror("Error de Guardado", f"No se pudo guardar la información: {e}")
 
 
+def iniciar_sincronizacion():
+    """Activa la sincronización con app_backend si está configurada (variables CULTIVOS_API_*)."""
+    global sincronizador
+    if sincronizacion is None:
+        return
+    nuevo = sincronizacion.crear_desde_entorno()
+    if nuevo is None:
+        return
+    if not nuevo.almacen.existia:
+        # Primera vez: los cultivos de cultivos.json se suben como altas
+        cargar_cultivos()
+        sincronizador = nuevo
+        guardar_cultivos()
+    sincronizador = nuevo
+    sincronizador.iniciar()
+
+
 # --- 3. LA CLASE DE LA APLICACIÓN (TKINTER) ---
 
 class AppCultivos(tk.Tk):
@@ -117,10 +170,28 @@ class AppCultivos(tk.Tk):
         
         self.configurar_estilos() 
         
+        iniciar_sincronizacion()
         cargar_cultivos() 
         self.crear_widgets()
         self.actualizar_lista_cultivos()
         self.revisar_cosechas_al_inicio()
+
+        if sincronizador is not None:
+            self.protocol("WM_DELETE_WINDOW", self.cerrar)
+            self.after(INTERVALO_REFRESCO_MS, self.revisar_cambios_remotos)
+
+    def revisar_cambios_remotos(self):
+        """Refresca la lista si la sincronización trajo cambios (nunca en mitad de una edición)."""
+        if sincronizador.cambios_remotos.is_set() and self.cultivo_seleccionado_indice is None:
+            sincronizador.cambios_remotos.clear()
+            cargar_cultivos()
+            self.actualizar_lista_cultivos()
+        self.after(INTERVALO_REFRESCO_MS, self.revisar_cambios_remotos)
+
+    def cerrar(self):
+        """Detiene el hilo de sincronización (guardando el almacén) y cierra la ventana."""
+        sincronizador.detener()
+        self.destroy()
         
     def configurar_estilos(self):
         """Define los temas, estilos, tags y fuentes de la aplicación con un tema oscuro."""
@@ -322,6 +393,10 @@ class AppCultivos(tk.Tk):
         ttk.Button(frame_botones_lista, text="📈 Analizar Ventas Externas", 
                    command=self.analizar_ventas_externas, style='Principal.TButton').pack(side='left', expand=True, fill='x', padx=5)
         
+        # Botón para Comparar Venta Real con la Estimada
+        ttk.Button(frame_botones_lista, text="⚖️ Venta Real vs Estimada", 
+                   command=self.comparar_venta_real_estimada, style='Principal.TButton').pack(side='left', expand=True, fill='x', padx=5)
+        
         # Botón de Exportar 
         ttk.Button(frame_botones_lista, text="📤 Exportar Cultivos CSV", 
                    command=self.exportar_a_csv, style='Principal.TButton').pack(side='left', expand=True, fill='x', padx=5)
@@ -460,13 +535,16 @@ class AppCultivos(tk.Tk):
         except ValueError:
             messagebox.showerror("Error", "Error al identificar el cultivo. Intenta seleccionar otra vez.")
             return
-        nombre_cultivo = lista_cultivos[indice_a_eliminar].nombre
+        cultivo_a_eliminar = lista_cultivos[indice_a_eliminar]
+        nombre_cultivo = cultivo_a_eliminar.nombre
         confirmar = messagebox.askyesno(
             "Confirmar Eliminación",
             f"¿Estás seguro de que quieres eliminar '{nombre_cultivo}' de tus cultivos?"
         )
         if confirmar:
-            del lista_cultivos[indice_a_eliminar] 
+            # Por identidad o clave: la lista pudo refrescarse con cambios remotos durante el diálogo
+            lista_cultivos[:] = [c for c in lista_cultivos
+                                 if c is not cultivo_a_eliminar and (c.clave is None or c.clave != cultivo_a_eliminar.clave)]
             guardar_cultivos()
             self.actualizar_lista_cultivos()
             self.revisar_cosechas_al_inicio()
@@ -621,11 +699,56 @@ class AppCultivos(tk.Tk):
             messagebox.showinfo("Análisis Completo", f"Se han generado tres gráficos, incluyendo una predicción para {mes_futuro_nombre}.")
             plt.show() 
 
-[Image of a data dashboard with charts]
+        except Exception as e:
+            messagebox.showerror("Error de Gráfico/Predicción", f"No se pudo generar el gráfico o el modelo: {e}")
+
+
+    def comparar_venta_real_estimada(self):
+        """
+        Cruza el CSV de ventas con los cultivos (analitica.py) y muestra la venta
+        realizada frente a la estimada por cultivo, zona y mes de cosecha.
+        """
+        if not os.path.exists(NOMBRE_ARCHIVO_VENTAS):
+            messagebox.showwarning("Advertencia", 
+                                   f"No se encontró el archivo de ventas externas '{NOMBRE_ARCHIVO_VENTAS}'.")
+            return
 
+        cultivos = [{
+            "nombre": cultivo.nombre,
+            "zona": cultivo.zona,
+            "fecha_cosecha": cultivo.fecha_cosecha.isoformat(),
+            "precio_compra": cultivo.precio_compra,
+            "precio_venta": cultivo.precio_venta,
+        } for cultivo in lista_cultivos]
 
+        try:
+            resultado = analitica.analisis_margen_real.calcular(NOMBRE_ARCHIVO_VENTAS, cultivos)
         except Exception as e:
-            messagebox.showerror("Error de Gráfico/Predicción", f"No se pudo generar el gráfico o el modelo: {e}")
+            messagebox.showerror("Error de Análisis", f"No se pudo cruzar las ventas con los cultivos: {e}")
+            return
+
+        ventana = tk.Toplevel(self)
+        ventana.title("Venta Real vs Estimada por Cultivo, Zona y Mes")
+        ventana.configure(bg=COLOR_FONDO_OSCURO)
+        columnas = ('zona', 'mes', 'estimada', 'realizada', 'diferencia', 'margen_real')
+        tabla = ttk.Treeview(ventana, columns=columnas, show='tree headings')
+        tabla.heading('#0', text='Cultivo')
+        for columna, titulo in zip(columnas, ('Zona', 'Mes', 'Venta Est.', 'Venta Real', 'Diferencia', 'Margen Real')):
+            tabla.heading(columna, text=titulo)
+            tabla.column(columna, width=90, anchor='center')
+        tabla.column('#0', width=140, anchor='w')
+        tabla.tag_configure('por_debajo', foreground=COLOR_ENFASIS_ROJO)
+        tabla.tag_configure('por_encima', foreground=COLOR_ENFASIS_VERDE)
+
+        nombres_mes = list(analitica.MESES)
+        for fila in resultado.itertuples(index=False):
+            tag = 'por_debajo' if fila.diferencia < 0 else 'por_encima'
+            tabla.insert('', tk.END, text=fila.cultivo,
+                         values=(fila.zona, nombres_mes[fila.mes - 1].capitalize(),
+                                 f"€{fila.venta_estimada:.2f}", f"€{fila.venta_realizada:.2f}",
+                                 f"€{fila.diferencia:.2f}", f"€{fila.margen_realizado:.2f}"),
+                         tags=(tag,))
+        tabla.pack(fill='both', expand=True, padx=10, pady=10)
 
 
     def actualizar_lista_cultivos(self):
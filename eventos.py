@@ -0,0 +1,123 @@
+# eventos.py
+# Bus de eventos en proceso (publicación/suscripción) para los cambios de
+# cultivos. Cada evento recibe un ID secuencial; los últimos N se guardan en
+# un buffer de repetición para que un cliente que se reconecta (cabecera
+# Last-Event-ID de SSE) reciba solo lo que se ha perdido.
+#
+# La secuencia vive en memoria y vuelve a 0 en cada arranque (Fly.io para y
+# arranca las máquinas a menudo), así que hacia el cliente los IDs llevan la
+# época del bus: 'época-n'. Un ID de otra época no se puede comparar con la
+# secuencia actual y obliga a recargar el estado completo.
+
+import asyncio
+import json
+import os
+import threading
+from collections import deque
+from itertools import islice
+
+
+class BusEventos:
+    """Pub/sub en memoria con buffer de repetición indexado por ID de evento."""
+
+    def __init__(self, capacidad_replay=1000):
+        self._condicion = threading.Condition()
+        self._secuencia = 0
+        self.epoca = os.urandom(4).hex()
+        self._buffer = deque(maxlen=capacidad_replay)
+        self._oyentes = []
+        self._esperas_async = set()  # (loop, asyncio.Event) de consumidores ASGI
+
+    @property
+    def ultimo_id(self):
+        return self._secuencia
+
+    def id_sse(self, numero):
+        """ID de evento tal como lo ve el cliente (Last-Event-ID, X-Ultimo-Evento)."""
+        return f'{self.epoca}-{numero}'
+
+    def leer_id_sse(self, valor):
+        """
+        Número de secuencia de un ID emitido por este bus. Devuelve -1 si es de
+        otra época (otro proceso o un arranque anterior) o no es válido:
+        eventos_desde(-1) pide recargar el estado completo.
+        """
+        epoca, _, numero = str(valor).rpartition('-')
+        if epoca != self.epoca or not numero.isdigit():
+            return -1
+        return int(numero)
+
+    def escuchar(self, oyente):
+        """Registra una función que se llama de forma síncrona con cada evento publicado."""
+        self._oyentes.append(oyente)
+
+    def publicar(self, tipo, datos):
+        """Publica un evento y despierta a los consumidores en espera."""
+        with self._condicion:
+            self._secuencia += 1
+            evento = {'id': self._secuencia, 'tipo': tipo, 'datos': datos}
+            self._buffer.append(evento)
+            self._condicion.notify_all()
+            esperas = list(self._esperas_async)
+        for oyente in self._oyentes:
+            oyente(evento)
+        for loop, aviso in esperas:
+            loop.call_soon_threadsafe(aviso.set)
+        return evento
+
+    def eventos_desde(self, ultimo_id):
+        """
+        Devuelve los eventos con ID > ultimo_id. Devuelve None si alguno ya
+        salió del buffer o si el ID no es de este bus: el cliente debe
+        recargar el estado completo.
+        """
+        with self._condicion:
+            if ultimo_id > self._secuencia:
+                return None  # ID que este bus aún no ha emitido
+            if ultimo_id == self._secuencia:
+                return []
+            primero = self._buffer[0]['id'] if self._buffer else self._secuencia + 1
+            if ultimo_id < primero - 1:
+                return None
+            # Los IDs son consecutivos: la posición en el buffer es directa
+            return list(islice(self._buffer, ultimo_id - primero + 1, None))
+
+    def esperar(self, ultimo_id, timeout=15.0):
+        """Bloquea (modo WSGI) hasta que haya eventos nuevos o venza el timeout."""
+        with self._condicion:
+            self._condicion.wait_for(lambda: self._secuencia > ultimo_id, timeout)
+        return self.eventos_desde(ultimo_id)
+
+    async def esperar_async(self, ultimo_id, timeout=15.0):
+        """Igual que esperar(), pero sin ocupar un hilo (modo ASGI)."""
+        espera = (asyncio.get_running_loop(), asyncio.Event())
+        with self._condicion:
+            self._esperas_async.add(espera)
+        try:
+            if self._secuencia <= ultimo_id:
+                try:
+                    await asyncio.wait_for(espera[1].wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            with self._condicion:
+                self._esperas_async.discard(espera)
+        return self.eventos_desde(ultimo_id)
+
+
+def formatear_sse(evento, bus):
+    """Serializa un evento de `bus` al formato text/event-stream."""
+    datos = json.dumps(evento['datos'], separators=(',', ':'))
+    return f"id: {bus.id_sse(evento['id'])}\nevent: {evento['tipo']}\ndata: {datos}\n\n"
+
+
+def formatear_reinicio(bus):
+    """Avisa al cliente de que debe recargar la lista completa (eventos perdidos)."""
+    return f'id: {bus.id_sse(bus.ultimo_id)}\nevent: reinicio\ndata: {{}}\n\n'
+
+
+# Comentario SSE para mantener viva la conexión a través de proxies.
+SSE_LATIDO = ': latido\n\n'
+
+# Milisegundos que espera el navegador antes de reconectar un stream cerrado.
+SSE_REINTENTO = 'retry: 1000\n\n'
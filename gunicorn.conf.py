@@ -0,0 +1,25 @@
+# gunicorn.conf.py
+# Gunicorn lo carga automáticamente desde el directorio de trabajo (/app).
+
+import os
+
+# 🚀 Arranque en frío: la app (y los datos de /vol/data) se cargan una sola vez
+# en el proceso maestro; los workers los heredan por copy-on-write.
+# GUNICORN_PRECARGA=0 desactiva la precarga (útil para comparar en benchmarks).
+preload_app = os.environ.get('GUNICORN_PRECARGA', '1') == '1'
+
+# 🧵 Worker con hilos: un stream SSE abierto (o una petición en la cola de
+# admisión) ocupa un hilo, no el worker entero, así que /salud/listo sigue
+# respondiendo. El latido del worker no depende de las peticiones, por lo que
+# el timeout de gunicorn no mata al worker mientras haya streams abiertos.
+# Hilos: MAX_PETICIONES_ACTIVAS + MAX_PETICIONES_EN_COLA + MAX_STREAMS_SINCRONOS
+# (4 + 16 + 8 por defecto) y margen para salud, métricas y estáticos.
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_HILOS', '32'))
+
+
+def worker_exit(server, worker):
+    """Antes de que Fly.io pare la máquina, deja al día las instantáneas binarias y el respaldo."""
+    import app_backend
+    app_backend.escribir_instantaneas_pendientes()
+    app_backend.respaldar_pendiente()
@@ -0,0 +1,467 @@
+# indices.py
+# Índices en memoria sobre los cultivos, mantenidos de forma incremental con
+# los eventos del bus (alta/cambio/baja) en lugar de recalcularse en cada
+# petición.
+
+import math
+import random
+import re
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+from collections import defaultdict
+from datetime import date
+
+import numpy as np
+
+
+def calcular_margen(cultivo):
+    """
+    Margen potencial (precio_venta - precio_compra); 0 si faltan precios o no
+    son números finitos. Un NaN ('nan', o NaN en el JSON de la petición) no se
+    puede ordenar y rompería las búsquedas binarias del ranking.
+    """
+    try:
+        margen = float(cultivo.get('precio_venta') or 0) - float(cultivo.get('precio_compra') or 0)
+    except (TypeError, ValueError):
+        return 0.0
+    return margen if math.isfinite(margen) else 0.0
+
+
+class IndiceCultivos:
+    """
+    Base de los índices. Se reconstruye entero cuando la lista de origen
+    cambia (p.ej. el JSON se recargó del disco) y, entre tanto, se actualiza
+    con cada evento publicado en el bus.
+    """
+
+    def __init__(self):
+        self._cerrojo = threading.RLock()
+        self._origen = None
+        self._registros = {}
+
+    def sincronizar(self, cultivos):
+        """Reconstruye el índice si `cultivos` no es la lista con la que se construyó."""
+        with self._cerrojo:
+            if self._origen is not cultivos:
+                self._vaciar()
+                self._registros = {}
+                for cultivo in cultivos:
+                    self._insertar(dict(cultivo))
+                self._origen = cultivos
+        return self
+
+    def aplicar_evento(self, evento):
+        """Oyente del bus de eventos."""
+        with self._cerrojo:
+            if self._origen is None:
+                return  # Aún no construido: se hará completo en la primera consulta
+            datos = evento['datos']
+            if evento['tipo'] == 'cultivo_eliminado':
+                self._quitar(datos['id'])
+            elif evento['tipo'] in ('cultivo_creado', 'cultivo_actualizado'):
+                self._insertar(dict(datos))
+
+    def _insertar(self, cultivo):
+        cultivo_id = cultivo.get('id')
+        if cultivo_id is None:
+            return  # Registros sin ID (formato antiguo) no son accesibles por la API
+        # Idempotente: un evento repetido no duplica entradas
+        self._quitar(cultivo_id)
+        self._registros[cultivo_id] = cultivo
+        self._agregar(cultivo)
+
+    def _quitar(self, cultivo_id):
+        cultivo = self._registros.pop(cultivo_id, None)
+        if cultivo is not None:
+            self._eliminar(cultivo)
+
+    # Métodos a implementar por cada índice
+    def _vaciar(self):
+        raise NotImplementedError
+
+    def _agregar(self, cultivo):
+        raise NotImplementedError
+
+    def _eliminar(self, cultivo):
+        raise NotImplementedError
+
+
+# --- Ranking por Margen (Top-K) ---
+
+class RankingMargen(IndiceCultivos):
+    """
+    Listas ordenadas por margen descendente (global y por zona). Altas y bajas
+    cuestan O(log N) en la búsqueda binaria; la consulta top-K es un simple
+    recorte de K elementos.
+    """
+
+    def _vaciar(self):
+        self._global = []
+        self._por_zona = defaultdict(list)
+
+    @staticmethod
+    def _clave(cultivo):
+        # Margen negativo para ordenar de mayor a menor; el ID desempata
+        return (-calcular_margen(cultivo), cultivo.get('id'))
+
+    def _agregar(self, cultivo):
+        clave = self._clave(cultivo)
+        insort(self._global, clave)
+        insort(self._por_zona[cultivo.get('zona') or ''], clave)
+
+    def _eliminar(self, cultivo):
+        clave = self._clave(cultivo)
+        for lista in (self._global, self._por_zona.get(cultivo.get('zona') or '', [])):
+            posicion = bisect_left(lista, clave)
+            if posicion < len(lista) and lista[posicion] == clave:
+                del lista[posicion]
+
+    def top(self, k, zona=None):
+        """Devuelve hasta K cultivos con margen positivo, de mayor a menor."""
+        with self._cerrojo:
+            lista = self._global if zona is None else self._por_zona.get(zona, [])
+            resultado = []
+            for menos_margen, cultivo_id in lista[:k]:
+                if menos_margen >= 0:
+                    break  # A partir de aquí no hay ganancia
+                resultado.append(dict(self._registros[cultivo_id], margen=-menos_margen))
+            return resultado
+
+
+# --- Ocupación por Zona (Árbol de Intervalos) ---
+
+def fecha_a_ordinal(texto):
+    """Convierte 'YYYY-MM-DD' a ordinal de día; None si no es una fecha válida."""
+    try:
+        return date.fromisoformat(texto).toordinal()
+    except (TypeError, ValueError):
+        return None
+
+
+class _NodoIntervalo:
+    __slots__ = ('clave', 'fin', 'prioridad', 'izq', 'der', 'max_fin')
+
+    def __init__(self, inicio, fin, cultivo_id):
+        self.clave = (inicio, cultivo_id)
+        self.fin = fin
+        self.prioridad = random.random()
+        self.izq = None
+        self.der = None
+        self.max_fin = fin
+
+
+def _actualizar(nodo):
+    max_fin = nodo.fin
+    if nodo.izq is not None and nodo.izq.max_fin > max_fin:
+        max_fin = nodo.izq.max_fin
+    if nodo.der is not None and nodo.der.max_fin > max_fin:
+        max_fin = nodo.der.max_fin
+    nodo.max_fin = max_fin
+
+
+def _dividir(nodo, clave, incluir_igual):
+    """Parte el treap en (claves < clave, resto); con incluir_igual, en (<=, >)."""
+    if nodo is None:
+        return None, None
+    if nodo.clave < clave or (incluir_igual and nodo.clave == clave):
+        nodo.der, derecha = _dividir(nodo.der, clave, incluir_igual)
+        _actualizar(nodo)
+        return nodo, derecha
+    izquierda, nodo.izq = _dividir(nodo.izq, clave, incluir_igual)
+    _actualizar(nodo)
+    return izquierda, nodo
+
+
+def _unir(izquierda, derecha):
+    if izquierda is None:
+        return derecha
+    if derecha is None:
+        return izquierda
+    if izquierda.prioridad > derecha.prioridad:
+        izquierda.der = _unir(izquierda.der, derecha)
+        _actualizar(izquierda)
+        return izquierda
+    derecha.izq = _unir(izquierda, derecha.izq)
+    _actualizar(derecha)
+    return derecha
+
+
+class ArbolIntervalos:
+    """
+    Treap ordenado por (inicio, id) y aumentado con el fin máximo de cada
+    subárbol. Inserción y borrado en O(log N); la consulta de solapamiento
+    en O(log N + K), siendo K el número de intervalos devueltos.
+    """
+
+    def __init__(self):
+        self._raiz = None
+        self.total = 0
+
+    def insertar(self, inicio, fin, cultivo_id):
+        izquierda, derecha = _dividir(self._raiz, (inicio, cultivo_id), False)
+        self._raiz = _unir(_unir(izquierda, _NodoIntervalo(inicio, fin, cultivo_id)), derecha)
+        self.total += 1
+
+    def eliminar(self, inicio, cultivo_id):
+        clave = (inicio, cultivo_id)
+        izquierda, resto = _dividir(self._raiz, clave, False)
+        encontrado, derecha = _dividir(resto, clave, True)
+        if encontrado is not None:
+            self.total -= 1
+        self._raiz = _unir(izquierda, derecha)
+
+    def solapados(self, desde, hasta):
+        """Devuelve [(inicio, fin, id)] de los intervalos que tocan [desde, hasta]."""
+        resultado = []
+        pendientes = [self._raiz]
+        while pendientes:
+            nodo = pendientes.pop()
+            # Ningún intervalo del subárbol termina después de `desde`
+            if nodo is None or nodo.max_fin < desde:
+                continue
+            pendientes.append(nodo.izq)
+            inicio = nodo.clave[0]
+            if inicio <= hasta:
+                if nodo.fin >= desde:
+                    resultado.append((inicio, nodo.fin, nodo.clave[1]))
+                # A la derecha solo hay inicios >= este; si ya pasa de `hasta`, se poda
+                pendientes.append(nodo.der)
+        return resultado
+
+
+class IndiceOcupacion(IndiceCultivos):
+    """Árbol de intervalos [fecha_siembra, fecha_cosecha] por zona."""
+
+    def _vaciar(self):
+        self._arboles = defaultdict(ArbolIntervalos)
+        self._intervalos = {}  # id -> (zona, inicio, fin)
+
+    def _agregar(self, cultivo):
+        inicio = fecha_a_ordinal(cultivo.get('fecha_siembra'))
+        fin = fecha_a_ordinal(cultivo.get('fecha_cosecha'))
+        if inicio is None or fin is None or fin < inicio:
+            return  # Sin fechas válidas no ocupa la zona
+        zona = cultivo.get('zona') or ''
+        self._arboles[zona].insertar(inicio, fin, cultivo['id'])
+        self._intervalos[cultivo['id']] = (zona, inicio, fin)
+
+    def _eliminar(self, cultivo):
+        intervalo = self._intervalos.pop(cultivo['id'], None)
+        if intervalo is not None:
+            zona, inicio, _ = intervalo
+            self._arboles[zona].eliminar(inicio, cultivo['id'])
+
+    def zonas(self):
+        """Zonas con al menos un cultivo indexado."""
+        with self._cerrojo:
+            return sorted(zona for zona, arbol in self._arboles.items() if arbol.total)
+
+    def ocupantes(self, zona, desde, hasta=None):
+        """Cultivos de `zona` que ocupan algún día de [desde, hasta] (ordinales)."""
+        hasta = desde if hasta is None else hasta
+        with self._cerrojo:
+            arbol = self._arboles.get(zona)
+            if arbol is None:
+                return []
+            encontrados = sorted(arbol.solapados(desde, hasta))
+            return [self._registros[cultivo_id] for _, _, cultivo_id in encontrados]
+
+    def ocupacion_diaria(self, zona, desde, hasta):
+        """Número de cultivos en la zona para cada día de [desde, hasta] (vectorizado con NumPy)."""
+        dias = hasta - desde + 1
+        with self._cerrojo:
+            arbol = self._arboles.get(zona)
+            encontrados = arbol.solapados(desde, hasta) if arbol is not None else []
+        if not encontrados:
+            return np.zeros(dias, dtype=np.int64)
+        intervalos = np.array([(inicio, fin) for inicio, fin, _ in encontrados], dtype=np.int64)
+        inicios = np.clip(intervalos[:, 0], desde, hasta) - desde
+        fines = np.clip(intervalos[:, 1], desde, hasta) - desde
+        # Array de diferencias: +1 al entrar, -1 el día siguiente a la cosecha
+        diferencias = np.zeros(dias + 1, dtype=np.int64)
+        np.add.at(diferencias, inicios, 1)
+        np.add.at(diferencias, fines + 1, -1)
+        return np.cumsum(diferencias[:-1])
+
+
+# --- Búsqueda de Texto (Índice Invertido) ---
+
+# Peso de cada campo en la puntuación: coincidir en el nombre pesa más que en las notas
+PESOS_CAMPOS = {'nombre': 3.0, 'zona': 2.0, 'notas': 1.0}
+_PATRON_TERMINO = re.compile(r'[a-z0-9]+')
+# Consultas recientes; se invalidan con cualquier alta, cambio o baja
+MAX_CONSULTAS_EN_CACHE = 256
+# Búsqueda mientras se escribe: longitud mínima para tratar el último término
+# como prefijo y máximo de términos del vocabulario que puede abarcar
+MIN_LONGITUD_PREFIJO = 2
+MAX_TERMINOS_PREFIJO = 256
+
+
+def normalizar_texto(texto):
+    """Minúsculas y sin tildes ni diéresis ('Calabacín' -> 'calabacin', 'Ñame' -> 'name')."""
+    texto = str(texto or '')
+    if texto.isascii():
+        return texto.lower()  # Sin tildes que quitar: el caso habitual, y mucho más rápido
+    descompuesto = unicodedata.normalize('NFKD', texto).casefold()
+    return ''.join(c for c in descompuesto if not unicodedata.combining(c))
+
+
+def tokenizar(texto):
+    return _PATRON_TERMINO.findall(normalizar_texto(texto))
+
+
+def _intersectar(ids, puntuaciones, otros_ids, otras_puntuaciones):
+    """IDs (ordenados) presentes en ambas fuentes, con la suma de sus puntuaciones."""
+    base = min(ids[0], otros_ids[0])
+    rango = max(ids[-1], otros_ids[-1]) - base + 1
+    if rango <= 4 * (len(ids) + len(otros_ids)):
+        # IDs densos (lo normal: son correlativos): un array indexado por ID
+        # es más rápido que la búsqueda binaria
+        densas = np.full(rango, np.nan)
+        densas[otros_ids - base] = otras_puntuaciones
+        sumadas = puntuaciones + densas[ids - base]
+        presentes = ~np.isnan(sumadas)
+        return ids[presentes], sumadas[presentes]
+    posiciones = np.searchsorted(otros_ids, ids).clip(max=len(otros_ids) - 1)
+    presentes = otros_ids[posiciones] == ids
+    return ids[presentes], puntuaciones[presentes] + otras_puntuaciones[posiciones[presentes]]
+
+
+class IndiceTexto(IndiceCultivos):
+    """
+    Índice invertido sobre nombre, zona y notas. El último término de la
+    consulta también vale como prefijo (búsqueda mientras se escribe); el
+    vocabulario se mantiene ordenado para resolverlo con búsqueda binaria. La
+    puntuación suma, por cada término de la consulta, peso del campo x idf; un
+    prefijo puntúa la mitad que una coincidencia exacta.
+
+    Una sola letra solo coincide exacta (menos de MIN_LONGITUD_PREFIJO) y un
+    prefijo abarca como mucho los MAX_TERMINOS_PREFIJO primeros términos del
+    vocabulario que empiezan por él: 'l' o 'lo' cubrirían casi todo el índice.
+    """
+
+    def _vaciar(self):
+        self._cache_consultas = {}
+        self._postings = {}          # término -> {id: peso}
+        self._arrays = {}            # término -> (ids ordenados, pesos) en NumPy, se crea al consultarlo
+        self._vocabulario = []       # términos ordenados
+        self._terminos_por_id = {}   # id -> {término: peso}
+
+    def _agregar(self, cultivo):
+        self._cache_consultas.clear()
+        pesos = defaultdict(float)
+        for campo, peso in PESOS_CAMPOS.items():
+            for termino in tokenizar(cultivo.get(campo)):
+                pesos[termino] += peso
+        for termino, peso in pesos.items():
+            postings = self._postings.get(termino)
+            if postings is None:
+                postings = self._postings[termino] = {}
+                insort(self._vocabulario, termino)
+            postings[cultivo['id']] = peso
+            self._arrays.pop(termino, None)
+        self._terminos_por_id[cultivo['id']] = pesos
+
+    def _eliminar(self, cultivo):
+        self._cache_consultas.clear()
+        for termino in self._terminos_por_id.pop(cultivo['id'], {}):
+            postings = self._postings[termino]
+            postings.pop(cultivo['id'], None)
+            self._arrays.pop(termino, None)
+            if not postings:
+                del self._postings[termino]
+                del self._vocabulario[bisect_left(self._vocabulario, termino)]
+
+    def _array_de(self, termino):
+        """(ids, pesos) de un término como arrays ordenados por ID."""
+        arrays = self._arrays.get(termino)
+        if arrays is None:
+            postings = self._postings[termino]
+            ids = np.fromiter(postings.keys(), dtype=np.int64, count=len(postings))
+            pesos = np.fromiter(postings.values(), dtype=np.float64, count=len(postings))
+            orden = np.argsort(ids)
+            arrays = self._arrays[termino] = (ids[orden], pesos[orden])
+        return arrays
+
+    def _expandir(self, prefijo):
+        """Términos del vocabulario que empiezan por `prefijo` (el exacto primero), hasta MAX_TERMINOS_PREFIJO."""
+        posicion = bisect_left(self._vocabulario, prefijo)
+        if len(prefijo) < MIN_LONGITUD_PREFIJO:
+            coincide = posicion < len(self._vocabulario) and self._vocabulario[posicion] == prefijo
+            return [prefijo] if coincide else []
+        # Fin del rango: el primer término mayor que cualquiera con ese prefijo
+        tope = min(posicion + MAX_TERMINOS_PREFIJO, len(self._vocabulario))
+        final = bisect_left(self._vocabulario, prefijo + '\U0010ffff', posicion, tope)
+        return self._vocabulario[posicion:final]
+
+    def buscar(self, consulta, limite=20):
+        """Devuelve hasta `limite` cultivos que contienen todos los términos de la consulta (el último, como prefijo)."""
+        terminos_consulta = tuple(dict.fromkeys(tokenizar(consulta)))
+        if not terminos_consulta:
+            return []
+        with self._cerrojo:
+            clave_cache = (terminos_consulta, limite)
+            if clave_cache in self._cache_consultas:
+                return self._cache_consultas[clave_cache]
+            resultado = self._buscar(terminos_consulta, limite)
+            if len(self._cache_consultas) >= MAX_CONSULTAS_EN_CACHE:
+                self._cache_consultas.pop(next(iter(self._cache_consultas)))
+            self._cache_consultas[clave_cache] = resultado
+            return resultado
+
+    def _buscar(self, terminos_consulta, limite):
+        total = len(self._registros) or 1
+        # Por término de la consulta: (ids ordenados, puntuación de cada ID),
+        # con puntuación = peso x idf (la mitad si es un prefijo)
+        fuentes = []
+        for termino in terminos_consulta[:-1]:
+            if termino not in self._postings:
+                return []
+            ids, pesos = self._array_de(termino)
+            fuentes.append((ids, pesos * math.log(1 + total / len(ids))))
+        ultimo = terminos_consulta[-1]
+        expansion = self._expandir(ultimo)
+        if not expansion:
+            return []
+        fuentes.append(self._puntuar_expansion(ultimo, expansion, total))
+
+        # 1. Intersección de IDs, partiendo del término más selectivo
+        fuentes.sort(key=lambda fuente: len(fuente[0]))
+        ids, puntuaciones = fuentes[0]
+        for otros_ids, otras_puntuaciones in fuentes[1:]:
+            ids, puntuaciones = _intersectar(ids, puntuaciones, otros_ids, otras_puntuaciones)
+            if not len(ids):
+                return []
+
+        # 2. Los `limite` mejores sin ordenar el resto: mayor puntuación primero
+        # y, a igualdad, menor ID (los IDs ya van ordenados, así que los empates
+        # en el corte se resuelven tomando los primeros)
+        seleccion = np.arange(len(ids))
+        if len(ids) > limite:
+            umbral = puntuaciones[np.argpartition(-puntuaciones, limite - 1)[limite - 1]]
+            mayores = np.flatnonzero(puntuaciones > umbral)
+            empates = np.flatnonzero(puntuaciones == umbral)[:limite - len(mayores)]
+            seleccion = np.concatenate((mayores, empates))
+        orden = seleccion[np.lexsort((ids[seleccion], -puntuaciones[seleccion]))]
+        return [dict(self._registros[int(ids[i])], puntuacion=round(float(puntuaciones[i]), 4)) for i in orden]
+
+    def _puntuar_expansion(self, prefijo, expansion, total):
+        """(ids ordenados, mejor peso x idf) entre todos los términos de la expansión de un prefijo."""
+        partes_ids, partes_puntuaciones = [], []
+        for termino in expansion:
+            ids, pesos = self._array_de(termino)
+            idf = math.log(1 + total / len(ids))
+            partes_ids.append(ids)
+            partes_puntuaciones.append(pesos * (idf if termino == prefijo else idf * 0.5))
+        if len(expansion) == 1:
+            return partes_ids[0], partes_puntuaciones[0]
+        ids = np.concatenate(partes_ids)
+        puntuaciones = np.concatenate(partes_puntuaciones)
+        # Por ID, el término que más puntúa: ordenar por (ID, -puntuación) y quedarse con el primero
+        orden = np.lexsort((-puntuaciones, ids))
+        ids, puntuaciones = ids[orden], puntuaciones[orden]
+        primeros = np.empty(len(ids), dtype=bool)
+        primeros[0] = True
+        np.not_equal(ids[1:], ids[:-1], out=primeros[1:])
+        return ids[primeros], puntuaciones[primeros]
@@ -0,0 +1,278 @@
+# informes.py
+# Generación de informes de ventas sin ventana (servidor, cron): los mismos
+# tres gráficos de AppCultivos.analizar_ventas_externas (ventas por producto,
+# tendencia mensual con predicción lineal y ventas por región) para muchos
+# cortes de ventas_mensuales.csv: global, por región, por producto y por año.
+#   - Backend Agg de matplotlib: no necesita pantalla ni tkinter.
+#   - Los agregados de cada corte se calculan en el proceso principal (pandas)
+#     y el dibujo, que es lo caro, se reparte en un pool de procesos.
+#   - Cada corte escribe PNG, SVG y/o HTML; un manifiesto guarda el hash de los
+#     datos de cada corte y los que no cambiaron desde la última ejecución se omiten.
+#
+# Uso:  python informes.py [ventas.csv] [--salida DIR] [--formatos png,svg,html]
+#                          [--por region,producto,anio] [--procesos N] [--forzar]
+
+import argparse
+import hashlib
+import html
+import json
+import os
+import re
+import sys
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import matplotlib
+matplotlib.use('Agg')  # Antes de importar pyplot: sin GUI
+import matplotlib.pyplot as plt  # noqa: E402
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from analitica import MESES  # noqa: E402
+
+NOMBRE_ARCHIVO_VENTAS = 'ventas_mensuales.csv'
+DIRECTORIO_SALIDA = 'informes'
+FORMATOS = ('png', 'svg', 'html')
+# Cambiarla fuerza a regenerar todos los cortes (p. ej. al modificar el dibujo)
+VERSION_PLANTILLA = 1
+NOMBRES_MES = ['Ene', 'Feb', 'Mar', 'Abr', 'May', 'Jun', 'Jul', 'Ago', 'Sep', 'Oct', 'Nov', 'Dic']
+# Dimensión de corte -> (columna, etiqueta)
+CORTES = {
+    'region': ('Region', 'Región'),
+    'producto': ('Producto', 'Producto'),
+    'anio': ('Anio', 'Año'),
+}
+
+# --- Datos ---
+
+def preparar_ventas(ruta):
+    """Lee el CSV y añade Num_Mes y, si hay fechas o año, la columna Anio."""
+    df = pd.read_csv(ruta, sep=',')
+    df['Venta_Total'] = pd.to_numeric(df['Venta_Total'], errors='coerce')
+    df = df.dropna(subset=['Venta_Total'])
+    if 'Fecha' in df.columns:
+        fechas = pd.to_datetime(df['Fecha'], errors='coerce')
+        df['Num_Mes'], df['Anio'] = fechas.dt.month, fechas.dt.year.astype('Int64')
+    else:
+        df['Num_Mes'] = df['Mes'].astype(str).str.strip().str.lower().str[:3].map(MESES)
+        for columna in ('Año', 'Ano'):
+            if columna in df.columns:
+                df['Anio'] = pd.to_numeric(df[columna], errors='coerce').astype('Int64')
+    return df
+
+def nombre_archivo(texto):
+    """'Región: Norte' -> 'region-norte' (sin tildes ni caracteres especiales)."""
+    texto = unicodedata.normalize('NFKD', str(texto)).encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'[^a-z0-9]+', '-', texto.lower()).strip('-') or 'sin-nombre'
+
+def id_corte(dimension, valor):
+    """
+    Nombre de archivo de un corte: legible y con un hash corto del valor, porque
+    valores distintos pueden dar el mismo texto ('Norte', 'norte', 'Nörte') y
+    se sobrescribirían entre sí.
+    """
+    clave = hashlib.sha1(f'{dimension}\0{valor}'.encode('utf-8')).hexdigest()[:8]
+    return f'{dimension}-{nombre_archivo(valor)}-{clave}'
+
+def cortes(df, dimensiones):
+    """Genera (id, título, filas) para el corte global y cada valor de cada dimensión."""
+    yield 'global', 'Todas las ventas', df
+    for dimension in dimensiones:
+        columna, etiqueta = CORTES[dimension]
+        if columna not in df.columns:
+            continue
+        for valor, filas in df.groupby(columna, sort=True):
+            yield id_corte(dimension, valor), f'{etiqueta}: {valor}', filas
+
+def agregar(filas):
+    """Totales que se dibujan: por producto, por mes y por región (listas JSON)."""
+    productos = filas.groupby('Producto')['Venta_Total'].sum().sort_values(ascending=False)
+    meses = filas.dropna(subset=['Num_Mes']).groupby('Num_Mes')['Venta_Total'].sum().sort_index()
+    regiones = filas.groupby('Region')['Venta_Total'].sum().sort_values(ascending=False)
+    return {
+        'productos': [[str(k), round(float(v), 2)] for k, v in productos.items()],
+        'meses': [[int(k), round(float(v), 2)] for k, v in meses.items()],
+        'regiones': [[str(k), round(float(v), 2)] for k, v in regiones.items()],
+        'total': round(float(filas['Venta_Total'].sum()), 2),
+    }
+
+def huella(trabajo):
+    """Hash de todo lo que determina los archivos de un corte."""
+    contenido = {k: trabajo[k] for k in ('titulo', 'datos', 'formatos')}
+    contenido['plantilla'] = VERSION_PLANTILLA
+    return hashlib.sha1(json.dumps(contenido, sort_keys=True).encode('utf-8')).hexdigest()
+
+# --- Dibujo (se ejecuta en los procesos del pool) ---
+
+def etiqueta_mes(numero):
+    return NOMBRES_MES[numero - 1] if 1 <= numero <= 12 else f'Mes {numero}'
+
+def prediccion(meses):
+    """Recta de mínimos cuadrados sobre (mes, venta): (mes siguiente, predicción, tendencia) o None."""
+    if len(meses) < 2:
+        return None
+    x = np.array([m for m, _ in meses], dtype=float)
+    y = np.array([v for _, v in meses], dtype=float)
+    pendiente, ordenada = np.polyfit(x, y, 1)
+    siguiente = int(x.max()) + 1
+    return siguiente, pendiente * siguiente + ordenada, pendiente * np.append(x, siguiente) + ordenada
+
+def dibujar(trabajo):
+    """Figura con los tres gráficos de analizar_ventas_externas para un corte."""
+    datos = trabajo['datos']
+    pred = prediccion(datos['meses'])
+    titulo = trabajo['titulo']
+    if pred is not None:
+        titulo += f' (Predicción {etiqueta_mes(pred[0])}: €{pred[1]:,.2f})'
+    with plt.style.context('dark_background'):
+        fig, (ax1, ax2, ax3) = plt.subplots(1, 3, figsize=(18, 6))
+        fig.suptitle(titulo, color='white', fontsize=16)
+
+        ax1.bar([p for p, _ in datos['productos']], [v for _, v in datos['productos']], color='#1E8449')
+        ax1.set_title('1. Ventas por Producto', color='white')
+        ax1.set_xlabel('Producto', color='white')
+
+        meses = [m for m, _ in datos['meses']]
+        etiquetas = [etiqueta_mes(m) for m in meses]
+        ax2.plot(meses, [v for _, v in datos['meses']], marker='o', linestyle='-', color='#007BFF',
+                 linewidth=3, label='Ventas Históricas')
+        if pred is not None:
+            meses = meses + [pred[0]]
+            etiquetas.append(f'Pred. {etiqueta_mes(pred[0])}')
+            ax2.plot(meses, pred[2], linestyle='--', color='#FFC107', linewidth=2, label='Predicción Lineal')
+        ax2.set_xticks(meses, etiquetas)
+        ax2.set_title('2. Tendencia Temporal y Predicción', color='white')
+        ax2.set_xlabel('Mes', color='white')
+        if meses:
+            ax2.legend(loc='upper left', frameon=False)
+
+        ax3.bar([r for r, _ in datos['regiones']], [v for _, v in datos['regiones']], color='#FFC107')
+        ax3.set_title('3. Ventas por Región', color='white')
+        ax3.set_xlabel('Región', color='white')
+
+        for ax in (ax1, ax2, ax3):
+            ax.set_ylabel('Venta Total (€)', color='white')
+            ax.tick_params(axis='x', rotation=45, colors='white')
+            ax.tick_params(axis='y', colors='white')
+            ax.grid(axis='y' if ax is not ax2 else 'both', linestyle='--', alpha=0.4)
+        fig.tight_layout(rect=[0, 0.03, 1, 0.95])
+    return fig
+
+def pagina_html(trabajo, imagen):
+    """HTML del corte: el gráfico y las tablas de totales."""
+    def tabla(titulo, filas):
+        cuerpo = ''.join(f'<tr><td>{html.escape(str(k))}</td><td>€{v:,.2f}</td></tr>' for k, v in filas)
+        return f'<h2>{titulo}</h2><table><tr><th></th><th>Venta Total</th></tr>{cuerpo}</table>'
+    datos = trabajo['datos']
+    return (f'<!DOCTYPE html><html lang="es"><head><meta charset="utf-8">'
+            f'<title>{html.escape(trabajo["titulo"])}</title></head><body>'
+            f'<h1>{html.escape(trabajo["titulo"])}</h1><p>Venta total: €{datos["total"]:,.2f}</p>'
+            f'<img src="{imagen}" alt="Gráficos de ventas" style="max-width:100%">'
+            + tabla('Por producto', datos['productos'])
+            + tabla('Por mes', [(etiqueta_mes(m), v) for m, v in datos['meses']])
+            + tabla('Por región', datos['regiones'])
+            + '<p><a href="index.html">Volver al índice</a></p></body></html>')
+
+def renderizar(trabajo):
+    """Dibuja un corte y escribe sus archivos en los formatos pedidos; devuelve sus rutas."""
+    base = os.path.join(trabajo['directorio'], trabajo['id'])
+    formatos = trabajo['formatos']
+    # El HTML enlaza una imagen: si no se pidió ninguna, se genera el PNG
+    imagenes = [f for f in ('png', 'svg') if f in formatos] or ['png']
+    fig = dibujar(trabajo)
+    rutas = []
+    try:
+        for formato in imagenes:
+            fig.savefig(f'{base}.{formato}', dpi=100, facecolor=fig.get_facecolor())
+            rutas.append(f'{base}.{formato}')
+    finally:
+        plt.close(fig)
+    if 'html' in formatos:
+        with open(f'{base}.html', 'w', encoding='utf-8') as f:
+            f.write(pagina_html(trabajo, f'{trabajo["id"]}.{imagenes[0]}'))
+        rutas.append(f'{base}.html')
+    return rutas
+
+# --- Ejecución por Lotes ---
+
+def leer_manifiesto(directorio):
+    try:
+        with open(os.path.join(directorio, 'manifiesto.json'), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def escribir_indice(directorio, trabajos):
+    enlaces = ''.join(f'<li><a href="{t["id"]}.html">{html.escape(t["titulo"])}</a> '
+                      f'(€{t["datos"]["total"]:,.2f})</li>' for t in trabajos)
+    with open(os.path.join(directorio, 'index.html'), 'w', encoding='utf-8') as f:
+        f.write('<!DOCTYPE html><html lang="es"><head><meta charset="utf-8"><title>Informes de ventas'
+                f'</title></head><body><h1>Informes de ventas</h1><ul>{enlaces}</ul></body></html>')
+
+def generar_informes(ruta_ventas, directorio=DIRECTORIO_SALIDA, formatos=FORMATOS,
+                     dimensiones=tuple(CORTES), procesos=None, forzar=False):
+    """
+    Genera los informes de todos los cortes y devuelve {'generados', 'omitidos',
+    'errores': {id: mensaje}}. Los cortes cuya huella coincide con la del
+    manifiesto (y cuyos archivos existen) no se vuelven a dibujar.
+    """
+    os.makedirs(directorio, exist_ok=True)
+    df = preparar_ventas(ruta_ventas)
+    manifiesto = {} if forzar else leer_manifiesto(directorio)
+    trabajos, pendientes, nuevo_manifiesto = [], [], {}
+    for id_corte, titulo, filas in cortes(df, dimensiones):
+        trabajo = {'id': id_corte, 'titulo': titulo, 'datos': agregar(filas),
+                   'formatos': list(formatos), 'directorio': directorio}
+        trabajos.append(trabajo)
+        nuevo_manifiesto[id_corte] = huella(trabajo)
+        base = os.path.join(directorio, id_corte)
+        completos = all(os.path.exists(f'{base}.{f}') for f in formatos)
+        if manifiesto.get(id_corte) != nuevo_manifiesto[id_corte] or not completos:
+            pendientes.append(trabajo)
+
+    errores = {}
+    if pendientes:
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            futuros = {pool.submit(renderizar, t): t['id'] for t in pendientes}
+            for futuro in as_completed(futuros):
+                try:
+                    futuro.result()
+                except Exception as e:  # Un corte fallido no detiene al resto
+                    errores[futuros[futuro]] = f'{type(e).__name__}: {e}'
+    for id_corte in errores:
+        # Sin huella: se reintentará en la próxima ejecución
+        nuevo_manifiesto.pop(id_corte, None)
+    if 'html' in formatos:
+        escribir_indice(directorio, trabajos)
+    with open(os.path.join(directorio, 'manifiesto.json'), 'w', encoding='utf-8') as f:
+        json.dump(nuevo_manifiesto, f, indent=1, sort_keys=True)
+    return {'generados': len(pendientes) - len(errores),
+            'omitidos': len(trabajos) - len(pendientes), 'errores': errores}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Genera los informes de ventas sin interfaz gráfica.')
+    parser.add_argument('ventas', nargs='?', default=NOMBRE_ARCHIVO_VENTAS, help='CSV de ventas')
+    parser.add_argument('--salida', default=DIRECTORIO_SALIDA, help='Directorio de los informes')
+    parser.add_argument('--formatos', default=','.join(FORMATOS), help='Lista de png, svg y html')
+    parser.add_argument('--por', default=','.join(CORTES), help='Cortes: region, producto y/o anio')
+    parser.add_argument('--procesos', type=int, default=None, help='Procesos de dibujo (por defecto, uno por CPU)')
+    parser.add_argument('--forzar', action='store_true', help='Regenera también los cortes sin cambios')
+    args = parser.parse_args(argv)
+
+    formatos = [f for f in args.formatos.split(',') if f]
+    dimensiones = [d for d in args.por.split(',') if d]
+    desconocidos = [f for f in formatos if f not in FORMATOS] + [d for d in dimensiones if d not in CORTES]
+    if desconocidos:
+        parser.error(f'Valores no válidos: {", ".join(desconocidos)}')
+    if not os.path.exists(args.ventas):
+        sys.exit(f"No se encontró el archivo de ventas '{args.ventas}'.")
+
+    resultado = generar_informes(args.ventas, args.salida, formatos, dimensiones, args.procesos, args.forzar)
+    print(f"Informes en {args.salida}: {resultado['generados']} generados, "
+          f"{resultado['omitidos']} sin cambios")
+    for id_corte, mensaje in sorted(resultado['errores'].items()):
+        print(f'  ❌ {id_corte}: {mensaje}')
+    return 1 if resultado['errores'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
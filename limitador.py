@@ -0,0 +1,196 @@
+# limitador.py
+# Control de admisión de la API: limita la tasa de peticiones por cliente
+# (cubo de tokens por usuario o IP) y la concurrencia del proceso (máximo de
+# peticiones en curso con una cola acotada). Ante una ráfaga, por ejemplo un
+# dashboard recargando en bucle, se rechaza pronto con 429/503 y Retry-After
+# en vez de dejar que todas las peticiones se degraden a la vez.
+
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict
+
+
+class CuboTokens:
+    """
+    Cubo de tokens por clave: `capacidad` peticiones de ráfaga que se reponen
+    a `tasa` por segundo. El estado de cada clave es [tokens, instante] en un
+    OrderedDict acotado (LRU): comprobar una petición es O(1) y la memoria no
+    crece con IPs de un solo uso. Una clave expulsada vuelve con el cubo lleno.
+    """
+
+    def __init__(self, tasa, capacidad, max_claves=10000):
+        self.tasa = tasa
+        self.capacidad = capacidad
+        self.max_claves = max_claves
+        self._cubos = OrderedDict()
+        self._cerrojo = threading.Lock()
+
+    def consumir(self, clave, coste=1.0):
+        """Descuenta `coste` tokens; devuelve 0 si se admite o los segundos hasta poder hacerlo."""
+        ahora = time.monotonic()
+        with self._cerrojo:
+            cubo = self._cubos.get(clave)
+            if cubo is None:
+                cubo = self._cubos[clave] = [self.capacidad, ahora]
+                if len(self._cubos) > self.max_claves:
+                    self._cubos.popitem(last=False)
+            else:
+                self._cubos.move_to_end(clave)
+                cubo[0] = min(self.capacidad, cubo[0] + (ahora - cubo[1]) * self.tasa)
+                cubo[1] = ahora
+            if cubo[0] >= coste:
+                cubo[0] -= coste
+                return 0.0
+            return (coste - cubo[0]) / self.tasa
+
+
+class LimiteConcurrencia:
+    """
+    Máximo de peticiones en curso (`max_activas`) con una cola de espera de
+    `max_cola` huecos. Una petición se rechaza si la cola está llena, si la
+    espera estimada (cola x duración media de las peticiones) supera
+    `espera_maxima`, o si al esperar se agota ese presupuesto.
+    """
+
+    def __init__(self, max_activas, max_cola, espera_maxima):
+        self.max_activas = max_activas
+        self.max_cola = max_cola
+        self.espera_maxima = espera_maxima
+        self.activas = 0
+        self.en_cola = 0
+        self.duracion_media = 0.0  # Media móvil exponencial de la duración (s)
+        self._condicion = threading.Condition()
+        self._esperas_async = set()  # (loop, asyncio.Event) de peticiones ASGI en cola
+
+    def espera_estimada(self):
+        """Segundos que tardaría en entrar una petición que llegase ahora a la cola."""
+        return (self.en_cola + 1) * self.duracion_media / self.max_activas
+
+    def _admitir_o_encolar(self):
+        """Con el cerrojo tomado: True = entra ya, None = a la cola, float = rechazo (Retry-After)."""
+        if self.activas < self.max_activas and not self.en_cola:
+            self.activas += 1
+            return True
+        espera = self.espera_estimada()
+        if self.en_cola >= self.max_cola or espera > self.espera_maxima:
+            return max(espera, self.duracion_media, 1.0)
+        self.en_cola += 1
+        return None
+
+    def _salir_de_cola(self, admitida):
+        self.en_cola -= 1
+        if admitida:
+            self.activas += 1
+        # Si no entra, deja pasar a la siguiente en la cola
+        elif self.activas < self.max_activas:
+            self._despertar()
+        return True if admitida else max(self.espera_estimada(), 1.0)
+
+    def entrar(self):
+        """Bloquea (modo WSGI) hasta entrar; devuelve True o los segundos de Retry-After."""
+        limite = time.monotonic() + self.espera_maxima
+        with self._condicion:
+            resultado = self._admitir_o_encolar()
+            if resultado is not None:
+                return resultado
+            admitida = self._condicion.wait_for(
+                lambda: self.activas < self.max_activas, limite - time.monotonic())
+            return self._salir_de_cola(admitida)
+
+    async def entrar_async(self):
+        """Igual que entrar(), pero sin ocupar un hilo mientras espera (modo ASGI)."""
+        limite = time.monotonic() + self.espera_maxima
+        with self._condicion:
+            resultado = self._admitir_o_encolar()
+            if resultado is not None:
+                return resultado
+            espera = (asyncio.get_running_loop(), asyncio.Event())
+            self._esperas_async.add(espera)
+        en_cola = True
+        try:
+            while True:
+                with self._condicion:
+                    if self.activas < self.max_activas:
+                        en_cola = False
+                        return self._salir_de_cola(True)
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        en_cola = False
+                        return self._salir_de_cola(False)
+                    espera[1].clear()
+                try:
+                    await asyncio.wait_for(espera[1].wait(), restante)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            with self._condicion:
+                self._esperas_async.discard(espera)
+                if en_cola:
+                    # Cancelada en la cola (el cliente cerró la conexión): libera
+                    # su hueco y, si había sitio, deja pasar a la siguiente
+                    self._salir_de_cola(False)
+
+    def salir(self, duracion):
+        """Libera el hueco de una petición admitida y registra cuánto duró."""
+        with self._condicion:
+            self.activas -= 1
+            self.duracion_media = duracion if not self.duracion_media else \
+                0.9 * self.duracion_media + 0.1 * duracion
+            self._despertar()
+
+    def _despertar(self):
+        self._condicion.notify()
+        for loop, aviso in self._esperas_async:
+            loop.call_soon_threadsafe(aviso.set)
+
+
+# --- Políticas por Ruta ---
+
+def leer_politica(valor):
+    """
+    Convierte 'tasa/capacidad' (p. ej. '0.2/5': ráfaga de 5 y luego una cada
+    5 s) en (tasa, capacidad); '0' o '' desactivan el límite (None).
+    Lanza ValueError si no es válida.
+    """
+    if valor.strip() in ('', '0'):
+        return None
+    tasa, _, capacidad = valor.partition('/')
+    tasa, capacidad = float(tasa), float(capacidad or tasa)
+    if tasa <= 0 or capacidad < 1:
+        raise ValueError(f'Política de límite inválida: {valor!r}')
+    return tasa, capacidad
+
+def segundos_reintento(segundos):
+    """Valor entero (al alza) para la cabecera Retry-After."""
+    return str(max(1, math.ceil(segundos)))
+
+
+class ControlAdmision:
+    """
+    Agrupa los cubos de tokens por política (p. ej. 'autenticacion',
+    'escritura', 'lectura') y el límite de concurrencia del proceso.
+    `comprobar_tasa` devuelve None si se admite o la respuesta de rechazo
+    (estado, mensaje, Retry-After) que el framework debe enviar.
+    """
+
+    def __init__(self, politicas, max_activas, max_cola, espera_maxima):
+        self.cubos = {nombre: CuboTokens(*politica) for nombre, politica in politicas.items() if politica}
+        self.concurrencia = LimiteConcurrencia(max_activas, max_cola, espera_maxima)
+
+    def comprobar_tasa(self, politica, clave):
+        cubo = self.cubos.get(politica)
+        if cubo is None:
+            return None
+        espera = cubo.consumir(clave)
+        if espera:
+            return 429, f'Demasiadas peticiones, reintenta en {segundos_reintento(espera)} s', segundos_reintento(espera)
+        return None
+
+    @staticmethod
+    def rechazo_concurrencia(resultado):
+        """Convierte el resultado de entrar()/entrar_async() en None (admitida) o un rechazo 503."""
+        if resultado is True:
+            return None
+        return 503, f'Servidor saturado, reintenta en {segundos_reintento(resultado)} s', segundos_reintento(resultado)
@@ -0,0 +1,197 @@
+# metricas.py
+# Instrumentación del backend: contadores, histogramas en formato texto de
+# Prometheus y un perfilador de muestreo opcional para peticiones lentas.
+
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+# --- Configuración ---
+# Límites (en segundos) de los histogramas de latencia.
+BUCKETS_LATENCIA = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _formatear_etiquetas(etiquetas):
+    """Convierte una tupla de pares (clave, valor) al formato {k="v",...}."""
+    if not etiquetas:
+        return ''
+    partes = []
+    for clave, valor in etiquetas:
+        valor = str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        partes.append(f'{clave}="{valor}"')
+    return '{' + ','.join(partes) + '}'
+
+
+def _formatear_numero(valor):
+    if valor == float('inf'):
+        return '+Inf'
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+# --- Registro de Métricas ---
+
+class RegistroMetricas:
+    """Almacena contadores e histogramas en memoria y los expone como texto Prometheus."""
+
+    def __init__(self, prefijo='invernadero'):
+        self.prefijo = prefijo
+        self._cerrojo = threading.Lock()
+        self._ayuda = {}
+        self._tipos = {}
+        self._contadores = defaultdict(int)
+        # Por cada (nombre, etiquetas): [conteos por bucket..., suma, total]
+        self._histogramas = {}
+        self._buckets = {}
+
+    def _nombre(self, nombre):
+        return f'{self.prefijo}_{nombre}'
+
+    def contador(self, nombre, ayuda):
+        """Declara un contador (solo afecta a las líneas HELP/TYPE)."""
+        self._ayuda[nombre] = ayuda
+        self._tipos[nombre] = 'counter'
+
+    def histograma(self, nombre, ayuda, buckets=BUCKETS_LATENCIA):
+        """Declara un histograma con sus límites."""
+        self._ayuda[nombre] = ayuda
+        self._tipos[nombre] = 'histogram'
+        self._buckets[nombre] = tuple(sorted(buckets))
+
+    def incrementar(self, nombre, valor=1, **etiquetas):
+        clave = (nombre, tuple(sorted(etiquetas.items())))
+        with self._cerrojo:
+            self._contadores[clave] += valor
+
+    def observar(self, nombre, valor, **etiquetas):
+        buckets = self._buckets.get(nombre, BUCKETS_LATENCIA)
+        clave = (nombre, tuple(sorted(etiquetas.items())))
+        with self._cerrojo:
+            serie = self._histogramas.get(clave)
+            if serie is None:
+                serie = self._histogramas[clave] = [0] * len(buckets) + [0.0, 0]
+            for i, limite in enumerate(buckets):
+                if valor <= limite:
+                    serie[i] += 1
+            serie[-2] += valor
+            serie[-1] += 1
+
+    def valor(self, nombre, **etiquetas):
+        """Devuelve el valor actual de un contador (0 si no existe)."""
+        return self._contadores.get((nombre, tuple(sorted(etiquetas.items()))), 0)
+
+    def exportar(self):
+        """Genera el cuerpo de /metrics en formato de exposición de texto 0.0.4."""
+        with self._cerrojo:
+            contadores = dict(self._contadores)
+            histogramas = {clave: list(serie) for clave, serie in self._histogramas.items()}
+
+        por_nombre = defaultdict(list)
+        for (nombre, etiquetas), valor in contadores.items():
+            por_nombre[nombre].append((etiquetas, valor))
+        for (nombre, etiquetas), serie in histogramas.items():
+            por_nombre[nombre].append((etiquetas, serie))
+
+        lineas = []
+        for nombre in sorted(por_nombre):
+            completo = self._nombre(nombre)
+            tipo = self._tipos.get(nombre, 'counter')
+            if nombre in self._ayuda:
+                lineas.append(f'# HELP {completo} {self._ayuda[nombre]}')
+            lineas.append(f'# TYPE {completo} {tipo}')
+            for etiquetas, dato in sorted(por_nombre[nombre], key=lambda par: par[0]):
+                if tipo == 'histogram':
+                    buckets = self._buckets.get(nombre, BUCKETS_LATENCIA)
+                    for limite, conteo in zip(buckets, dato):
+                        le = etiquetas + (('le', _formatear_numero(float(limite))),)
+                        lineas.append(f'{completo}_bucket{_formatear_etiquetas(le)} {conteo}')
+                    le = etiquetas + (('le', '+Inf'),)
+                    lineas.append(f'{completo}_bucket{_formatear_etiquetas(le)} {dato[-1]}')
+                    lineas.append(f'{completo}_sum{_formatear_etiquetas(etiquetas)} {_formatear_numero(dato[-2])}')
+                    lineas.append(f'{completo}_count{_formatear_etiquetas(etiquetas)} {dato[-1]}')
+                else:
+                    lineas.append(f'{completo}{_formatear_etiquetas(etiquetas)} {_formatear_numero(dato)}')
+        return '\n'.join(lineas) + '\n'
+
+
+# --- Perfilador de Muestreo (opcional) ---
+
+class PerfiladorMuestreo:
+    """
+    Muestrea periódicamente la pila de los hilos que están atendiendo una
+    petición. Si la petición supera el umbral, sus pilas se acumulan en
+    formato "plegado" (func1;func2;func3 N), compatible con flamegraph.pl
+    y speedscope.
+    """
+
+    def __init__(self, intervalo=0.005, umbral=0.5, max_pilas=5000):
+        self.intervalo = intervalo
+        self.umbral = umbral
+        self.max_pilas = max_pilas
+        self._cerrojo = threading.Lock()
+        self._activos = {}  # id de hilo -> Counter de pilas de la petición en curso
+        self._pilas = Counter()
+        self._hilo = None
+        # Con gunicorn --preload el perfilador se inicia en el maestro y los
+        # workers nacen por fork sin el hilo de muestreo: se relanza en cada hijo
+        os.register_at_fork(after_in_child=self._tras_fork)
+
+    def iniciar(self):
+        if self._hilo is None:
+            self._hilo = threading.Thread(target=self._bucle, name='perfilador-muestreo', daemon=True)
+            self._hilo.start()
+
+    def _tras_fork(self):
+        # El cerrojo pudo quedar tomado por el hilo del padre, que no existe aquí
+        self._cerrojo = threading.Lock()
+        self._activos = {}
+        self._pilas = Counter()
+        if self._hilo is not None:
+            self._hilo = None
+            self.iniciar()
+
+    def comenzar_peticion(self):
+        with self._cerrojo:
+            self._activos[threading.get_ident()] = Counter()
+
+    def terminar_peticion(self, duracion, ruta):
+        with self._cerrojo:
+            muestras = self._activos.pop(threading.get_ident(), None)
+            if not muestras or duracion < self.umbral:
+                return
+            for pila, conteo in muestras.items():
+                clave = f'{ruta};{pila}'
+                if clave in self._pilas or len(self._pilas) < self.max_pilas:
+                    self._pilas[clave] += conteo
+
+    def volcar(self, reiniciar=False):
+        """Devuelve las pilas acumuladas en formato plegado."""
+        with self._cerrojo:
+            lineas = [f'{pila} {conteo}' for pila, conteo in self._pilas.most_common()]
+            if reiniciar:
+                self._pilas.clear()
+        return '\n'.join(lineas) + ('\n' if lineas else '')
+
+    def _bucle(self):
+        propio = threading.get_ident()
+        while True:
+            time.sleep(self.intervalo)
+            with self._cerrojo:
+                if not self._activos:
+                    continue
+                marcos = sys._current_frames()
+                for ident, muestras in self._activos.items():
+                    marco = marcos.get(ident)
+                    if marco is None or ident == propio:
+                        continue
+                    muestras[_plegar_pila(marco)] += 1
+
+
+def _plegar_pila(marco):
+    partes = []
+    while marco is not None:
+        codigo = marco.f_code
+        partes.append(f'{codigo.co_name} ({os.path.basename(codigo.co_filename)})')
+        marco = marco.f_back
+    return ';'.join(reversed(partes))
@@ -0,0 +1,275 @@
+# respaldos.py
+# Copias de seguridad incrementales y comprimidas de los datos del volumen.
+#
+# Copiar los JSON de /vol/data mientras guardar_datos los reescribe puede
+# capturar un archivo a medias, y una copia completa cuesta más cuanto más
+# crecen los datos. En su lugar el servidor captura el estado en memoria:
+#   - Bajo el cerrojo de cada partición solo se copia la lista de cultivos
+#     (punteros). Los escritores nunca modifican un cultivo en el sitio, sino
+#     que lo sustituyen (aplicar_lote), así que esa copia es una foto fija del
+#     instante aunque se siga escribiendo mientras se comprime.
+#   - La versión de la partición (contador de sincronización) es la posición
+#     en el "diario": un respaldo incremental guarda solo los cultivos con
+#     versión posterior al respaldo anterior y las lápidas de las bajas.
+#   - Cada N respaldos se hace uno completo; se conservan las últimas cadenas.
+#
+# Archivos en el directorio de respaldos:
+#   respaldo_000001.json.gz   (JSON comprimido con gzip)
+#   estado.json               (última secuencia y versión respaldada por usuario)
+#
+# CLI:
+#   python respaldos.py listar
+#   python respaldos.py verificar [--hasta N]
+#   python respaldos.py restaurar --destino DIR [--hasta N] [--forzar]
+#   python respaldos.py crear          (solo con el servidor parado: lee del disco)
+
+import argparse
+import fcntl
+import gzip
+import os
+import re
+import sys
+import threading
+import zlib
+from datetime import datetime
+
+from serializacion import a_json, desde_json
+
+FORMATO = 1
+PATRON_RESPALDO = re.compile(r'^respaldo_(\d{6})\.json\.gz$')
+
+def huella(cultivos):
+    """Resumen barato (IDs y versiones, sin importar el orden) para verificar una restauración."""
+    # El hash de tuplas de enteros no depende de PYTHONHASHSEED: es estable entre procesos
+    return sum(hash((c.get('id') or 0, c.get('version', 0))) for c in cultivos) & 0xFFFFFFFF
+
+def escribir_atomico(ruta, contenido):
+    """Escribe en un temporal y lo renombra: nunca queda un archivo a medias."""
+    temporal = ruta + '.tmp'
+    with open(temporal, 'wb') as f:
+        f.write(contenido)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporal, ruta)
+
+def aplicar_registro(anterior, registro):
+    """Aplica el registro de una partición sobre su estado anterior (cultivos, borrados)."""
+    if registro['completo'] or anterior is None:
+        cultivos, lapidas = list(registro['cultivos']), list(registro['lapidas'])
+    else:
+        cultivos, borrados = anterior
+        posicion = {c.get('id'): i for i, c in enumerate(cultivos)}
+        for cultivo in registro['cultivos']:
+            i = posicion.get(cultivo['id'])
+            if i is None:
+                posicion[cultivo['id']] = len(cultivos)
+                cultivos.append(cultivo)
+            else:
+                cultivos[i] = cultivo
+        eliminados = {b['id'] for b in registro['lapidas']}
+        if eliminados:
+            cultivos = [c for c in cultivos if c.get('id') not in eliminados]
+        # Las lápidas que el servidor ya descartó quedan por debajo de 'minima'
+        lapidas = [b for b in borrados['borrados'] + registro['lapidas']
+                   if b['version'] > registro['minima']]
+    return cultivos, {'minima': registro['minima'], 'max_id': registro['max_id'], 'borrados': lapidas}
+
+class GestorRespaldos:
+    """Crea, lista y reconstruye los respaldos de un directorio."""
+
+    def __init__(self, directorio, completo_cada=24, cadenas=3):
+        self.directorio = directorio
+        self.completo_cada = completo_cada
+        self.cadenas = cadenas
+        self._cerrojo = threading.Lock()
+
+    def ruta(self, secuencia):
+        return os.path.join(self.directorio, f'respaldo_{secuencia:06d}.json.gz')
+
+    def secuencias(self):
+        """Secuencias de los respaldos presentes, de la más antigua a la más reciente."""
+        if not os.path.isdir(self.directorio):
+            return []
+        return sorted(int(m.group(1)) for m in map(PATRON_RESPALDO.match, os.listdir(self.directorio)) if m)
+
+    def leer(self, secuencia):
+        with gzip.open(self.ruta(secuencia), 'rb') as f:
+            return desde_json(f.read())
+
+    def leer_estado(self):
+        try:
+            with open(os.path.join(self.directorio, 'estado.json'), 'rb') as f:
+                return desde_json(f.read())
+        except (OSError, ValueError):
+            return {'secuencia': 0, 'completos': [], 'versiones': {}, 'usuarios': None}
+
+    # --- Creación ---
+
+    def crear(self, usuarios, particiones, capturar):
+        """
+        Escribe un respaldo y devuelve su ruta, o None si nada cambió desde el anterior.
+        `usuarios` es el contenido de usuarios.json y `capturar(usuario)` devuelve
+        la foto fija (version, cultivos, borrados) de cada partición de `particiones`.
+        """
+        os.makedirs(self.directorio, exist_ok=True)
+        with self._cerrojo, open(os.path.join(self.directorio, '.lock'), 'w') as cerrojo_archivo:
+            # También excluye a un `respaldos.py crear` lanzado a mano
+            fcntl.flock(cerrojo_archivo, fcntl.LOCK_EX)
+            estado = self.leer_estado()
+            anterior = estado['secuencia']
+            secuencia = anterior + 1
+            completo = (not anterior or not os.path.exists(self.ruta(anterior))
+                        or secuencia - estado['completos'][-1] >= self.completo_cada)
+            firma_usuarios = zlib.crc32(a_json(usuarios))
+            contenido = {'formato': FORMATO, 'secuencia': secuencia,
+                         'base': None if completo else anterior,
+                         'creado': datetime.now().isoformat(timespec='seconds'),
+                         'usuarios': usuarios if completo or firma_usuarios != estado['usuarios'] else None,
+                         'particiones': {}}
+            versiones = {}
+            for usuario in particiones:
+                version, cultivos, borrados = capturar(usuario)
+                versiones[usuario] = version
+                desde = None if completo else estado['versiones'].get(usuario)
+                if desde == version:
+                    continue
+                if desde is None or desde > version or desde < borrados['minima']:
+                    # Partición nueva, restaurada o con lápidas ya descartadas
+                    registro = {'completo': True, 'cultivos': cultivos, 'lapidas': borrados['borrados']}
+                else:
+                    registro = {'completo': False,
+                                'cultivos': [c for c in cultivos if c.get('version', 0) > desde],
+                                'lapidas': [b for b in borrados['borrados'] if b['version'] > desde]}
+                registro.update(version=version, minima=borrados['minima'],
+                                max_id=borrados.get('max_id', 0),
+                                total=len(cultivos), huella=huella(cultivos))
+                contenido['particiones'][usuario] = registro
+            if not completo and contenido['usuarios'] is None and not contenido['particiones']:
+                return None
+
+            ruta = self.ruta(secuencia)
+            completos = estado['completos'] + [secuencia] if completo else estado['completos']
+            escribir_atomico(ruta, gzip.compress(a_json(contenido), compresslevel=6))
+            escribir_atomico(os.path.join(self.directorio, 'estado.json'), a_json({
+                'secuencia': secuencia,
+                'completos': completos[-self.cadenas:],
+                'versiones': versiones,
+                'usuarios': firma_usuarios,
+            }))
+            self.podar(completos[-self.cadenas:][0])
+            return ruta
+
+    def podar(self, limite):
+        """Borra los respaldos anteriores a `limite` (el completo más antiguo que se conserva)."""
+        for secuencia in self.secuencias():
+            if secuencia < limite:
+                os.remove(self.ruta(secuencia))
+
+    # --- Restauración ---
+
+    def cadena(self, hasta=None):
+        """Contenido de los respaldos necesarios para reconstruir `hasta` (el último por defecto)."""
+        disponibles = self.secuencias()
+        if not disponibles:
+            raise ValueError(f'No hay respaldos en {self.directorio}')
+        secuencia = hasta or disponibles[-1]
+        cadena = []
+        while secuencia is not None:
+            try:
+                contenido = self.leer(secuencia)
+            except FileNotFoundError:
+                raise ValueError(f'Cadena rota: falta el respaldo {secuencia}') from None
+            except (OSError, ValueError, EOFError) as e:
+                raise ValueError(f'Respaldo {secuencia} ilegible: {e}') from None
+            if contenido.get('formato') != FORMATO:
+                raise ValueError(f'Respaldo {secuencia}: formato desconocido {contenido.get("formato")!r}')
+            cadena.append(contenido)
+            secuencia = contenido['base']
+        return cadena[::-1]
+
+    def reconstruir(self, hasta=None):
+        """
+        Estado en el respaldo `hasta`: {'secuencia', 'creado', 'usuarios',
+        'particiones': {usuario: (cultivos, borrados)}}. Comprueba la huella de
+        cada partición y lanza ValueError si no coincide.
+        """
+        usuarios, particiones, esperado = None, {}, {}
+        for contenido in self.cadena(hasta):
+            if contenido['usuarios'] is not None:
+                usuarios = contenido['usuarios']
+            for usuario, registro in contenido['particiones'].items():
+                particiones[usuario] = aplicar_registro(particiones.get(usuario), registro)
+                esperado[usuario] = (registro['total'], registro['huella'])
+        for usuario, (cultivos, _) in particiones.items():
+            if (len(cultivos), huella(cultivos)) != esperado[usuario]:
+                raise ValueError(f'La partición de {usuario!r} no coincide con su huella')
+        return {'secuencia': contenido['secuencia'], 'creado': contenido['creado'],
+                'usuarios': usuarios or [], 'particiones': particiones}
+
+# --- CLI ---
+
+def directorio_por_defecto():
+    return os.environ.get('RUTA_RESPALDOS') or os.path.join(
+        os.environ.get('RUTA_PERSISTENCIA', '/vol/data'), 'respaldos')
+
+def listar(gestor, _args):
+    for secuencia in gestor.secuencias():
+        contenido = gestor.leer(secuencia)
+        tipo = 'completo' if contenido['base'] is None else f'incremental sobre {contenido["base"]}'
+        cambios = sum(len(r['cultivos']) + len(r['lapidas']) for r in contenido['particiones'].values())
+        print(f'{secuencia:6d}  {contenido["creado"]}  {tipo:26}  '
+              f'{len(contenido["particiones"]):5d} particiones  {cambios:8d} registros  '
+              f'{os.path.getsize(gestor.ruta(secuencia)) / 1024:9.1f} KiB')
+
+def verificar(gestor, args):
+    estado = gestor.reconstruir(args.hasta)
+    total = sum(len(cultivos) for cultivos, _ in estado['particiones'].values())
+    print(f'Respaldo {estado["secuencia"]} ({estado["creado"]}) correcto: '
+          f'{len(estado["usuarios"])} usuarios, {len(estado["particiones"])} particiones, {total} cultivos')
+
+def restaurar(gestor, args):
+    estado = gestor.reconstruir(args.hasta)
+    # app_backend decide dónde vive cada partición (RAICES_PARTICIONES)
+    os.environ['RUTA_PERSISTENCIA'] = args.destino
+    os.environ.setdefault('PRECARGAR_PARTICIONES', '0')
+    import app_backend
+    if not args.forzar and (os.path.exists(app_backend.RUTA_DATOS_USUARIOS)
+                            or next(app_backend.usuarios_con_particion(), None) is not None):
+        sys.exit(f'{args.destino} ya contiene datos (usa --forzar para sobrescribirlos)')
+    app_backend.guardar_datos(estado['usuarios'], app_backend.RUTA_DATOS_USUARIOS)
+    for usuario, (cultivos, borrados) in estado['particiones'].items():
+        particion = app_backend.datos_de(usuario)
+        app_backend.guardar_datos(borrados, particion.ruta_borrados)
+        app_backend.guardar_datos(cultivos, particion.ruta_cultivos)
+    print(f'Restaurado el respaldo {estado["secuencia"]} ({estado["creado"]}) en {args.destino}: '
+          f'{len(estado["usuarios"])} usuarios, {len(estado["particiones"])} particiones')
+
+def crear(gestor, _args):
+    import app_backend
+    app_backend.gestor_respaldos = gestor
+    ruta = app_backend.tomar_respaldo()
+    print(ruta or 'Sin cambios desde el último respaldo')
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Respaldos incrementales de los datos de cultivos.')
+    parser.add_argument('--directorio', default=directorio_por_defecto(),
+                        help='Directorio de respaldos (por defecto $RUTA_RESPALDOS o <RUTA_PERSISTENCIA>/respaldos)')
+    ordenes = parser.add_subparsers(dest='orden', required=True)
+    ordenes.add_parser('listar', help='Lista los respaldos disponibles').set_defaults(funcion=listar)
+    orden = ordenes.add_parser('verificar', help='Reconstruye un respaldo y comprueba sus huellas')
+    orden.add_argument('--hasta', type=int, help='Secuencia a verificar (la última por defecto)')
+    orden.set_defaults(funcion=verificar)
+    orden = ordenes.add_parser('restaurar', help='Restaura un respaldo en un directorio de datos')
+    orden.add_argument('--destino', required=True, help='RUTA_PERSISTENCIA donde escribir los datos')
+    orden.add_argument('--hasta', type=int, help='Secuencia a restaurar (la última por defecto)')
+    orden.add_argument('--forzar', action='store_true', help='Sobrescribe los datos existentes')
+    orden.set_defaults(funcion=restaurar)
+    ordenes.add_parser('crear', help='Crea un respaldo leyendo del disco (servidor parado)').set_defaults(funcion=crear)
+    args = parser.parse_args(argv)
+    try:
+        args.funcion(GestorRespaldos(args.directorio), args)
+    except ValueError as e:
+        sys.exit(str(e))
+
+if __name__ == '__main__':
+    main()
@@ -6,6 +6,14 @@ const BASE_URL = 'https://[TU-APP-FLYIO].fly.dev';
 
 // --- Estado de la Aplicación ---
 let cultivosData = []; // Almacenará los datos de cultivos
+let eventosCultivos = null; // Conexión SSE con los cambios en tiempo real
+let ultimoEventoCultivos = null; // ID del último evento SSE recibido
+let renderizadoPendiente = false; // Tabla y gráfico por redibujar en el próximo frame
+let temporizadorReconexion = null; // Reconexión SSE pendiente tras un rechazo del servidor
+let busquedaActual = ''; // Texto del buscador de cultivos (vacío = lista completa)
+let temporizadorBusqueda = null;
+let temporizadorRefrescoBusqueda = null; // Repetición de la búsqueda pendiente tras eventos SSE
+let peticionBusqueda = 0; // Número de la última búsqueda enviada
 
 // --- Función de Utilidad para Peticiones de API ---
 /**
@@ -14,7 +22,7 @@ let cultivosData = []; // Almacenará los datos de cultivos
  * @param {object} options - Opciones de fetch.
  * @returns {Promise<object>} Objeto con el estado de la respuesta.
  */
-async function apiFetch(endpoint, options = {}) {
+async function apiFetch(endpoint, options = {}, reintentar = true) {
     const url = `${BASE_URL}${endpoint}`;
     
     // Configuración para enviar cookies (credenciales)
@@ -39,11 +47,19 @@ async function apiFetch(endpoint, options = {}) {
             return { success: false, status: 401 };
         }
 
+        if ((response.status === 429 || response.status === 503) && reintentar
+                && (options.method || 'GET') === 'GET') {
+            // Servidor limitando peticiones: un único reintento tras el Retry-After indicado
+            const segundos = Math.min(parseInt(response.headers.get('Retry-After'), 10) || 1, 30);
+            await new Promise(resolve => setTimeout(resolve, segundos * 1000));
+            return apiFetch(endpoint, options, false);
+        }
+
         // Intentar parsear el JSON solo si hay contenido
         const contentType = response.headers.get("content-type");
         const data = (contentType && contentType.indexOf("application/json") !== -1) ? await response.json() : null;
 
-        return { success: response.ok, data: data, status: response.status };
+        return { success: response.ok, data: data, status: response.status, headers: response.headers };
 
     } catch (error) {
         console.error("Error de conexión con la API:", error);
@@ -105,6 +121,7 @@ async function handleRegister(event) {
 }
 
 async function logout() {
+    desconectarEventos();
     const result = await apiFetch('/auth/logout', { method: 'POST' });
 
     // La función de logout se encarga de eliminar la cookie
@@ -124,6 +141,9 @@ async function loadDashboard() {
         cultivosData = result.data || [];
         renderCultivosTable(cultivosData);
         renderCharts(cultivosData);
+        dibujarGraficoGanancias();
+        // 2. Escuchar cambios desde el último evento incluido en la lista
+        conectarEventos(result.headers.get('X-Ultimo-Evento'));
     } else if (result.status !== 401) {
         // Mostrar error solo si no es un 401 (ya manejado por apiFetch)
         alert(result.data ? result.data.message : "Error al cargar los datos de cultivos.");
@@ -190,7 +210,8 @@ async function saveCultivo(event) {
         form.reset();
         delete form.dataset.editId; // Limpiar modo edición
         document.getElementById('cultivo-form-title').textContent = 'Añadir Nuevo Cultivo';
-        await loadDashboard(); // Recargar datos
+        // Aplicamos la respuesta sin recargar la lista (el evento SSE llegará después y es idempotente)
+        aplicarCambioCultivo(isEdit ? 'cultivo_actualizado' : 'cultivo_creado', isEdit ? result.data.cultivo : result.data);
     } else {
         alert(result.data ? result.data.message : `Error al ${isEdit ? 'actualizar' : 'crear'} el cultivo.`);
     }
@@ -225,12 +246,132 @@ async function deleteCultivo(id) {
 
     if (result.success) {
         alert("Cultivo eliminado con éxito.");
-        await loadDashboard(); // Recargar datos
+        aplicarCambioCultivo('cultivo_eliminado', { id: id });
     } else {
         alert(result.data ? result.data.message : "Error al eliminar el cultivo.");
     }
 }
 
+// --- Cambios en Tiempo Real (Server-Sent Events) ---
+
+/**
+ * Aplica un alta/cambio/baja sobre cultivosData sin volver a pedir la lista.
+ * Es idempotente: recibir dos veces el mismo evento no duplica filas.
+ * @param {string} tipo - 'cultivo_creado', 'cultivo_actualizado' o 'cultivo_eliminado'.
+ * @param {object} cultivo - Cultivo afectado (en las bajas basta con el ID).
+ */
+function aplicarCambioCultivo(tipo, cultivo) {
+    const indice = cultivosData.findIndex(c => c.id === cultivo.id);
+    if (tipo === 'cultivo_eliminado') {
+        if (indice === -1) return;
+        cultivosData.splice(indice, 1);
+    } else if (indice === -1) {
+        cultivosData.push(cultivo);
+    } else {
+        cultivosData[indice] = cultivo;
+    }
+    if (busquedaActual) {
+        programarRefrescoBusqueda();
+    }
+    programarRenderizado();
+    programarGraficoGanancias();
+}
+
+/**
+ * Redibuja la tabla y el gráfico de cultivos una sola vez por ráfaga de
+ * cambios (en el siguiente frame): un lote de sincronización con cientos de
+ * eventos no reconstruye la tabla ni recrea el Chart cientos de veces.
+ */
+function programarRenderizado() {
+    if (renderizadoPendiente) return;
+    renderizadoPendiente = true;
+    requestAnimationFrame(() => {
+        renderizadoPendiente = false;
+        if (!busquedaActual) {
+            renderCultivosTable(cultivosData);
+        }
+        renderCharts(cultivosData);
+    });
+}
+
+function conectarEventos(ultimoEvento) {
+    if (eventosCultivos) return;
+    ultimoEventoCultivos = ultimoEvento || null;
+    // En reconexiones el navegador envía Last-Event-ID automáticamente
+    const desde = ultimoEvento ? `?desde=${encodeURIComponent(ultimoEvento)}` : '';
+    eventosCultivos = new EventSource(`${BASE_URL}/api/v1/cultivos/eventos${desde}`, { withCredentials: true });
+
+    ['cultivo_creado', 'cultivo_actualizado', 'cultivo_eliminado'].forEach(tipo => {
+        eventosCultivos.addEventListener(tipo, event => {
+            ultimoEventoCultivos = event.lastEventId;
+            aplicarCambioCultivo(tipo, JSON.parse(event.data));
+        });
+    });
+    // El servidor ya no tiene los eventos perdidos: recargamos la lista completa
+    eventosCultivos.addEventListener('reinicio', () => {
+        desconectarEventos();
+        loadDashboard();
+    });
+    // El navegador reconecta solo cuando el servidor cierra el stream, pero no
+    // tras una respuesta de error (p. ej. 503 con demasiados streams abiertos)
+    eventosCultivos.addEventListener('error', () => {
+        if (eventosCultivos.readyState !== EventSource.CLOSED) return;
+        const desdeUltimo = ultimoEventoCultivos;
+        desconectarEventos();
+        temporizadorReconexion = setTimeout(() => conectarEventos(desdeUltimo), 5000);
+    });
+}
+
+function desconectarEventos() {
+    clearTimeout(temporizadorReconexion);
+    temporizadorReconexion = null;
+    if (eventosCultivos) {
+        eventosCultivos.close();
+        eventosCultivos = null;
+    }
+}
+
+// --- Búsqueda de Cultivos ---
+
+/**
+ * Busca en el servidor (índice de texto completo) y pinta los resultados.
+ * Con la consulta vacía se vuelve a mostrar la lista completa ya cargada.
+ * @param {string} consulta - Texto libre sobre nombre, notas y zona.
+ */
+async function buscarCultivos(consulta) {
+    busquedaActual = consulta.trim();
+    if (!busquedaActual) {
+        renderCultivosTable(cultivosData);
+        return;
+    }
+    const pedida = busquedaActual;
+    const peticion = ++peticionBusqueda;
+    const result = await apiFetch(`/api/v1/cultivos/search?q=${encodeURIComponent(pedida)}&limite=50`);
+    // Ignorar respuestas de consultas que el usuario ya ha cambiado o que
+    // llegan después de las de una búsqueda posterior
+    if (pedida !== busquedaActual || peticion !== peticionBusqueda) return;
+    if (result.success) {
+        renderCultivosTable(result.data);
+    }
+}
+
+/**
+ * Repite la búsqueda activa tras cambios recibidos por SSE, agrupando las
+ * ráfagas: como mucho una petición cada 300 ms.
+ */
+function programarRefrescoBusqueda() {
+    if (temporizadorRefrescoBusqueda) return;
+    temporizadorRefrescoBusqueda = setTimeout(() => {
+        temporizadorRefrescoBusqueda = null;
+        if (busquedaActual) buscarCultivos(busquedaActual);
+    }, 300);
+}
+
+function programarBusqueda(event) {
+    clearTimeout(temporizadorBusqueda);
+    temporizadorBusqueda = setTimeout(() => buscarCultivos(event.target.value), 250);
+}
+
 // --- Lógica de Gráficos ---
 // (Esta sección no requiere cambios y funciona igual que antes)
 
@@ -289,6 +430,82 @@ function renderCharts(data) {
     });
 }
 
+let gananciaChartInstance = null;
+let temporizadorGanancias = null; // Redibujo del ranking pendiente tras eventos SSE
+let peticionGanancias = 0; // Número de la última petición del ranking enviada
+
+/**
+ * Agrupa los redibujos del ranking pedidos por los eventos SSE: una ráfaga
+ * (p. ej. un lote de sincronización de cientos de cambios) hace una sola
+ * petición cada 300 ms como mucho, sin acercarse al límite de lecturas.
+ */
+function programarGraficoGanancias() {
+    if (temporizadorGanancias) return;
+    temporizadorGanancias = setTimeout(() => {
+        temporizadorGanancias = null;
+        dibujarGraficoGanancias();
+    }, 300);
+}
+
+/**
+ * Dibuja un gráfico de barras con los 5 cultivos con mayor ganancia potencial.
+ * El ranking lo calcula el servidor (/api/v1/cultivos/top), que lo mantiene
+ * ordenado de forma incremental: no hace falta ordenar toda la lista aquí.
+ */
+async function dibujarGraficoGanancias() {
+    const canvasElement = document.getElementById('gananciaChart');
+    if (!canvasElement) return;
+
+    const peticion = ++peticionGanancias;
+    const result = await apiFetch('/api/v1/cultivos/top?k=5', { method: 'GET' });
+    // Una respuesta que llega después de la de una petición posterior está desfasada
+    if (peticion !== peticionGanancias || !result.success) return;
+    const datosGanancia = result.data || [];
+
+    if (gananciaChartInstance) {
+        gananciaChartInstance.destroy();
+        gananciaChartInstance = null;
+    }
+    if (datosGanancia.length === 0) {
+        const ctx = canvasElement.getContext('2d');
+        ctx.clearRect(0, 0, ctx.canvas.width, ctx.canvas.height);
+        return;
+    }
+
+    gananciaChartInstance = new Chart(canvasElement.getContext('2d'), {
+        type: 'bar',
+        data: {
+            labels: datosGanancia.map(d => d.nombre),
+            datasets: [{
+                label: 'Ganancia Potencial (€)',
+                data: datosGanancia.map(d => d.margen.toFixed(2)),
+                backgroundColor: 'rgba(75, 192, 192, 0.7)',
+                borderColor: 'rgba(75, 192, 192, 1)',
+                borderWidth: 1
+            }]
+        },
+        options: {
+            responsive: true,
+            scales: {
+                y: {
+                    beginAtZero: true,
+                    title: { display: true, text: 'Ganancia (€)' },
+                    ticks: { color: '#ddd' },
+                    grid: { color: 'rgba(255, 255, 255, 0.1)' }
+                },
+                x: {
+                    ticks: { color: '#ddd' },
+                    grid: { color: 'rgba(255, 255, 255, 0.1)' }
+                }
+            },
+            plugins: {
+                legend: { labels: { color: '#ddd' } },
+                title: { display: true, text: 'Top 5: Proyección de Ganancia', color: '#ddd' }
+            }
+        }
+    });
+}
+
 // --- Inicialización y Event Listeners ---
 // (Se mantiene igual)
 
@@ -314,6 +531,11 @@ document.addEventListener('DOMContentLoaded', () => {
     if (cultivoForm) {
         cultivoForm.addEventListener('submit', saveCultivo);
     }
+
+    const cultivoSearch = document.getElementById('cultivoSearch');
+    if (cultivoSearch) {
+        cultivoSearch.addEventListener('input', programarBusqueda);
+    }
     
     const showRegisterBtn = document.getElementById('show-register-btn');
     if (showRegisterBtn) {
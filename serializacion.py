@@ -0,0 +1,84 @@
+# serializacion.py
+# Codificación JSON rápida (orjson si está instalado, json estándar si no) y
+# compresión negociada (brotli/gzip) de las respuestas de la API.
+
+import gzip
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende del entorno
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depende del entorno
+    brotli = None
+
+# --- JSON ---
+
+def a_json(datos, legible=False, ordenar=False, default=None):
+    """
+    Serializa a bytes UTF-8. Por defecto produce JSON compacto; legible=True
+    añade sangría de 4 espacios (solo para exportaciones).
+    """
+    if legible:
+        return json.dumps(datos, indent=4, ensure_ascii=False, sort_keys=ordenar,
+                          default=default).encode('utf-8')
+    if orjson is not None:
+        try:
+            return orjson.dumps(datos, default=default,
+                                option=orjson.OPT_SORT_KEYS if ordenar else 0)
+        except TypeError:
+            # Enteros fuera de 64 bits u otros tipos que orjson no admite
+            pass
+    return json.dumps(datos, separators=(',', ':'), ensure_ascii=False, sort_keys=ordenar,
+                      default=default).encode('utf-8')
+
+def desde_json(contenido):
+    """Deserializa bytes o str JSON."""
+    if orjson is not None:
+        return orjson.loads(contenido)
+    return json.loads(contenido)
+
+# --- Compresión HTTP ---
+# Por debajo de este tamaño la compresión no compensa la latencia añadida.
+UMBRAL_COMPRESION = 1024
+
+def elegir_codificacion(accept_encoding):
+    """Elige 'br' o 'gzip' según la cabecera Accept-Encoding del cliente (o None)."""
+    aceptadas = {}
+    for parte in (accept_encoding or '').split(','):
+        nombre, _, parametros = parte.strip().partition(';')
+        calidad = 1.0
+        if parametros.strip().startswith('q='):
+            try:
+                calidad = float(parametros.strip()[2:])
+            except ValueError:
+                calidad = 0.0
+        aceptadas[nombre.strip().lower()] = calidad
+    if brotli is not None and aceptadas.get('br', 0) > 0:
+        return 'br'
+    if aceptadas.get('gzip', 0) > 0:
+        return 'gzip'
+    return None
+
+def comprimir(datos, codificacion):
+    """Comprime el cuerpo con la codificación elegida."""
+    if codificacion == 'br':
+        # Calidad 5: buen equilibrio entre ratio y CPU para respuestas dinámicas
+        return brotli.compress(datos, quality=5)
+    return gzip.compress(datos, compresslevel=6)
+
+def debe_comprimir(response, accept_encoding, umbral=UMBRAL_COMPRESION):
+    """Indica la codificación a aplicar a una respuesta ya generada, o None."""
+    if getattr(response, 'direct_passthrough', False) or getattr(response, 'is_streamed', False):
+        return None
+    if 'Content-Encoding' in response.headers or not (200 <= response.status_code < 300):
+        return None
+    if response.mimetype not in ('application/json', 'text/plain', 'text/html',
+                                 'text/css', 'application/javascript', 'text/javascript'):
+        return None
+    if (response.content_length or 0) < umbral:
+        return None
+    return elegir_codificacion(accept_encoding)
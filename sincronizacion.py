@@ -0,0 +1,372 @@
+# sincronizacion.py
+# Sincronización offline-first entre la app de escritorio (cultivos.py) y
+# app_backend. La app trabaja siempre contra un almacén local (JSON en disco),
+# así que responde igual con o sin conexión. Un hilo en segundo plano:
+#   1. Envía los cambios pendientes en lotes (POST /api/v1/cultivos/lote).
+#      Varios cambios sobre el mismo cultivo se agrupan en una sola operación.
+#   2. Pide solo lo cambiado desde la última versión conocida
+#      (GET /api/v1/cultivos/cambios?desde=V).
+# Conflictos: un cambio local solo se aplica si partía de la versión actual
+# del servidor; si no, gana el servidor y su copia sustituye a la local.
+#
+# Uso:  python sincronizacion.py [url] [usuario] [contraseña]   (un ciclo)
+
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+RUTA_ALMACEN = "cultivos_sync.json"
+TAMANO_LOTE = 200            # Operaciones por POST (el servidor admite hasta 500)
+INTERVALO_SINCRONIZACION = 30.0
+RETARDO_AGRUPACION = 1.0     # Espera tras un cambio local para agrupar los siguientes
+MAX_ESPERA_SIN_CONEXION = 300.0
+PREFIJO_LOCAL = "local-"     # Clave de los cultivos que aún no tienen ID del servidor
+
+
+# --- Almacén Local ---
+
+class AlmacenLocal:
+    """
+    Copia local de los cultivos más la cola de operaciones pendientes de
+    enviar. Las claves son el ID del servidor como texto, o 'local-<uuid>'
+    para los cultivos creados sin conexión.
+    """
+
+    def __init__(self, ruta=RUTA_ALMACEN):
+        self.ruta = ruta
+        self.cerrojo = threading.RLock()
+        self.version = 0
+        self.cultivos = {}    # clave -> dict
+        self.pendientes = {}  # clave -> operación agrupada (en orden de llegada)
+        self.alias = {}       # clave local -> clave del servidor, tras confirmarse el alta
+        self.existia = self._cargar()
+
+    def _cargar(self):
+        try:
+            with open(self.ruta, "r", encoding="utf-8") as f:
+                estado = json.load(f)
+        except FileNotFoundError:
+            return False
+        self.version = estado.get("version", 0)
+        self.cultivos = estado.get("cultivos", {})
+        self.pendientes = {op["clave"]: op for op in estado.get("pendientes", [])}
+        self.alias = estado.get("alias", {})
+        return True
+
+    def guardar(self):
+        """Escritura atómica (archivo temporal + rename): nunca queda un almacén a medias."""
+        with self.cerrojo:
+            temporal = self.ruta + ".tmp"
+            with open(temporal, "w", encoding="utf-8") as f:
+                json.dump({
+                    "version": self.version,
+                    "cultivos": self.cultivos,
+                    "pendientes": list(self.pendientes.values()),
+                    "alias": self.alias,
+                }, f, separators=(",", ":"), ensure_ascii=False)
+            os.replace(temporal, self.ruta)
+
+    def resolver(self, clave):
+        """Traduce una clave local ya confirmada a la del servidor."""
+        return self.alias.get(clave, clave)
+
+    def listar(self):
+        """Pares (clave, cultivo) en orden de inserción."""
+        with self.cerrojo:
+            return [(clave, dict(cultivo)) for clave, cultivo in self.cultivos.items()]
+
+    # --- Cambios locales (agrupados por cultivo) ---
+
+    def crear(self, datos):
+        with self.cerrojo:
+            origen = uuid.uuid4().hex
+            clave = PREFIJO_LOCAL + origen
+            self.cultivos[clave] = dict(datos)
+            self.pendientes[clave] = {"clave": clave, "op": "crear", "origen": origen, "datos": dict(datos)}
+            return clave
+
+    def actualizar(self, clave, cambios):
+        with self.cerrojo:
+            clave = self.resolver(clave)
+            cultivo = self.cultivos[clave]
+            cultivo.update(cambios)
+            previa = self.pendientes.get(clave)
+            # Cada agrupación crea una operación nueva: la que está en vuelo no cambia
+            if previa is None:
+                op = {"clave": clave, "op": "actualizar", "id": cultivo["id"],
+                      "version_base": cultivo.get("version", 0), "datos": dict(cambios)}
+            else:
+                op = dict(previa, datos=dict(previa["datos"], **cambios))
+            self.pendientes[clave] = op
+
+    def borrar(self, clave):
+        with self.cerrojo:
+            clave = self.resolver(clave)
+            cultivo = self.cultivos.pop(clave)
+            previa = self.pendientes.pop(clave, None)
+            if previa is not None and previa["op"] == "crear":
+                # Nunca llegó al servidor (si está en vuelo, se borra al confirmarse)
+                return
+            self.pendientes[clave] = {"clave": clave, "op": "borrar", "id": cultivo["id"],
+                                      "version_base": previa["version_base"] if previa else cultivo.get("version", 0)}
+
+    def aplicar_vista(self, registros, claves_previas):
+        """
+        Traduce el estado completo que tiene la interfaz a operaciones: registros
+        es una lista de (clave o None, dict). Las claves de claves_previas que ya
+        no aparecen se borran. Devuelve la clave de cada registro, en orden, o
+        None si el servidor lo borró entretanto (gana el servidor).
+        """
+        with self.cerrojo:
+            claves = []
+            for clave, datos in registros:
+                if clave is None:
+                    claves.append(self.crear(datos))
+                    continue
+                clave = self.resolver(clave)
+                actual = self.cultivos.get(clave)
+                if actual is None:
+                    claves.append(None)
+                    continue
+                cambios = {k: v for k, v in datos.items() if actual.get(k) != v}
+                if cambios:
+                    self.actualizar(clave, cambios)
+                claves.append(clave)
+            for clave in set(map(self.resolver, claves_previas)) - set(claves):
+                if clave in self.cultivos:
+                    self.borrar(clave)
+            return claves
+
+    # --- Resultados del servidor ---
+
+    def tomar_lote(self, tamano=TAMANO_LOTE):
+        """Primeras operaciones pendientes, tal y como se enviarán."""
+        with self.cerrojo:
+            return list(self.pendientes.values())[:tamano]
+
+    def aplicar_resultados(self, enviadas, respuesta):
+        """Incorpora la respuesta de un lote. Devuelve True si cambió algún dato visible."""
+        cambio_visible = False
+        with self.cerrojo:
+            for enviada, resultado in zip(enviadas, respuesta["resultados"]):
+                clave = enviada["clave"]
+                actual = self.pendientes.get(clave)
+                sin_cambios = actual is enviada
+                servidor = resultado.get("cultivo")
+
+                if resultado["estado"] == "conflicto" or resultado["estado"] == "error":
+                    # Gana el servidor: se descartan también los cambios locales posteriores
+                    self.pendientes.pop(clave, None)
+                    if servidor is None:
+                        cambio_visible |= self.cultivos.pop(clave, None) is not None
+                    else:
+                        self.cultivos[clave] = servidor
+                        cambio_visible = True
+                elif enviada["op"] == "crear":
+                    nueva = str(servidor["id"])
+                    self.alias[clave] = nueva
+                    local = self.cultivos.pop(clave, None)
+                    self.pendientes.pop(clave, None)
+                    if local is None:
+                        # Se borró en local mientras el alta estaba en vuelo
+                        self.pendientes[nueva] = {"clave": nueva, "op": "borrar", "id": servidor["id"],
+                                                  "version_base": servidor["version"]}
+                    elif sin_cambios:
+                        self.cultivos[nueva] = servidor
+                    else:
+                        # Hubo más cambios locales: pasan a ser una actualización
+                        self.cultivos[nueva] = dict(local, id=servidor["id"], version=servidor["version"])
+                        self.pendientes[nueva] = {"clave": nueva, "op": "actualizar", "id": servidor["id"],
+                                                  "version_base": servidor["version"], "datos": actual["datos"]}
+                    cambio_visible = True
+                elif sin_cambios:
+                    del self.pendientes[clave]
+                    if servidor is not None:
+                        self.cultivos[clave] = servidor
+                elif actual is not None:
+                    # Cambios locales posteriores: se rebasan sobre la nueva versión
+                    version = servidor["version"] if servidor else actual["version_base"]
+                    self.pendientes[clave] = dict(actual, version_base=version)
+                    if clave in self.cultivos and servidor is not None:
+                        self.cultivos[clave]["version"] = version
+        # self.version no avanza aquí: solo el delta garantiza no saltarse
+        # cambios de otros clientes anteriores a este lote.
+        return cambio_visible
+
+    def aplicar_cambios(self, cambios):
+        """
+        Incorpora un delta de GET /cambios. Los cultivos con cambios locales
+        pendientes no se tocan: su conflicto lo resuelve el siguiente lote.
+        Devuelve True si cambió algún dato visible.
+        """
+        with self.cerrojo:
+            recibidos = {str(c["id"]): c for c in cambios["cultivos"]}
+            if cambios["completo"]:
+                borrados = [clave for clave in self.cultivos
+                            if not clave.startswith(PREFIJO_LOCAL) and clave not in recibidos]
+            else:
+                borrados = [str(i) for i in cambios["borrados"]]
+            cambio_visible = False
+            for clave, cultivo in recibidos.items():
+                if clave not in self.pendientes and self.cultivos.get(clave) != cultivo:
+                    self.cultivos[clave] = cultivo
+                    cambio_visible = True
+            for clave in borrados:
+                if clave not in self.pendientes and self.cultivos.pop(clave, None) is not None:
+                    cambio_visible = True
+            self.version = cambios["version"]
+            return cambio_visible
+
+
+# --- Cliente HTTP ---
+
+class ClienteAPI:
+    """Sesión HTTP reutilizable (keep-alive y pool de conexiones) contra app_backend."""
+
+    def __init__(self, url_base, usuario, password, timeout=10.0):
+        self.url_base = url_base.rstrip("/")
+        self.usuario = usuario
+        self.password = password
+        self.timeout = timeout
+        self.sesion = requests.Session()
+        # Reintentos cortos ante caídas de conexión y 502/503/504. Repetir un
+        # lote es seguro: las altas llevan 'origen' y los cambios version_base.
+        reintentos = Retry(total=2, backoff_factor=0.3, status_forcelist=(502, 503, 504),
+                           allowed_methods=None, raise_on_status=False)
+        adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=2, max_retries=reintentos)
+        self.sesion.mount("http://", adaptador)
+        self.sesion.mount("https://", adaptador)
+
+    def iniciar_sesion(self):
+        respuesta = self.sesion.post(f"{self.url_base}/auth/login", timeout=self.timeout,
+                                     json={"username": self.usuario, "password": self.password})
+        respuesta.raise_for_status()
+        # La cookie es 'secure': se reenvía como cabecera para que funcione también en http local
+        self.sesion.headers["Authorization"] = f"Bearer {respuesta.cookies['token']}"
+        self.sesion.cookies.clear()
+
+    def _pedir(self, metodo, ruta, **kwargs):
+        if "Authorization" not in self.sesion.headers:
+            self.iniciar_sesion()
+        respuesta = self.sesion.request(metodo, f"{self.url_base}{ruta}", timeout=self.timeout, **kwargs)
+        if respuesta.status_code == 401:
+            # Token caducado: una sola renovación
+            self.iniciar_sesion()
+            respuesta = self.sesion.request(metodo, f"{self.url_base}{ruta}", timeout=self.timeout, **kwargs)
+        respuesta.raise_for_status()
+        return respuesta.json()
+
+    def enviar_lote(self, operaciones):
+        cuerpo = [{k: v for k, v in op.items() if k != "clave"} for op in operaciones]
+        return self._pedir("POST", "/api/v1/cultivos/lote", json={"operaciones": cuerpo})
+
+    def pedir_cambios(self, desde):
+        return self._pedir("GET", "/api/v1/cultivos/cambios", params={"desde": desde})
+
+    def cerrar(self):
+        self.sesion.close()
+
+
+# --- Sincronizador ---
+
+class Sincronizador:
+    """Une almacén y cliente, y ejecuta los ciclos de sincronización en un hilo."""
+
+    def __init__(self, almacen, cliente, intervalo=INTERVALO_SINCRONIZACION):
+        self.almacen = almacen
+        self.cliente = cliente
+        self.intervalo = intervalo
+        self.cambios_remotos = threading.Event()  # La interfaz lo consulta para refrescarse
+        self.conectado = False
+        self.ultimo_error = None
+        self._despertar = threading.Event()
+        self._detener = threading.Event()
+        self._hilo = None
+
+    def sincronizar(self):
+        """Un ciclo completo: enviar pendientes y traer el delta. Lanza requests.RequestException."""
+        cambio_visible = False
+        # Límite de vueltas: si se sigue editando durante el envío, el resto va en el próximo ciclo
+        for _ in range(10):
+            lote = self.almacen.tomar_lote()
+            if not lote:
+                break
+            cambio_visible |= self.almacen.aplicar_resultados(lote, self.cliente.enviar_lote(lote))
+            self.almacen.guardar()
+        cambio_visible |= self.almacen.aplicar_cambios(self.cliente.pedir_cambios(self.almacen.version))
+        self.almacen.guardar()
+        if cambio_visible:
+            self.cambios_remotos.set()
+
+    def notificar_cambio_local(self):
+        """Llamar tras cada cambio local: guarda el almacén y adelanta el próximo ciclo."""
+        self.almacen.guardar()
+        self._despertar.set()
+
+    def _bucle(self):
+        espera = 0.0
+        while not self._detener.is_set():
+            if self._despertar.wait(espera):
+                # Agrupa una ráfaga de cambios locales en un solo lote
+                self._detener.wait(RETARDO_AGRUPACION)
+            self._despertar.clear()
+            if self._detener.is_set():
+                break
+            try:
+                self.sincronizar()
+                self.conectado, self.ultimo_error = True, None
+                espera = self.intervalo
+            except (requests.RequestException, ValueError, KeyError) as e:
+                # Sin conexión o servidor caído: reintento con espera creciente
+                self.conectado, self.ultimo_error = False, str(e)
+                espera = min(max(espera * 2, 5.0), MAX_ESPERA_SIN_CONEXION)
+
+    def iniciar(self):
+        if self._hilo is None:
+            self._hilo = threading.Thread(target=self._bucle, name="sincronizacion", daemon=True)
+            self._hilo.start()
+
+    def detener(self, timeout=5.0):
+        self._detener.set()
+        self._despertar.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout)
+            self._hilo = None
+        self.almacen.guardar()
+        self.cliente.cerrar()
+
+
+def crear_desde_entorno(ruta=RUTA_ALMACEN):
+    """
+    Crea el sincronizador si están definidas CULTIVOS_API_URL, CULTIVOS_API_USUARIO
+    y CULTIVOS_API_PASSWORD; si no, devuelve None (la app funciona solo en local).
+    """
+    url = os.environ.get("CULTIVOS_API_URL")
+    usuario = os.environ.get("CULTIVOS_API_USUARIO")
+    password = os.environ.get("CULTIVOS_API_PASSWORD")
+    if not (url and usuario and password):
+        return None
+    intervalo = float(os.environ.get("CULTIVOS_API_INTERVALO", INTERVALO_SINCRONIZACION))
+    return Sincronizador(AlmacenLocal(ruta), ClienteAPI(url, usuario, password), intervalo)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 3:
+        os.environ.update(CULTIVOS_API_URL=sys.argv[1], CULTIVOS_API_USUARIO=sys.argv[2],
+                          CULTIVOS_API_PASSWORD=sys.argv[3])
+    sincronizador = crear_desde_entorno()
+    if sincronizador is None:
+        sys.exit("Uso: python sincronizacion.py <url> <usuario> <contraseña>")
+    inicio = time.perf_counter()
+    sincronizador.sincronizar()
+    almacen = sincronizador.almacen
+    print(f"Versión {almacen.version}: {len(almacen.cultivos)} cultivos, "
+          f"{len(almacen.pendientes)} pendientes ({(time.perf_counter() - inicio) * 1000:.0f} ms)")
+    sincronizador.cliente.cerrar()
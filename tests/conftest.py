@@ -0,0 +1,31 @@
+# tests/conftest.py
+# Configuración común: los módulos leen el entorno al importarse, así que el
+# volumen de datos (temporal) y los límites se fijan antes de importarlos.
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+os.environ.setdefault('RUTA_PERSISTENCIA', tempfile.mkdtemp(prefix='cultivos_pruebas_'))
+os.environ.setdefault('INTERVALO_RESPALDO', '0')   # Sin temporizadores de respaldo
+# Las pruebas hacen muchas peticiones seguidas desde el mismo "cliente"
+for politica in ('LIMITE_AUTENTICACION', 'LIMITE_ESCRITURA', 'LIMITE_LECTURA'):
+    os.environ.setdefault(politica, '0')
+
+
+@pytest.fixture
+def almacen(tmp_path, monkeypatch):
+    """Persistencia y raíces de particiones vacías en tmp_path, sin particiones en memoria."""
+    import app_backend
+    monkeypatch.setattr(app_backend, 'RUTA_PERSISTENCIA', str(tmp_path))
+    monkeypatch.setattr(app_backend, 'RUTA_DATOS_USUARIOS', str(tmp_path / 'usuarios.json'))
+    monkeypatch.setattr(app_backend, 'RUTA_DATOS_CULTIVOS', str(tmp_path / 'cultivos.json'))
+    monkeypatch.setattr(app_backend, 'RUTA_DATOS_BORRADOS', str(tmp_path / 'cultivos_borrados.json'))
+    monkeypatch.setattr(app_backend, 'RAICES_PARTICIONES', [str(tmp_path / 'raiz0')])
+    monkeypatch.setattr(app_backend, '_particiones', {})
+    return tmp_path
@@ -0,0 +1,80 @@
+# tests/test_analitica.py
+# Cruce de ventas reales con cultivos (analitica.py) sobre datos pequeños con
+# el resultado calculado a mano.
+
+import pytest
+
+pd = pytest.importorskip('pandas')
+
+import analitica  # noqa: E402
+
+VENTAS = pd.DataFrame({
+    'Mes': ['Ene', 'Ene', 'Feb', 'Feb'],
+    'Producto': ['Tomate', 'tomates', 'Lechuga', 'Tomate'],
+    # Una venta sin importe no cuenta (ni crea una fila para tomate en febrero)
+    'Venta_Total': [1000.0, 200.0, 300.0, None],
+})
+
+CULTIVOS = [
+    # 'Tomate Cherry' no aparece en las ventas: se cruza por su primera palabra
+    {'id': 1, 'nombre': 'Tomate Cherry', 'zona': 'A', 'fecha_cosecha': '2025-01-10',
+     'precio_compra': 100, 'precio_venta': 600},
+    {'id': 2, 'nombre': 'Tomate', 'zona': 'B', 'fecha_cosecha': '2025-01-20',
+     'precio_compra': 50, 'precio_venta': 200},
+    # Sin ventas y sin precio de venta
+    {'id': 3, 'nombre': 'Pepino', 'zona': 'A', 'fecha_cosecha': '2025-03-05',
+     'precio_compra': 20, 'precio_venta': None},
+    # Sin ventas, sin zona y sin precio de compra
+    {'id': 4, 'nombre': 'Calabacín', 'zona': '', 'fecha_cosecha': '2025-02-01', 'precio_venta': 80},
+    # Sin fecha de cosecha válida: no tiene mes y se descarta
+    {'id': 5, 'nombre': 'Berenjena', 'zona': 'A', 'fecha_cosecha': 'pronto', 'precio_venta': 50},
+]
+
+NAN = float('nan')
+# cultivo, zona, mes, venta_estimada, coste, venta_realizada, margen_estimado,
+# margen_realizado, diferencia, cumplimiento
+ESPERADO = [
+    ('calabacin', 'Sin zona', 2, 80.0, 0.0, 0.0, 80.0, 0.0, -80.0, 0.0),
+    ('lechuga', analitica.SIN_CULTIVO, 2, 0.0, 0.0, 300.0, 0.0, 300.0, 300.0, NAN),
+    ('pepino', 'A', 3, 0.0, 20.0, 0.0, -20.0, -20.0, 0.0, NAN),
+    # Los 1200 de enero se reparten entre zonas en proporción a la estimada (600:200)
+    ('tomate', 'A', 1, 600.0, 100.0, 900.0, 500.0, 800.0, 300.0, 1.5),
+    ('tomate', 'B', 1, 200.0, 50.0, 300.0, 150.0, 250.0, 100.0, 1.5),
+]
+
+
+def filas(tabla, columnas):
+    return [tuple(fila) for fila in tabla[columnas].itertuples(index=False)]
+
+
+def test_cruce_con_resultado_conocido():
+    resultado = analitica.AnalisisMargenReal().calcular(VENTAS, CULTIVOS)
+    columnas = ['cultivo', 'zona', 'mes'] + analitica.COLUMNAS_RESULTADO[3:]
+    assert filas(resultado, columnas) == [pytest.approx(fila, nan_ok=True) for fila in ESPERADO]
+
+
+def test_resumen_por_cultivo_y_cache_por_version():
+    analisis = analitica.AnalisisMargenReal()
+    resultado = analisis.calcular(VENTAS, CULTIVOS, version_cultivos=1)
+    assert analisis.calcular(VENTAS, CULTIVOS, version_cultivos=1) is resultado
+
+    resumen = analitica.resumen_por(resultado, ['cultivo'])
+    assert filas(resumen, ['cultivo', 'venta_estimada', 'coste', 'venta_realizada', 'diferencia']) == [
+        ('calabacin', 80.0, 0.0, 0.0, -80.0),
+        ('lechuga', 0.0, 0.0, 300.0, 300.0),
+        ('pepino', 0.0, 20.0, 0.0, 0.0),
+        ('tomate', 800.0, 150.0, 1200.0, 400.0),
+    ]
+
+    # Otra versión de los cultivos: se recalcula (sin el pepino ya no hay fila de marzo)
+    otro = analisis.calcular(VENTAS, CULTIVOS[:2] + CULTIVOS[3:], version_cultivos=2)
+    assert otro is not resultado
+    assert 'pepino' not in set(otro['cultivo'])
+
+
+def test_sin_cultivos_todas_las_ventas_quedan_sin_cultivo():
+    resultado = analitica.AnalisisMargenReal().calcular(VENTAS, [])
+    assert filas(resultado, ['cultivo', 'zona', 'mes', 'venta_realizada']) == [
+        ('lechuga', analitica.SIN_CULTIVO, 2, 300.0),
+        ('tomate', analitica.SIN_CULTIVO, 1, 1200.0),
+    ]
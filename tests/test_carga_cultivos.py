@@ -0,0 +1,62 @@
+# tests/test_carga_cultivos.py
+# Carga masiva de cultivos.json para la app de escritorio (sin tkinter).
+
+import json
+
+import pytest
+
+import carga_cultivos
+
+
+class Cultivo:
+    def __init__(self, nombre, fecha_siembra, fecha_cosecha, notas, zona,
+                 precio_compra, precio_venta, dias_alerta, clave):
+        self.nombre = nombre
+        self.fecha_siembra = fecha_siembra
+        self.precio_venta = precio_venta
+
+
+def escribir(tmp_path, texto):
+    ruta = tmp_path / 'cultivos.json'
+    ruta.write_text(texto, encoding='utf-8')
+    return str(ruta)
+
+
+@pytest.mark.parametrize('texto', [
+    '[12.5, 3]',
+    '[1e5,-0.25 , 1234567890]',
+    '[ {"a": [1, 2.5]}, "texto, con ]", true, null, 3.0e-2 ]',
+    '  [  ]  ',
+    '[{"nombre": "Tomate", "precio_venta": 12.75}]',
+])
+def test_cualquier_tamano_de_bloque_da_lo_mismo_que_json_load(tmp_path, texto):
+    ruta = escribir(tmp_path, texto)
+    for tamano in range(1, len(texto) + 2):
+        assert list(carga_cultivos.leer_registros(ruta, tamano)) == json.loads(texto), tamano
+
+
+@pytest.mark.parametrize('texto', ['[1 2]', '[1,]', '[1, 2', '{"a": 1}', '[12.5.1]'])
+def test_json_mal_formado(tmp_path, texto):
+    ruta = escribir(tmp_path, texto)
+    for tamano in (1, 2, 3, 1 << 20):
+        with pytest.raises(ValueError):
+            list(carga_cultivos.leer_registros(ruta, tamano))
+
+
+def test_archivo_vacio(tmp_path):
+    assert list(carga_cultivos.leer_registros(escribir(tmp_path, ''))) == []
+
+
+def test_registros_invalidos_se_omiten_con_su_error(tmp_path):
+    registros = [
+        {'nombre': 'Tomate', 'fecha_siembra': '2025-03-01', 'fecha_cosecha': '2025-06-01', 'precio_venta': 12.5},
+        {'nombre': 'Lechuga', 'fecha_siembra': '2025-02-30', 'fecha_cosecha': '2025-06-01'},
+        {'nombre': 'Pepino', 'fecha_siembra': '2025-3-7', 'fecha_cosecha': '2025-06-01', 'dias_alerta': 'x'},
+        7,
+        {'nombre': 'Pimiento', 'fecha_siembra': '2025-3-7', 'fecha_cosecha': '2025-06-01'},
+    ]
+    ruta = escribir(tmp_path, json.dumps(registros))
+    cultivos, errores = carga_cultivos.cargar_archivo(ruta, Cultivo)
+    assert [c.nombre for c in cultivos] == ['Tomate', 'Pimiento']
+    assert cultivos[0].precio_venta == 12.5 and str(cultivos[1].fecha_siembra) == '2025-03-07'
+    assert [(n, nombre) for n, nombre, _ in errores] == [(2, 'Lechuga'), (3, 'Pepino'), (4, '')]
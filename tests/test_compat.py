@@ -0,0 +1,103 @@
+# tests/test_compat.py
+# El modo síncrono (app_backend, Flask) y el asíncrono (app_asgi, Quart) deben
+# cumplir el mismo contrato: la misma secuencia de registro, login y CRUD de
+# cultivos tiene que dar los mismos códigos de estado y los mismos cuerpos.
+
+import asyncio
+import json
+
+import pytest
+
+import app_backend
+import app_asgi
+
+CULTIVO = {'nombre': 'Tomate Cherry', 'zona': 'Invernadero 1', 'notas': 'Riego por goteo',
+           'fecha_siembra': '2025-03-01', 'fecha_cosecha': '2025-06-15',
+           'precio_compra': 120.0, 'precio_venta': 480.0, 'dias_alerta': 3}
+
+
+def secuencia(usuario):
+    """Peticiones (método, ruta, cuerpo JSON) de una sesión completa de `usuario`."""
+    credenciales = {'username': usuario, 'password': 'clave-1234'}
+    return [
+        ('POST', '/auth/register', credenciales),
+        ('POST', '/auth/register', credenciales),
+        ('GET', '/api/v1/cultivos', None),
+        ('POST', '/auth/login', {'username': usuario, 'password': 'otra'}),
+        ('POST', '/auth/login', credenciales),
+        ('GET', '/api/v1/cultivos', None),
+        ('POST', '/api/v1/cultivos', CULTIVO),
+        ('POST', '/api/v1/cultivos', {**CULTIVO, 'nombre': 'Lechuga', 'precio_venta': 200.0}),
+        ('PUT', '/api/v1/cultivos/1', {'notas': 'Poda semanal'}),
+        ('PUT', '/api/v1/cultivos/99', {'notas': 'No existe'}),
+        ('GET', '/api/v1/cultivos/top?k=5', None),
+        ('GET', '/api/v1/cultivos/top?k=0', None),
+        ('GET', '/api/v1/cultivos/search?q=tomat', None),
+        ('GET', '/api/v1/ocupacion?fecha=2025-04-01', None),
+        ('GET', '/api/v1/ocupacion?fecha=ayer', None),
+        ('GET', '/api/v1/cultivos/cambios?desde=0', None),
+        ('POST', '/api/v1/cultivos/lote', {'operaciones': [
+            {'op': 'actualizar', 'id': 2, 'version_base': 2, 'datos': {'zona': 'Exterior'}}]}),
+        ('DELETE', '/api/v1/cultivos/1', None),
+        ('GET', '/api/v1/cultivos', None),
+        ('GET', '/api/v1/cultivos/exportar', None),
+        ('POST', '/auth/logout', None),
+        ('GET', '/api/v1/cultivos', None),
+    ]
+
+
+def normalizar(estado, cuerpo):
+    """(estado, cuerpo) comparable: el JSON se decodifica para no depender del orden de claves."""
+    try:
+        return estado, json.loads(cuerpo)
+    except ValueError:
+        return estado, cuerpo
+
+
+def ejecutar_sincrono(usuario):
+    cliente = app_backend.app.test_client()
+    resultados = []
+    for metodo, ruta, cuerpo in secuencia(usuario):
+        respuesta = cliente.open(ruta, method=metodo, json=cuerpo)
+        resultados.append(normalizar(respuesta.status_code, respuesta.get_data()))
+    return resultados
+
+
+def ejecutar_asincrono(usuario):
+    async def ejecutar():
+        cliente = app_asgi.app.test_client()
+        resultados = []
+        for metodo, ruta, cuerpo in secuencia(usuario):
+            respuesta = await cliente.open(ruta, method=metodo, json=cuerpo)
+            resultados.append(normalizar(respuesta.status_code, await respuesta.get_data()))
+        return resultados
+    return asyncio.run(ejecutar())
+
+
+def test_mismo_contrato_en_ambos_modos():
+    # Cada modo usa su propio usuario: las particiones son independientes y
+    # los IDs y versiones empiezan igual en las dos
+    sincrono = ejecutar_sincrono('compat_wsgi')
+    asincrono = ejecutar_asincrono('compat_asgi')
+    for (metodo, ruta, _), esperado, obtenido in zip(secuencia(''), sincrono, asincrono):
+        assert obtenido == esperado, f'{metodo} {ruta}'
+
+
+def test_secuencia_cubre_los_errores_del_contrato():
+    estados = [estado for estado, _ in ejecutar_sincrono('compat_estados')]
+    assert estados[:6] == [201, 400, 401, 401, 200, 200]
+    assert estados[9] == 404 and estados[11] == 400 and estados[14] == 400
+    assert estados[-1] == 401
+
+
+@pytest.mark.parametrize('ruta', ['/', '/scripts.js', '/no-existe.txt', '/salud/listo'])
+def test_rutas_publicas(ruta):
+    sincrono = app_backend.app.test_client().get(ruta)
+
+    async def pedir():
+        respuesta = await app_asgi.app.test_client().get(ruta)
+        return respuesta.status_code, await respuesta.get_data()
+    estado, cuerpo = asyncio.run(pedir())
+    assert estado == sincrono.status_code
+    if ruta != '/salud/listo':  # Incluye la duración de la precarga de cada proceso
+        assert cuerpo == sincrono.get_data()
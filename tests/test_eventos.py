@@ -0,0 +1,44 @@
+# tests/test_eventos.py
+# Reconexión de clientes SSE al bus de eventos: IDs con época y buffer de repetición.
+
+from eventos import BusEventos
+
+
+def publicar(bus, n):
+    for i in range(n):
+        bus.publicar('cultivo_creado', {'id': i})
+
+
+def test_reconexion_recibe_solo_lo_perdido():
+    bus = BusEventos()
+    publicar(bus, 10)
+    ultimo = bus.leer_id_sse(bus.id_sse(7))
+    assert [e['id'] for e in bus.eventos_desde(ultimo)] == [8, 9, 10]
+    assert bus.eventos_desde(bus.ultimo_id) == []
+
+
+def test_id_de_otro_arranque_obliga_a_recargar():
+    # El cliente vio 50 eventos antes de que la máquina se parase; el bus
+    # nuevo empieza en 0 y no debe esperar en silencio a que llegue al 51
+    anterior, nuevo = BusEventos(), BusEventos()
+    publicar(anterior, 50)
+    publicar(nuevo, 5)
+    ultimo = nuevo.leer_id_sse(anterior.id_sse(anterior.ultimo_id))
+    assert nuevo.eventos_desde(ultimo) is None
+    publicar(nuevo, 60)
+    assert nuevo.eventos_desde(ultimo) is None
+
+
+def test_ids_invalidos_o_futuros_obligan_a_recargar():
+    bus = BusEventos()
+    publicar(bus, 3)
+    for valor in ('5', 'abc', f'{bus.epoca}-x', ''):
+        assert bus.eventos_desde(bus.leer_id_sse(valor)) is None
+    assert bus.eventos_desde(50) is None
+
+
+def test_eventos_fuera_del_buffer():
+    bus = BusEventos(capacidad_replay=5)
+    publicar(bus, 20)
+    assert bus.eventos_desde(10) is None
+    assert [e['id'] for e in bus.eventos_desde(16)] == [17, 18, 19, 20]
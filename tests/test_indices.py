@@ -0,0 +1,112 @@
+# tests/test_indices.py
+# Índices en memoria: texto completo (búsqueda del dashboard) y ranking por margen.
+
+import app_backend
+from indices import MAX_TERMINOS_PREFIJO, IndiceTexto, RankingMargen, calcular_margen
+
+
+def indice_con(cultivos):
+    indice = IndiceTexto()
+    indice.sincronizar(cultivos)
+    return indice
+
+
+def test_prefijo_no_se_corta_con_muchos_terminos():
+    cultivos = [{'id': i, 'nombre': f'tomate{i:03d}'} for i in range(80)]
+    cultivos.append({'id': 100, 'nombre': 'Tomillo'})
+    resultado = indice_con(cultivos).buscar('tom', 100)
+    assert len(resultado) == 81
+    assert 100 in {c['id'] for c in resultado}
+
+
+def test_prefijo_corto_o_muy_amplio_se_acota():
+    cultivos = [{'id': i, 'nombre': f'lote{i:04d}'} for i in range(1, 400)]
+    cultivos += [{'id': 1000, 'nombre': 'L'}, {'id': 1001, 'nombre': 'Lote'}]
+    indice = indice_con(cultivos)
+    # Una sola letra solo coincide exacta
+    assert [c['id'] for c in indice.buscar('l', 1000)] == [1000]
+    # 'lote' abarca el propio término y los siguientes hasta MAX_TERMINOS_PREFIJO
+    resultado = indice.buscar('lote', 1000)
+    assert len(resultado) == MAX_TERMINOS_PREFIJO
+    assert [c['id'] for c in resultado[:3]] == [1001, 1, 2]
+
+
+def test_solo_el_ultimo_termino_es_prefijo():
+    indice = indice_con([
+        {'id': 1, 'nombre': 'Tomate Cherry'},
+        {'id': 2, 'nombre': 'Tomates Pera', 'zona': 'Invernadero'},
+        {'id': 3, 'nombre': 'Tomate Pera'},
+    ])
+    assert [c['id'] for c in indice.buscar('tomate pe')] == [3]
+    assert {c['id'] for c in indice.buscar('tomate')} == {1, 2, 3}
+    assert indice.buscar('tom cherry') == []
+
+
+def test_coincidencia_exacta_puntua_mas_que_prefijo():
+    indice = indice_con([{'id': 1, 'nombre': 'Lechugas'}, {'id': 2, 'nombre': 'Lechuga'}])
+    assert [c['id'] for c in indice.buscar('lechuga')] == [2, 1]
+    assert [c['id'] for c in indice.buscar('LÉCHUGA', 1)] == [2]
+
+
+def test_cambios_se_reflejan_en_la_busqueda():
+    indice = indice_con([{'id': 1, 'nombre': 'Pimiento', 'notas': 'riego por goteo'}])
+    assert [c['id'] for c in indice.buscar('goteo')] == [1]
+    indice.aplicar_evento({'tipo': 'cultivo_actualizado', 'datos': {'id': 1, 'nombre': 'Pimiento', 'notas': 'aspersión'}})
+    assert indice.buscar('goteo') == []
+    indice.aplicar_evento({'tipo': 'cultivo_eliminado', 'datos': {'id': 1}})
+    assert indice.buscar('pimiento') == []
+
+
+# --- Ranking por margen ---
+
+def test_margen_no_finito_cuenta_como_cero():
+    for venta, compra in (('nan', 1), (float('nan'), 0), ('inf', 1), (float('inf'), float('inf')), (1e308, -1e308)):
+        assert calcular_margen({'precio_venta': venta, 'precio_compra': compra}) == 0.0
+    assert calcular_margen({'precio_venta': '12.5', 'precio_compra': 2}) == 10.5
+
+
+def test_ranking_con_precios_no_finitos_admite_cambios_y_bajas():
+    ranking = RankingMargen().sincronizar([
+        {'id': 1, 'precio_venta': 10, 'precio_compra': 1, 'zona': 'A'},
+        {'id': 2, 'precio_venta': float('nan'), 'precio_compra': 1, 'zona': 'A'},
+        {'id': 3, 'precio_venta': 5, 'precio_compra': 1, 'zona': 'A'},
+        {'id': 4, 'precio_venta': 'inf', 'precio_compra': 0, 'zona': 'A'},
+    ])
+    assert [c['id'] for c in ranking.top(10)] == [1, 3]
+
+    ranking.aplicar_evento({'tipo': 'cultivo_eliminado', 'datos': {'id': 2}})
+    ranking.aplicar_evento({'tipo': 'cultivo_actualizado',
+                            'datos': {'id': 4, 'precio_venta': 7, 'precio_compra': 0, 'zona': 'A'}})
+    ranking.aplicar_evento({'tipo': 'cultivo_actualizado',
+                            'datos': {'id': 1, 'precio_venta': float('nan'), 'precio_compra': 0, 'zona': 'A'}})
+    assert [(c['id'], c['margen']) for c in ranking.top(10)] == [(4, 7.0), (3, 4.0)]
+    assert [c['id'] for c in ranking.top(10, 'A')] == [4, 3]
+    assert len(ranking._global) == 3
+
+
+def test_ranking_por_api_con_nan_en_el_json():
+    cliente = app_backend.app.test_client()
+    cliente.post('/auth/register', json={'username': 'ranking_nan', 'password': 'x'})
+    cliente.post('/auth/login', json={'username': 'ranking_nan', 'password': 'x'})
+    for cuerpo in ('{"nombre": "a", "precio_venta": 9}', '{"nombre": "b", "precio_venta": NaN}',
+                   '{"nombre": "c", "precio_venta": 4}'):
+        assert cliente.post('/api/v1/cultivos', data=cuerpo, content_type='application/json').status_code == 201
+    assert cliente.get('/api/v1/cultivos/top?k=5').status_code == 200
+    assert cliente.delete('/api/v1/cultivos/2').status_code == 200
+    respuesta = cliente.get('/api/v1/cultivos/top?k=5')
+    assert respuesta.status_code == 200
+    assert [c['nombre'] for c in respuesta.get_json()] == ['a', 'c']
+
+
+def test_la_precarga_construye_los_indices():
+    cliente = app_backend.app.test_client()
+    cliente.post('/auth/register', json={'username': 'precarga_indices', 'password': 'x'})
+    cliente.post('/auth/login', json={'username': 'precarga_indices', 'password': 'x'})
+    cliente.post('/api/v1/cultivos', json={'nombre': 'Tomate', 'precio_venta': 3})
+    # Como un worker recién arrancado: partición sin índices todavía
+    del app_backend._particiones['precarga_indices']
+    app_backend.precargar_datos()
+    particion = app_backend.datos_de('precarga_indices')
+    cultivos = particion.cultivos()
+    assert all(indice._origen is cultivos for indice in (particion.ranking, particion.ocupacion, particion.texto))
+    assert [c['nombre'] for c in cliente.get('/api/v1/cultivos/search?q=tom').get_json()] == ['Tomate']
@@ -0,0 +1,68 @@
+# tests/test_informes.py
+# Informes por lotes (informes.py): nombres de archivo únicos por corte y
+# omisión de los cortes sin cambios al volver a ejecutar.
+
+import json
+import os
+
+import pytest
+
+pytest.importorskip('pandas')
+pytest.importorskip('matplotlib')
+
+import informes  # noqa: E402
+
+CABECERA = 'Mes,Producto,Venta_Total,Region\n'
+FILAS = [
+    'Ene,Tomate,100,Norte',
+    'Feb,Tomate,150,Norte',
+    # Tres regiones distintas con el mismo texto de archivo ('norte')
+    'Ene,Lechuga,80,norte',
+    'Feb,Lechuga,90,Nörte',
+    'Mar,Tomate,120,Sur',
+]
+
+
+def escribir_csv(ruta, filas):
+    with open(ruta, 'w', encoding='utf-8') as f:
+        f.write(CABECERA + '\n'.join(filas) + '\n')
+
+
+def test_valores_con_el_mismo_texto_no_comparten_archivo():
+    ids = {informes.id_corte('region', valor) for valor in ('Norte', 'norte', 'Nörte', 'Norte ')}
+    assert len(ids) == 4
+    assert all(i.startswith('region-norte-') for i in ids)
+    # Estable entre ejecuciones (y procesos): del hash depende el manifiesto
+    assert informes.id_corte('region', 'Sur') == informes.id_corte('region', 'Sur')
+    assert informes.id_corte('region', 'Sur') != informes.id_corte('producto', 'Sur')
+
+
+def test_volver_a_ejecutar_solo_dibuja_lo_que_cambio(tmp_path):
+    ventas = tmp_path / 'ventas.csv'
+    salida = tmp_path / 'informes'
+    escribir_csv(ventas, FILAS)
+
+    def generar():
+        return informes.generar_informes(str(ventas), str(salida), formatos=['png', 'html'],
+                                         dimensiones=['region'], procesos=1)
+
+    # global + 4 regiones, cada una con sus propios archivos
+    assert generar() == {'generados': 5, 'omitidos': 0, 'errores': {}}
+    with open(salida / 'manifiesto.json', encoding='utf-8') as f:
+        ids = sorted(json.load(f))
+    assert len(ids) == 5
+    assert all((salida / f'{i}.png').exists() and (salida / f'{i}.html').exists() for i in ids)
+    assert sum(i.startswith('region-norte-') for i in ids) == 3
+
+    # Sin cambios: nada que dibujar
+    antes = {i: os.stat(salida / f'{i}.png').st_mtime_ns for i in ids}
+    assert generar() == {'generados': 0, 'omitidos': 5, 'errores': {}}
+    assert {i: os.stat(salida / f'{i}.png').st_mtime_ns for i in ids} == antes
+
+    # Cambia una venta del Sur: se redibujan el global y el Sur
+    escribir_csv(ventas, FILAS[:-1] + ['Mar,Tomate,130,Sur'])
+    assert generar() == {'generados': 2, 'omitidos': 3, 'errores': {}}
+
+    # Falta un archivo: ese corte se regenera aunque su huella no cambie
+    os.remove(salida / f'{informes.id_corte("region", "norte")}.png')
+    assert generar() == {'generados': 1, 'omitidos': 4, 'errores': {}}
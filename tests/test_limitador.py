@@ -0,0 +1,51 @@
+# tests/test_limitador.py
+# Control de admisión: cubo de tokens y límite de concurrencia con cola.
+
+import asyncio
+
+from limitador import CuboTokens, LimiteConcurrencia
+
+
+def test_cubo_admite_rafaga_y_luego_limita():
+    cubo = CuboTokens(tasa=1.0, capacidad=3)
+    assert [cubo.consumir('ip') for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert cubo.consumir('ip') > 0
+    assert cubo.consumir('otra-ip') == 0.0
+
+
+def test_espera_cancelada_libera_su_hueco_en_la_cola():
+    limite = LimiteConcurrencia(max_activas=1, max_cola=4, espera_maxima=10)
+
+    async def escenario():
+        assert await limite.entrar_async() is True
+        # Cuatro peticiones en cola cuyos clientes cierran la conexión
+        esperas = [asyncio.create_task(limite.entrar_async()) for _ in range(4)]
+        await asyncio.sleep(0.05)
+        assert limite.en_cola == 4
+        for tarea in esperas:
+            tarea.cancel()
+        await asyncio.gather(*esperas, return_exceptions=True)
+        assert limite.en_cola == 0
+
+        limite.salir(0.01)
+        assert limite.activas == 0
+        assert await limite.entrar_async() is True
+
+    asyncio.run(escenario())
+
+
+def test_cancelar_una_espera_no_bloquea_a_las_siguientes():
+    limite = LimiteConcurrencia(max_activas=1, max_cola=4, espera_maxima=10)
+
+    async def escenario():
+        await limite.entrar_async()
+        cancelada = asyncio.create_task(limite.entrar_async())
+        siguiente = asyncio.create_task(limite.entrar_async())
+        await asyncio.sleep(0.05)
+        cancelada.cancel()
+        await asyncio.sleep(0.01)
+        limite.salir(0.01)
+        assert await asyncio.wait_for(siguiente, 1) is True
+        assert (limite.activas, limite.en_cola) == (1, 0)
+
+    asyncio.run(escenario())
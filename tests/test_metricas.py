@@ -0,0 +1,96 @@
+# tests/test_metricas.py
+# Perfilador de muestreo con gunicorn --preload: se inicia en el proceso
+# maestro y tiene que seguir muestreando en los workers creados por fork.
+
+import os
+import threading
+import time
+
+import pytest
+
+from metricas import PerfiladorMuestreo
+
+
+def peticion_lenta(perfilador, segundos=0.3):
+    perfilador.comenzar_peticion()
+    inicio = time.perf_counter()
+    while time.perf_counter() - inicio < segundos:
+        pass
+    perfilador.terminar_peticion(time.perf_counter() - inicio, 'GET /lenta')
+
+
+# El fork con hilos es justo lo que hace gunicorn --preload con el perfilador activo
+@pytest.mark.filterwarnings('ignore:This process .* is multi-threaded:DeprecationWarning')
+def test_perfilador_sigue_activo_tras_fork():
+    perfilador = PerfiladorMuestreo(intervalo=0.005, umbral=0.1)
+    perfilador.iniciar()
+    lectura, escritura = os.pipe()
+    pid = os.fork()
+    if pid == 0:  # Worker
+        try:
+            hilos = [h.name for h in threading.enumerate()]
+            peticion_lenta(perfilador)
+            ok = 'perfilador-muestreo' in hilos and 'GET /lenta;' in perfilador.volcar()
+            os.write(escritura, b'1' if ok else b'0')
+        finally:
+            os._exit(0)
+    os.close(escritura)
+    resultado = os.read(lectura, 1)
+    os.waitpid(pid, 0)
+    assert resultado == b'1'
+
+
+def test_peticiones_rapidas_no_se_acumulan():
+    perfilador = PerfiladorMuestreo(intervalo=0.005, umbral=10)
+    perfilador.iniciar()
+    peticion_lenta(perfilador, 0.05)
+    assert perfilador.volcar() == ''
+
+
+# --- /metrics ---
+
+def leer_metricas(cliente):
+    """{línea sin valor: valor} de la salida de /metrics (sin HELP/TYPE)."""
+    respuesta = cliente.get('/metrics')
+    assert respuesta.status_code == 200
+    assert respuesta.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+    valores = {}
+    for linea in respuesta.get_data(as_text=True).splitlines():
+        if linea and not linea.startswith('#'):
+            nombre, _, valor = linea.rpartition(' ')
+            valores[nombre] = float(valor)
+    return valores
+
+
+def test_metrics_cuenta_peticiones_y_latencias():
+    import app_backend
+    cliente = app_backend.app.test_client()
+    ruta = 'metodo="GET",ruta="/salud/listo"'
+    contador = f'invernadero_peticiones_total{{estado="200",{ruta}}}'
+    conteo = f'invernadero_peticion_duracion_segundos_count{{{ruta}}}'
+    antes = leer_metricas(cliente)
+    for _ in range(3):
+        assert cliente.get('/salud/listo').status_code == 200
+    cliente.get('/no-existe.txt')
+    despues = leer_metricas(cliente)
+
+    assert despues[contador] - antes.get(contador, 0) == 3
+    assert despues[conteo] - antes.get(conteo, 0) == 3
+    assert despues['invernadero_peticiones_total{estado="404",metodo="GET",ruta="/<path:path>"}'] >= 1
+    # Etiquetas en orden alfabético; buckets acumulados, crecientes y con +Inf igual al total
+    buckets = [v for k, v in despues.items()
+               if k.startswith('invernadero_peticion_duracion_segundos_bucket{' + ruta + ',')]
+    assert len(buckets) == 13 and buckets == sorted(buckets)
+    assert despues[f'invernadero_peticion_duracion_segundos_bucket{{{ruta},le="+Inf"}}'] == despues[conteo]
+    assert despues[f'invernadero_peticion_duracion_segundos_sum{{{ruta}}}'] > 0
+
+
+def test_metrics_incluye_el_almacenamiento_tras_una_escritura():
+    import app_backend
+    cliente = app_backend.app.test_client()
+    cliente.post('/auth/register', json={'username': 'metricas', 'password': 'x'})
+    valores = leer_metricas(cliente)
+    escrituras = [k for k in valores if k.startswith('invernadero_almacen_operaciones_total{')
+                  and 'operacion="escritura"' in k and 'archivo="usuarios.json"' in k]
+    assert escrituras and valores[escrituras[0]] >= 1
+    assert any(k.startswith('invernadero_almacen_duracion_segundos_count{') for k in valores)
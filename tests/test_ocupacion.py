@@ -0,0 +1,126 @@
+# tests/test_ocupacion.py
+# Índice de ocupación de invernaderos (árbol de intervalos + histograma
+# diario con NumPy), comparado con un recorrido completo de los cultivos.
+
+import random
+from datetime import date
+
+import pytest
+
+import app_backend
+from indices import ArbolIntervalos, IndiceOcupacion
+
+ZONAS = ['A', 'B', 'Invernadero 1', '']
+BASE = date(2025, 1, 1).toordinal()
+
+
+def fecha(dia):
+    return date.fromordinal(BASE + dia).isoformat()
+
+
+def cultivo_aleatorio(aleatorio, cultivo_id):
+    inicio = aleatorio.randint(0, 120)
+    # Algunos de un solo día, otros largos y alguno con la cosecha antes de la siembra
+    fin = inicio + aleatorio.choice([0, 1, 5, 30, 90, -3])
+    return {'id': cultivo_id, 'nombre': f'c{cultivo_id}', 'zona': aleatorio.choice(ZONAS),
+            'fecha_siembra': fecha(inicio), 'fecha_cosecha': fecha(fin)}
+
+
+def ocupantes_esperados(cultivos, zona, desde, hasta):
+    ids = []
+    for c in cultivos.values():
+        inicio = date.fromisoformat(c['fecha_siembra']).toordinal()
+        fin = date.fromisoformat(c['fecha_cosecha']).toordinal()
+        if (c['zona'] or '') == zona and inicio <= fin and inicio <= hasta and fin >= desde:
+            ids.append((inicio, fin, c['id']))
+    return [cultivo_id for *_, cultivo_id in sorted(ids)]
+
+
+def comprobar(indice, cultivos, aleatorio):
+    for zona in ZONAS:
+        for _ in range(5):
+            desde = BASE + aleatorio.randint(-10, 220)
+            hasta = desde + aleatorio.randint(0, 60)
+            assert [c['id'] for c in indice.ocupantes(zona, desde, hasta)] == \
+                ocupantes_esperados(cultivos, zona, desde, hasta)
+            diaria = indice.ocupacion_diaria(zona, desde, hasta).tolist()
+            assert diaria == [len(ocupantes_esperados(cultivos, zona, d, d)) for d in range(desde, hasta + 1)]
+    assert indice.zonas() == sorted({c['zona'] for c in cultivos.values()
+                                     if ocupantes_esperados(cultivos, c['zona'], BASE - 100, BASE + 400)})
+
+
+@pytest.mark.parametrize('semilla', range(5))
+def test_indice_coincide_con_recorrido_completo(semilla):
+    aleatorio = random.Random(semilla)
+    cultivos = {i: cultivo_aleatorio(aleatorio, i) for i in range(1, 150)}
+    indice = IndiceOcupacion().sincronizar(list(cultivos.values()))
+    comprobar(indice, cultivos, aleatorio)
+
+    siguiente_id = 150
+    for _ in range(300):
+        operacion = aleatorio.random()
+        if operacion < 0.3 or not cultivos:
+            cultivo = cultivo_aleatorio(aleatorio, siguiente_id)
+            siguiente_id += 1
+            cultivos[cultivo['id']] = cultivo
+            indice.aplicar_evento({'tipo': 'cultivo_creado', 'datos': cultivo})
+        elif operacion < 0.7:
+            # Cambio de fechas y/o de zona de un cultivo existente
+            cultivo = dict(cultivo_aleatorio(aleatorio, aleatorio.choice(list(cultivos))))
+            if aleatorio.random() < 0.5:
+                cultivo['zona'] = cultivos[cultivo['id']]['zona']
+            cultivos[cultivo['id']] = cultivo
+            indice.aplicar_evento({'tipo': 'cultivo_actualizado', 'datos': cultivo})
+        else:
+            cultivo_id = aleatorio.choice(list(cultivos))
+            del cultivos[cultivo_id]
+            indice.aplicar_evento({'tipo': 'cultivo_eliminado', 'datos': {'id': cultivo_id}})
+    comprobar(indice, cultivos, aleatorio)
+
+
+def test_eventos_repetidos_y_bajas_inexistentes():
+    cultivo = {'id': 1, 'zona': 'A', 'fecha_siembra': fecha(0), 'fecha_cosecha': fecha(10)}
+    indice = IndiceOcupacion().sincronizar([cultivo])
+    indice.aplicar_evento({'tipo': 'cultivo_creado', 'datos': cultivo})
+    indice.aplicar_evento({'tipo': 'cultivo_eliminado', 'datos': {'id': 99}})
+    assert indice.ocupacion_diaria('A', BASE, BASE + 11).tolist() == [1] * 11 + [0]
+    indice.aplicar_evento({'tipo': 'cultivo_actualizado', 'datos': dict(cultivo, fecha_cosecha='mañana')})
+    assert indice.ocupantes('A', BASE) == [] and indice.zonas() == []
+
+
+def test_arbol_intervalos_mismo_inicio_y_extremos():
+    arbol = ArbolIntervalos()
+    for cultivo_id, (inicio, fin) in enumerate([(5, 5), (5, 9), (5, 20), (1, 4), (10, 12)]):
+        arbol.insertar(inicio, fin, cultivo_id)
+    assert sorted(i for *_, i in arbol.solapados(5, 5)) == [0, 1, 2]
+    assert sorted(i for *_, i in arbol.solapados(4, 4)) == [3]
+    assert sorted(i for *_, i in arbol.solapados(13, 30)) == [2]
+    arbol.eliminar(5, 2)
+    arbol.eliminar(5, 2)  # Ya no está: no cambia nada
+    assert arbol.total == 4
+    assert arbol.solapados(13, 30) == []
+    assert sorted(i for *_, i in arbol.solapados(0, 100)) == [0, 1, 3, 4]
+
+
+def test_linea_tiempo_por_api_sigue_cambios_y_bajas():
+    cliente = app_backend.app.test_client()
+    cliente.post('/auth/register', json={'username': 'ocupacion_api', 'password': 'x'})
+    cliente.post('/auth/login', json={'username': 'ocupacion_api', 'password': 'x'})
+    for nombre, siembra, cosecha in [('a', 0, 3), ('b', 2, 6)]:
+        respuesta = cliente.post('/api/v1/cultivos', json={
+            'nombre': nombre, 'zona': 'Z', 'fecha_siembra': fecha(siembra), 'fecha_cosecha': fecha(cosecha)})
+        assert respuesta.status_code == 201
+    primero, segundo = (c['id'] for c in cliente.get('/api/v1/cultivos').get_json())
+    url = f'/api/v1/ocupacion/linea_tiempo?zona=Z&desde={fecha(0)}&hasta={fecha(7)}&capacidad=1'
+
+    zona = cliente.get(url).get_json()['zonas']['Z']
+    assert zona['ocupacion_diaria'] == [1, 1, 2, 2, 1, 1, 1, 0]
+    assert zona['libre_diario'] == [0, 0, 0, 0, 0, 0, 0, 1]
+
+    # Mover las fechas del primero fuera del rango y dar de baja el segundo
+    cliente.put(f'/api/v1/cultivos/{primero}', json={'fecha_siembra': fecha(5), 'fecha_cosecha': fecha(9)})
+    assert cliente.get(url).get_json()['zonas']['Z']['ocupacion_diaria'] == [0, 0, 1, 1, 1, 2, 2, 1]
+    cliente.delete(f'/api/v1/cultivos/{segundo}')
+    zona = cliente.get(url).get_json()['zonas']['Z']
+    assert zona['ocupacion_diaria'] == [0, 0, 0, 0, 0, 1, 1, 1]
+    assert [c['id'] for c in zona['cultivos']] == [primero]
@@ -0,0 +1,127 @@
+# tests/test_particiones.py
+# Particiones por usuario: reparto estable entre raíces, migración del
+# cultivos.json compartido anterior y aislamiento entre usuarios.
+
+import json
+import os
+from itertools import count
+
+import app_backend
+
+
+def usuario_en_particion_impar(excluir=()):
+    """Un usuario cuya partición cambia de raíz por módulo al pasar de 1 a 2 raíces."""
+    for n in count():
+        usuario = f'usuario{n}'
+        if app_backend.numero_particion(usuario) % 2 == 1 and usuario not in excluir:
+            return usuario
+
+
+def escribir(ruta, datos):
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump(datos, f)
+
+
+# --- Raíces ---
+
+def test_anadir_una_raiz_no_mueve_las_particiones_existentes(almacen, monkeypatch):
+    antiguo = usuario_en_particion_impar()
+    app_backend.insertar_cultivo(antiguo, {'nombre': 'Tomate'})
+    directorio = app_backend.directorio_usuario(antiguo)
+    assert directorio.startswith(str(almacen / 'raiz0'))
+
+    monkeypatch.setattr(app_backend, 'RAICES_PARTICIONES', [str(almacen / 'raiz0'), str(almacen / 'raiz1')])
+    monkeypatch.setattr(app_backend, '_particiones', {})
+    assert app_backend.directorio_usuario(antiguo) == directorio
+    assert [c['nombre'] for c in app_backend.listar_cultivos(antiguo)] == ['Tomate']
+
+    # Otro usuario de la misma partición va a la raíz donde ya está la partición
+    vecino = next(f'vecino{n}' for n in count()
+                  if app_backend.numero_particion(f'vecino{n}') == app_backend.numero_particion(antiguo))
+    assert os.path.dirname(app_backend.directorio_usuario(vecino)) == os.path.dirname(directorio)
+
+    # Una partición nueva sigue el reparto por módulo
+    nuevo = next(f'nuevo{n}' for n in count()
+                 if app_backend.numero_particion(f'nuevo{n}') % 2 == 1
+                 and app_backend.numero_particion(f'nuevo{n}') != app_backend.numero_particion(antiguo))
+    assert app_backend.directorio_usuario(nuevo).startswith(str(almacen / 'raiz1'))
+    assert sorted(app_backend.usuarios_con_particion()) == [antiguo]
+
+
+def test_el_nombre_de_usuario_no_sale_de_la_raiz(almacen):
+    for usuario in ('../fuera', '..', 'a/b', '%2e%2e'):
+        directorio = os.path.realpath(app_backend.directorio_usuario(usuario))
+        assert directorio.startswith(os.path.realpath(almacen / 'raiz0') + os.sep)
+        app_backend.insertar_cultivo(usuario, {'nombre': usuario})
+    assert sorted(app_backend.usuarios_con_particion()) == sorted(['../fuera', '..', 'a/b', '%2e%2e'])
+    assert not (almacen / 'fuera').exists()
+
+
+# --- Migración del Archivo Compartido ---
+
+LEGADO = [{'id': 1, 'version': 2, 'nombre': 'Tomate'}, {'id': 4, 'version': 5, 'nombre': 'Pepino'}]
+LAPIDAS = {'minima': 1, 'max_id': 4, 'borrados': [{'id': 3, 'version': 4}]}
+
+
+def test_migracion_copia_a_todos_y_conserva_versiones(almacen):
+    escribir(app_backend.RUTA_DATOS_USUARIOS, [{'username': 'ana', 'password': 'x'},
+                                               {'username': 'luis', 'password': 'x'}])
+    escribir(app_backend.RUTA_DATOS_CULTIVOS, LEGADO)
+    escribir(app_backend.RUTA_DATOS_BORRADOS, LAPIDAS)
+    # luis ya tenía partición: no se sobrescribe
+    app_backend.insertar_cultivo('luis', {'nombre': 'Lechuga'})
+
+    app_backend.migrar_cultivos_compartidos()
+
+    assert app_backend.listar_cultivos('ana') == LEGADO
+    assert app_backend.cargar_borrados(app_backend.datos_de('ana')) == LAPIDAS
+    assert [c['nombre'] for c in app_backend.listar_cultivos('luis')] == ['Lechuga']
+    assert not os.path.exists(app_backend.RUTA_DATOS_CULTIVOS)
+    assert (almacen / 'cultivos.json.migrado').exists() and (almacen / 'cultivos_borrados.json.migrado').exists()
+
+    # Los IDs siguen tras los heredados (y tras los borrados): no se reutiliza el 3 ni el 4
+    assert app_backend.insertar_cultivo('ana', {'nombre': 'Ajo'})['id'] == 5
+    # Una segunda llamada (otro worker, otro arranque) no hace nada
+    app_backend.migrar_cultivos_compartidos()
+    assert len(app_backend.listar_cultivos('ana')) == 3
+
+
+def test_migracion_a_un_solo_usuario(almacen, monkeypatch):
+    monkeypatch.setattr(app_backend, 'CULTIVOS_HEREDADOS', 'ana')
+    escribir(app_backend.RUTA_DATOS_USUARIOS, [{'username': 'ana', 'password': 'x'},
+                                               {'username': 'luis', 'password': 'x'}])
+    escribir(app_backend.RUTA_DATOS_CULTIVOS, LEGADO)
+
+    app_backend.migrar_cultivos_compartidos()
+
+    assert app_backend.listar_cultivos('ana') == LEGADO
+    assert app_backend.listar_cultivos('luis') == []
+    assert list(app_backend.usuarios_con_particion()) == ['ana']
+
+
+# --- Aislamiento entre Usuarios ---
+
+def test_cada_usuario_solo_ve_y_modifica_sus_cultivos(almacen):
+    clientes = {}
+    for usuario in ('ana', 'luis'):
+        clientes[usuario] = app_backend.app.test_client()
+        clientes[usuario].set_cookie('token', app_backend.generar_token(usuario))
+    ana, luis = clientes['ana'], clientes['luis']
+
+    id_ana = ana.post('/api/v1/cultivos', json={'nombre': 'Tomate', 'precio_venta': 5}).get_json()['id']
+    id_luis = luis.post('/api/v1/cultivos', json={'nombre': 'Lechuga', 'precio_venta': 3}).get_json()['id']
+    # Contadores de ID independientes
+    assert id_ana == id_luis == 1
+
+    assert [c['nombre'] for c in ana.get('/api/v1/cultivos').get_json()] == ['Tomate']
+    assert [c['nombre'] for c in luis.get('/api/v1/cultivos').get_json()] == ['Lechuga']
+    assert luis.get('/api/v1/cultivos/search?q=tomate').get_json() == []
+    assert [c['nombre'] for c in luis.get('/api/v1/cultivos/top?k=5').get_json()] == ['Lechuga']
+
+    # Cambios y bajas de luis sobre "su" ID 1 no tocan el cultivo 1 de ana
+    luis.put('/api/v1/cultivos/1', json={'nombre': 'Escarola'})
+    luis.delete('/api/v1/cultivos/1')
+    assert luis.get('/api/v1/cultivos').get_json() == []
+    assert [c['nombre'] for c in ana.get('/api/v1/cultivos').get_json()] == ['Tomate']
+    assert app_backend.cargar_borrados(app_backend.datos_de('ana'))['borrados'] == []
+    assert app_backend.datos_de('ana').ruta_cultivos != app_backend.datos_de('luis').ruta_cultivos
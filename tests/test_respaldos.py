@@ -0,0 +1,201 @@
+# tests/test_respaldos.py
+# Respaldos incrementales (respaldos.py): cadenas completo -> incrementales,
+# reconstrucción y restauración exactas, lápidas descartadas por MAX_BORRADOS
+# y poda de cadenas antiguas.
+
+import copy
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import app_backend
+from respaldos import GestorRespaldos
+
+
+@pytest.fixture
+def respaldos(almacen, monkeypatch):
+    """Datos en tmp_path y un gestor de respaldos propio; devuelve una función para cambiarlo."""
+    def configurar(**opciones):
+        gestor = GestorRespaldos(str(almacen / 'respaldos'), **opciones)
+        monkeypatch.setattr(app_backend, 'gestor_respaldos', gestor)
+        return gestor
+    return configurar
+
+
+def estado_actual():
+    """Lo que un respaldo tomado ahora debería reproducir: usuarios y (cultivos, borrados) por partición."""
+    particiones = {}
+    for usuario in app_backend.usuarios_con_particion():
+        particion = app_backend.datos_de(usuario)
+        particiones[usuario] = (app_backend.listar_cultivos(usuario), app_backend.cargar_borrados(particion))
+    return copy.deepcopy({'usuarios': app_backend.cargar_datos(app_backend.RUTA_DATOS_USUARIOS),
+                          'particiones': particiones})
+
+
+def reconstruido(gestor, hasta=None):
+    estado = gestor.reconstruir(hasta)
+    return {'usuarios': estado['usuarios'], 'particiones': estado['particiones']}
+
+
+def respaldar():
+    """Toma un respaldo y devuelve (secuencia, contenido) o None si no había cambios."""
+    ruta = app_backend.tomar_respaldo()
+    if ruta is None:
+        return None
+    gestor = app_backend.gestor_respaldos
+    secuencia = gestor.secuencias()[-1]
+    return secuencia, gestor.leer(secuencia)
+
+
+def restaurar(gestor, destino, *opciones):
+    """Ejecuta la CLI en otro proceso: app_backend lee RUTA_PERSISTENCIA al importarse."""
+    return subprocess.run([sys.executable, 'respaldos.py', '--directorio', gestor.directorio,
+                           'restaurar', '--destino', str(destino), *opciones],
+                          cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                          env=dict(os.environ, INTERVALO_RESPALDO='0'),
+                          capture_output=True, text=True)
+
+
+def leer_restaurado(destino, usuario):
+    particion = app_backend.numero_particion(usuario)
+    directorio = os.path.join(destino, 'particiones', f'{particion:02d}', 'u_' + usuario)
+    with open(os.path.join(directorio, 'cultivos.json'), encoding='utf-8') as f:
+        cultivos = json.load(f)
+    try:
+        with open(os.path.join(directorio, 'cultivos_borrados.json'), encoding='utf-8') as f:
+            borrados = json.load(f)
+    except FileNotFoundError:
+        borrados = None
+    return cultivos, borrados
+
+
+# --- Cadena Completo -> Incremental ---
+
+def test_cadena_completa_e_incremental_se_reconstruye_y_restaura_exacta(respaldos, tmp_path):
+    gestor = respaldos(completo_cada=24, cadenas=3)
+    for usuario in ('ana', 'luis'):
+        app_backend.registrar_usuario({'username': usuario, 'password': 'x'})
+    for nombre in ('Tomate', 'Pepino', 'Lechuga'):
+        app_backend.insertar_cultivo('ana', {'nombre': nombre, 'zona': 'A'})
+    app_backend.insertar_cultivo('luis', {'nombre': 'Ajo'})
+    esperados = {}
+
+    secuencia, contenido = respaldar()
+    esperados[secuencia] = estado_actual()
+    assert contenido['base'] is None
+    assert all(registro['completo'] for registro in contenido['particiones'].values())
+
+    # Cambio, baja y alta en ana; luis no cambia y no aparece en el incremental
+    app_backend.modificar_cultivo('ana', 1, {'nombre': 'Tomate Pera'})
+    app_backend.borrar_cultivo('ana', 2)
+    app_backend.insertar_cultivo('ana', {'nombre': 'Calabacín'})
+    secuencia, contenido = respaldar()
+    esperados[secuencia] = estado_actual()
+    assert contenido['base'] == secuencia - 1 and contenido['usuarios'] is None
+    assert list(contenido['particiones']) == ['ana']
+    registro = contenido['particiones']['ana']
+    assert not registro['completo']
+    assert sorted(c['id'] for c in registro['cultivos']) == [1, 4]
+    assert [b['id'] for b in registro['lapidas']] == [2]
+
+    # Sin cambios: no se escribe nada
+    assert respaldar() is None
+    assert gestor.secuencias() == sorted(esperados)
+
+    # Un usuario nuevo (su partición va completa) y otra baja
+    app_backend.registrar_usuario({'username': 'eva', 'password': 'x'})
+    app_backend.insertar_cultivo('eva', {'nombre': 'Cebolla'})
+    app_backend.borrar_cultivo('ana', 3)
+    secuencia, contenido = respaldar()
+    esperados[secuencia] = estado_actual()
+    assert contenido['base'] == secuencia - 1 and contenido['usuarios'] is not None
+    assert contenido['particiones']['eva']['completo'] and not contenido['particiones']['ana']['completo']
+
+    for secuencia, esperado in esperados.items():
+        assert reconstruido(gestor, secuencia) == esperado
+
+    # Restauración en un volumen vacío (CLI): los archivos quedan igual que los originales
+    destino = tmp_path / 'restaurado'
+    resultado = restaurar(gestor, destino)
+    assert resultado.returncode == 0, resultado.stderr
+    final = esperados[secuencia]
+    with open(destino / 'usuarios.json', encoding='utf-8') as f:
+        assert json.load(f) == final['usuarios']
+    for usuario, (cultivos, borrados) in final['particiones'].items():
+        assert leer_restaurado(destino, usuario) == (cultivos, borrados)
+
+    # Sobre datos existentes solo con --forzar; --hasta restaura un punto anterior
+    assert restaurar(gestor, destino).returncode != 0
+    resultado = restaurar(gestor, destino, '--forzar', '--hasta', '1')
+    assert resultado.returncode == 0, resultado.stderr
+    assert leer_restaurado(destino, 'ana') == esperados[1]['particiones']['ana']
+
+
+# --- Lápidas Descartadas (MAX_BORRADOS) ---
+
+def test_bajas_que_cruzan_la_minima_de_lapidas(respaldos, monkeypatch):
+    gestor = respaldos(completo_cada=100, cadenas=3)
+    monkeypatch.setattr(app_backend, 'MAX_BORRADOS', 2)
+    app_backend.registrar_usuario({'username': 'ana', 'password': 'x'})
+    for i in range(6):
+        app_backend.insertar_cultivo('ana', {'nombre': f'c{i}'})
+    esperados = {}
+
+    def respaldo_de_ana():
+        secuencia, contenido = respaldar()
+        esperados[secuencia] = estado_actual()
+        return contenido['particiones']['ana']
+
+    respaldo_de_ana()
+    app_backend.borrar_cultivo('ana', 1)
+    app_backend.borrar_cultivo('ana', 2)
+    registro = respaldo_de_ana()
+    assert not registro['completo'] and registro['minima'] == 0
+
+    # La tercera baja descarta la lápida más antigua: 'minima' sube, pero no
+    # por encima de lo ya respaldado, así que sigue siendo incremental
+    app_backend.borrar_cultivo('ana', 3)
+    registro = respaldo_de_ana()
+    assert not registro['completo'] and registro['minima'] > 0
+    assert [b['id'] for b in esperados[max(esperados)]['particiones']['ana'][1]['borrados']] == [2, 3]
+
+    # Ahora se descartan lápidas posteriores al último respaldo: un
+    # incremental perdería bajas, así que la partición va completa
+    for i in range(3):
+        app_backend.insertar_cultivo('ana', {'nombre': f'd{i}'})
+    for cultivo_id in (7, 8, 9):
+        app_backend.borrar_cultivo('ana', cultivo_id)
+    anterior = gestor.leer_estado()['versiones']['ana']
+    registro = respaldo_de_ana()
+    assert registro['completo'] and registro['minima'] > anterior
+
+    for secuencia, esperado in esperados.items():
+        assert reconstruido(gestor, secuencia) == esperado
+
+
+# --- Poda ---
+
+def test_la_poda_conserva_todas_las_cadenas_necesarias(respaldos):
+    gestor = respaldos(completo_cada=2, cadenas=2)
+    app_backend.registrar_usuario({'username': 'ana', 'password': 'x'})
+    esperados = {}
+    for paso in range(1, 9):
+        app_backend.insertar_cultivo('ana', {'nombre': f'c{paso}'})
+        if paso % 3 == 0:
+            app_backend.borrar_cultivo('ana', paso - 1)
+        secuencia, contenido = respaldar()
+        assert (contenido['base'] is None) == (secuencia % 2 == 1)
+        esperados[secuencia] = estado_actual()
+
+        # Se conservan las 2 últimas cadenas (desde el penúltimo completo) y
+        # todo lo que queda se puede reconstruir tal cual se respaldó
+        completos = [s for s in range(1, secuencia + 1, 2)][-2:]
+        assert gestor.secuencias() == list(range(completos[0], secuencia + 1))
+        for conservada in gestor.secuencias():
+            assert reconstruido(gestor, conservada) == esperados[conservada]
+
+    with pytest.raises(ValueError):
+        gestor.reconstruir(1)
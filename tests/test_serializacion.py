@@ -0,0 +1,24 @@
+# tests/test_serializacion.py
+# Respuestas JSON de la API: jsonify debe ir por la ruta rápida (orjson).
+
+import app_backend
+
+
+def test_jsonify_usa_la_serializacion_rapida(monkeypatch):
+    llamadas = []
+    original = app_backend.a_json
+
+    def a_json_registrado(*args, **kwargs):
+        llamadas.append(args[0])
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(app_backend, 'a_json', a_json_registrado)
+    with app_backend.app.test_request_context():
+        respuesta = app_backend.jsonify({'b': 1, 'a': 'ñ'})
+    assert {'b': 1, 'a': 'ñ'} in llamadas
+    assert respuesta.get_data(as_text=True).strip() == '{"a":"ñ","b":1}'
+
+
+def test_argumentos_explicitos_usan_la_ruta_estandar():
+    texto = app_backend.app.json.dumps({'a': [1, 2]}, indent=2)
+    assert texto == '{\n  "a": [\n    1,\n    2\n  ]\n}'
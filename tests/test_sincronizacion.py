@@ -0,0 +1,231 @@
+# tests/test_sincronizacion.py
+# Reglas de agrupación y rebase del cliente offline-first (sincronizacion.py)
+# contra un app_backend real servido en local por HTTP.
+
+import itertools
+import threading
+
+import pytest
+import requests
+from werkzeug.serving import make_server
+
+import app_backend
+from sincronizacion import AlmacenLocal, ClienteAPI, Sincronizador
+
+PASSWORD = 'clave-1234'
+_usuarios = itertools.count()
+
+
+@pytest.fixture(scope='module')
+def url_servidor():
+    servidor = make_server('127.0.0.1', 0, app_backend.app, threaded=True)
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+    yield f'http://127.0.0.1:{servidor.server_port}'
+    servidor.shutdown()
+
+
+@pytest.fixture
+def usuario(url_servidor):
+    nombre = f'sync_{next(_usuarios)}'
+    respuesta = requests.post(f'{url_servidor}/auth/register', json={'username': nombre, 'password': PASSWORD})
+    assert respuesta.status_code == 201
+    return nombre
+
+
+@pytest.fixture
+def nuevo_cliente(url_servidor, usuario, tmp_path):
+    """Fábrica de sincronizadores del mismo usuario, cada uno con su almacén local."""
+    creados = []
+
+    def crear(nombre='escritorio'):
+        almacen = AlmacenLocal(str(tmp_path / f'{nombre}.json'))
+        sincronizador = Sincronizador(almacen, ClienteAPI(url_servidor, usuario, PASSWORD))
+        creados.append(sincronizador)
+        return sincronizador
+    yield crear
+    for sincronizador in creados:
+        sincronizador.cliente.cerrar()
+
+
+def en_servidor(usuario):
+    return {c['id']: c for c in app_backend.listar_cultivos(usuario)}
+
+
+def por_nombre(almacen):
+    return {c['nombre']: (clave, c) for clave, c in almacen.cultivos.items()}
+
+
+def enviar_en_vuelo(sincronizador):
+    """Toma y envía un lote sin incorporar aún la respuesta (lote en vuelo)."""
+    lote = sincronizador.almacen.tomar_lote()
+    return lote, sincronizador.cliente.enviar_lote(lote)
+
+
+# --- Agrupación de cambios locales ---
+
+def test_alta_y_cambios_se_envian_como_una_sola_alta(nuevo_cliente, usuario):
+    sync = nuevo_cliente()
+    clave = sync.almacen.crear({'nombre': 'Tomate', 'zona': 'A'})
+    sync.almacen.actualizar(clave, {'zona': 'B'})
+    sync.almacen.actualizar(clave, {'notas': 'goteo'})
+    assert [op['op'] for op in sync.almacen.tomar_lote()] == ['crear']
+
+    sync.sincronizar()
+    (cultivo,) = en_servidor(usuario).values()
+    assert (cultivo['zona'], cultivo['notas'], cultivo['version']) == ('B', 'goteo', 1)
+    assert sync.almacen.pendientes == {}
+    nueva = sync.almacen.resolver(clave)
+    assert nueva == str(cultivo['id']) and sync.almacen.cultivos[nueva]['version'] == 1
+
+
+def test_alta_y_baja_sin_conexion_no_llegan_al_servidor(nuevo_cliente, usuario):
+    sync = nuevo_cliente()
+    clave = sync.almacen.crear({'nombre': 'Lechuga'})
+    sync.almacen.borrar(clave)
+    assert sync.almacen.pendientes == {} and sync.almacen.cultivos == {}
+    sync.sincronizar()
+    assert en_servidor(usuario) == {}
+
+
+def test_cambios_y_baja_se_agrupan_con_la_version_base_original(nuevo_cliente, usuario):
+    sync = nuevo_cliente()
+    clave = sync.almacen.crear({'nombre': 'Pepino'})
+    sync.sincronizar()
+    clave = sync.almacen.resolver(clave)
+    sync.almacen.actualizar(clave, {'zona': 'C'})
+    sync.almacen.borrar(clave)
+    (op,) = sync.almacen.tomar_lote()
+    assert (op['op'], op['version_base']) == ('borrar', 1)
+    sync.sincronizar()
+    assert en_servidor(usuario) == {}
+
+
+# --- Rebase de cambios hechos con un lote en vuelo ---
+
+def test_cambio_durante_un_alta_en_vuelo_pasa_a_actualizacion(nuevo_cliente, usuario):
+    sync = nuevo_cliente()
+    clave = sync.almacen.crear({'nombre': 'Pimiento', 'zona': 'A'})
+    lote, respuesta = enviar_en_vuelo(sync)
+    sync.almacen.actualizar(clave, {'zona': 'B'})
+    sync.almacen.aplicar_resultados(lote, respuesta)
+
+    nueva = sync.almacen.resolver(clave)
+    (op,) = sync.almacen.tomar_lote()
+    assert (op['clave'], op['op'], op['version_base']) == (nueva, 'actualizar', 1)
+    assert op['datos']['zona'] == 'B'
+    sync.sincronizar()
+    assert en_servidor(usuario)[int(nueva)]['zona'] == 'B'
+    assert sync.almacen.pendientes == {}
+
+
+def test_baja_durante_un_alta_en_vuelo_borra_en_el_servidor(nuevo_cliente, usuario):
+    sync = nuevo_cliente()
+    clave = sync.almacen.crear({'nombre': 'Cebolla'})
+    lote, respuesta = enviar_en_vuelo(sync)
+    sync.almacen.borrar(clave)
+    sync.almacen.aplicar_resultados(lote, respuesta)
+
+    (op,) = sync.almacen.tomar_lote()
+    assert (op['op'], op['version_base']) == ('borrar', 1)
+    sync.sincronizar()
+    assert en_servidor(usuario) == {} and sync.almacen.cultivos == {}
+
+
+def test_cambio_durante_una_actualizacion_en_vuelo_se_rebasa(nuevo_cliente, usuario):
+    sync = nuevo_cliente()
+    clave = sync.almacen.crear({'nombre': 'Calabaza'})
+    sync.sincronizar()
+    clave = sync.almacen.resolver(clave)
+    sync.almacen.actualizar(clave, {'zona': 'A'})
+    lote, respuesta = enviar_en_vuelo(sync)
+    sync.almacen.actualizar(clave, {'notas': 'poda'})
+    sync.almacen.aplicar_resultados(lote, respuesta)
+
+    (op,) = sync.almacen.tomar_lote()
+    assert op['version_base'] == 2  # La versión que dejó la actualización en vuelo
+    sync.sincronizar()
+    cultivo = en_servidor(usuario)[int(clave)]
+    assert (cultivo['zona'], cultivo['notas'], cultivo['version']) == ('A', 'poda', 3)
+    assert sync.almacen.cultivos[clave] == cultivo
+
+
+# --- Conflictos: gana el servidor ---
+
+def test_conflicto_sustituye_la_copia_local_por_la_del_servidor(nuevo_cliente, usuario):
+    oficina, invernadero = nuevo_cliente('oficina'), nuevo_cliente('invernadero')
+    oficina.almacen.crear({'nombre': 'Berenjena', 'zona': 'A'})
+    oficina.sincronizar()
+    invernadero.sincronizar()
+    (clave, _), = por_nombre(invernadero.almacen).values()
+
+    oficina.almacen.actualizar(clave, {'zona': 'Oficina'})
+    oficina.sincronizar()
+    invernadero.almacen.actualizar(clave, {'zona': 'Invernadero', 'notas': 'perdida'})
+    invernadero.sincronizar()
+
+    cultivo = en_servidor(usuario)[int(clave)]
+    assert cultivo['zona'] == 'Oficina' and 'notas' not in cultivo
+    assert invernadero.almacen.pendientes == {}
+    assert invernadero.almacen.cultivos[clave] == cultivo
+
+
+def test_cambio_sobre_un_cultivo_borrado_en_el_servidor_se_descarta(nuevo_cliente, usuario):
+    oficina, invernadero = nuevo_cliente('oficina'), nuevo_cliente('invernadero')
+    oficina.almacen.crear({'nombre': 'Rábano'})
+    oficina.sincronizar()
+    invernadero.sincronizar()
+    (clave, _), = por_nombre(invernadero.almacen).values()
+
+    oficina.almacen.borrar(clave)
+    oficina.sincronizar()
+    invernadero.almacen.actualizar(clave, {'zona': 'B'})
+    assert invernadero.sincronizar() is None
+    assert invernadero.almacen.cultivos == {} and invernadero.almacen.pendientes == {}
+    assert invernadero.cambios_remotos.is_set()
+
+
+def test_delta_no_pisa_cambios_locales_pendientes(nuevo_cliente):
+    oficina, invernadero = nuevo_cliente('oficina'), nuevo_cliente('invernadero')
+    oficina.almacen.crear({'nombre': 'Judía', 'zona': 'A'})
+    oficina.sincronizar()
+    invernadero.sincronizar()
+    (clave, _), = por_nombre(invernadero.almacen).values()
+
+    oficina.almacen.actualizar(clave, {'zona': 'Oficina'})
+    oficina.sincronizar()
+    invernadero.almacen.actualizar(clave, {'notas': 'local'})
+    invernadero.almacen.aplicar_cambios(invernadero.cliente.pedir_cambios(invernadero.almacen.version))
+    assert invernadero.almacen.cultivos[clave]['notas'] == 'local'
+    assert invernadero.almacen.cultivos[clave]['zona'] == 'A'
+
+
+# --- Vista de la interfaz y persistencia ---
+
+def test_aplicar_vista_traduce_la_lista_a_operaciones(nuevo_cliente, usuario):
+    sync = nuevo_cliente()
+    claves = sync.almacen.aplicar_vista([(None, {'nombre': 'Ajo'}), (None, {'nombre': 'Puerro'})], [])
+    sync.sincronizar()
+    ajo, puerro = claves
+
+    nuevas = sync.almacen.aplicar_vista([(ajo, {'nombre': 'Ajo', 'zona': 'Z'}), (None, {'nombre': 'Apio'})],
+                                        claves)
+    assert nuevas[0] == sync.almacen.resolver(ajo)
+    assert sorted(op['op'] for op in sync.almacen.tomar_lote()) == ['actualizar', 'borrar', 'crear']
+    sync.sincronizar()
+    assert sorted((c['nombre'], c.get('zona')) for c in en_servidor(usuario).values()) == \
+        [('Ajo', 'Z'), ('Apio', None)]
+
+
+def test_pendientes_sobreviven_a_un_reinicio(nuevo_cliente, usuario, tmp_path):
+    sync = nuevo_cliente()
+    clave = sync.almacen.crear({'nombre': 'Col'})
+    sync.almacen.actualizar(clave, {'zona': 'A'})
+    sync.notificar_cambio_local()
+
+    reabierto = AlmacenLocal(sync.almacen.ruta)
+    assert reabierto.existia and reabierto.pendientes == sync.almacen.pendientes
+    sync.almacen = reabierto
+    sync.sincronizar()
+    (cultivo,) = en_servidor(usuario).values()
+    assert (cultivo['nombre'], cultivo['zona']) == ('Col', 'A')